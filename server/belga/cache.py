@@ -0,0 +1,81 @@
+# -*- coding: utf-8; -*-
+#
+# This file is part of Superdesk.
+#
+# Copyright 2013 - 2020 Sourcefabric z.u. and contributors.
+#
+# For the full copyright and license information, please see the
+# AUTHORS and LICENSE files distributed with this source code, or
+# at https://www.sourcefabric.org/superdesk/license
+
+"""In-process cache of desks and content templates used when routing items.
+
+Cached documents are dropped when those are modified via API in the current
+process, other processes (like celery workers) get fresh documents once
+``DESK_CACHE_TTL`` seconds elapse.
+"""
+
+import time
+from copy import deepcopy
+
+from flask import current_app as app
+from superdesk import get_resource_service
+
+RESOURCES = ('desks', 'content_templates')
+
+
+def _get_cache():
+    return app.extensions.setdefault('belga_cache', {})
+
+
+def _get(resource, _id):
+    if not _id:
+        return None
+    cache = _get_cache()
+    key = (resource, str(_id))
+    now = time.monotonic()
+    entry = cache.get(key)
+    if entry is None or entry[0] <= now:
+        doc = get_resource_service(resource).find_one(req=None, _id=_id)
+        if doc is None:
+            cache.pop(key, None)
+            return None
+        entry = cache[key] = (now + app.config.get('DESK_CACHE_TTL', 60), doc)
+    # callers may modify it
+    return deepcopy(entry[1])
+
+
+def get_desk(desk_id):
+    """Get desk by id.
+
+    :param desk_id: desk id
+    :return: copy of desk or ``None`` if not found
+    """
+    return _get('desks', desk_id)
+
+
+def get_content_template(template_id):
+    """Get content template by id.
+
+    :param template_id: content template id
+    :return: copy of content template or ``None`` if not found
+    """
+    return _get('content_templates', template_id)
+
+
+def invalidate(resource=None):
+    """Drop cached documents of resource, all of them if not set."""
+    cache = _get_cache()
+    for key in [key for key in cache if resource is None or key[0] == resource]:
+        cache.pop(key, None)
+
+
+def init_app(app):
+    for resource in RESOURCES:
+        def on_change(*args, resource=resource):
+            invalidate(resource)
+
+        for event in ('on_updated_{}', 'on_replaced_{}', 'on_deleted_item_{}'):
+            hook = getattr(app, event.format(resource))
+            hook += on_change
+            setattr(app, event.format(resource), hook)
@@ -1 +1,5 @@
 from . import contacts_import  # noqa
+from . import parse_backlog  # noqa
+from . import import_events_file  # noqa
+from . import macros_report  # noqa
+from . import apply_macro  # noqa
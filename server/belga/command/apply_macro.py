@@ -0,0 +1,171 @@
+import time
+import logging
+from copy import deepcopy
+
+import pymongo
+import superdesk
+from bson import json_util
+from eve.utils import config, document_etag
+from flask import current_app as app
+from superdesk.utc import utcnow
+
+from belga.command.checkpoint import read_checkpoint, write_checkpoint
+from belga.workers import get_pool
+
+logger = logging.getLogger(__name__)
+
+RESOURCE = 'archive'
+
+_worker = {}
+
+
+def _init_worker(macro_name):
+    _worker['callback'] = superdesk.get_resource_service('macros').get_macro_by_name(macro_name)['callback']
+
+
+def get_updates(original, item):
+    return {key: value for key, value in item.items() if key != config.ID_FIELD and original.get(key) != value}
+
+
+def apply_macro(original, callback):
+    """Apply macro to copy of item.
+
+    :return: tuple (updates or ``None``, error message or ``None``)
+    """
+    item = deepcopy(original)
+    try:
+        result = callback(item)
+    except Exception as ex:
+        # exceptions are not always picklable, only message is sent back
+        logger.exception('Failed to apply macro to item %s', original.get(config.ID_FIELD))
+        return None, str(ex)
+    if isinstance(result, tuple):
+        result = result[0]
+    return get_updates(original, result if isinstance(result, dict) else item), None
+
+
+def _apply_macro(original):
+    return apply_macro(original, _worker['callback'])
+
+
+def get_items(query, last_id=None, batch_size=500):
+    """Get items matching query in batches ordered by id.
+
+    :param dict query: mongo query
+    :param last_id: only items with bigger id are returned
+    :param int batch_size: number of items in a batch
+    :return: generator of lists of items
+    """
+    collection = app.data.get_mongo_collection(RESOURCE)
+    while True:
+        lookup = {'$and': [query, {config.ID_FIELD: {'$gt': last_id}}]} if last_id is not None else query
+        items = list(collection.find(lookup, sort=[(config.ID_FIELD, pymongo.ASCENDING)], limit=batch_size))
+        if not items:
+            break
+        last_id = items[-1][config.ID_FIELD]
+        yield items
+
+
+def write_updates(items, updates):
+    """Store updated items using single bulk write and reindex them.
+
+    :param dict items: original items by id
+    :param dict updates: updates by item id
+    """
+    now = utcnow()
+    docs = []
+    requests = []
+    for _id, item_updates in updates.items():
+        doc = dict(items[_id], **item_updates)
+        doc[config.LAST_UPDATED] = now
+        doc[config.ETAG] = document_etag(doc)
+        docs.append(doc)
+        requests.append(pymongo.UpdateOne({config.ID_FIELD: _id}, {'$set': dict(
+            item_updates, **{config.LAST_UPDATED: now, config.ETAG: doc[config.ETAG]})}))
+    app.data.get_mongo_collection(RESOURCE).bulk_write(requests, ordered=False)
+    app.data._search_backend(RESOURCE).bulk_insert(RESOURCE, docs)
+
+
+class ApplyMacroCommand(superdesk.Command):
+    """Apply macro to archive items matching query.
+
+    Items are read in batches ordered by id, macro is applied in a pool of worker
+    processes and changed items are stored using bulk write and reindexed.
+    Versions and history of items are not updated.
+
+    With ``--checkpoint`` file the id of the last processed item is stored after
+    each batch, running the command again with the same file continues from there.
+    Nothing is stored with ``--dry-run``, changed fields are only logged.
+
+    Example:
+    ::
+
+        $ python manage.py macros:apply -m "Translate Sports Country Codes" -q '{"state": "published"}' -w 4
+        $ python manage.py macros:apply -m "Set Default Metadata" -c /tmp/metadata.json --dry-run
+
+    """
+
+    option_list = [
+        superdesk.Option('--macro', '-m', dest='macro_name', required=True),
+        superdesk.Option('--query', '-q', dest='query', default='{}'),
+        superdesk.Option('--workers', '-w', dest='workers', type=int, default=1),
+        superdesk.Option('--batch-size', '-b', dest='batch_size', type=int, default=500),
+        superdesk.Option('--checkpoint', '-c', dest='checkpoint_path'),
+        superdesk.Option('--dry-run', '-d', dest='dry_run', action='store_true', default=False),
+    ]
+
+    def run(self, macro_name, query='{}', workers=1, batch_size=500, checkpoint_path=None, dry_run=False):
+        macro = superdesk.get_resource_service('macros').get_macro_by_name(macro_name)
+        if not macro:
+            print('Macro "{}" not found'.format(macro_name))
+            return
+
+        checkpoint = read_checkpoint(checkpoint_path)
+        if checkpoint.get('query', query) != query or checkpoint.get('macro', macro_name) != macro_name:
+            print('Checkpoint {} was created for other macro or query'.format(checkpoint_path))
+            return
+        counts = {key: checkpoint.get(key, 0) for key in ('processed', 'changed', 'errors')}
+        if checkpoint.get('last_id'):
+            print('Continue after item {} processed={processed} changed={changed} errors={errors}'.format(
+                checkpoint['last_id'], **counts))
+
+        # workers are forked before items are fetched, so those use own mongo clients
+        pool = get_pool(workers, _init_worker, (macro_name,)) if workers > 1 else None
+        start = time.perf_counter()
+        processed = 0
+        try:
+            for items in get_items(json_util.loads(query), checkpoint.get('last_id'), batch_size):
+                if pool is not None:
+                    results = pool.map(_apply_macro, items, max(1, len(items) // (workers * 4)))
+                else:
+                    results = (apply_macro(item, macro['callback']) for item in items)
+
+                updates = {}
+                for item, (item_updates, error) in zip(items, results):
+                    if error is not None:
+                        counts['errors'] += 1
+                    elif item_updates:
+                        updates[item[config.ID_FIELD]] = item_updates
+                        logger.info('Item %s changed fields: %s',
+                                    item[config.ID_FIELD], ', '.join(sorted(item_updates)))
+
+                if updates and not dry_run:
+                    write_updates({item[config.ID_FIELD]: item for item in items}, updates)
+                processed += len(items)
+                counts['processed'] += len(items)
+                counts['changed'] += len(updates)
+                if not dry_run:
+                    write_checkpoint(checkpoint_path, dict(
+                        counts, macro=macro_name, query=query, last_id=items[-1][config.ID_FIELD]))
+                elapsed = time.perf_counter() - start
+                print('processed={processed} changed={changed} errors={errors}'.format(**counts),
+                      'items/s={:.1f}'.format(processed / elapsed if elapsed else 0))
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+        if dry_run:
+            print('Dry run, nothing was stored')
+
+
+superdesk.command('macros:apply', ApplyMacroCommand())
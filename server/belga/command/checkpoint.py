@@ -0,0 +1,38 @@
+"""Checkpoint files of resumable commands.
+
+Checkpoint is a JSON document written after each processed batch, running
+a command again with the same file continues where the previous run stopped.
+"""
+
+import os
+
+from bson import json_util
+
+
+def read_checkpoint(path):
+    if path and os.path.exists(path):
+        with open(path) as f:
+            return json_util.loads(f.read())
+    return {}
+
+
+def write_checkpoint(path, checkpoint):
+    if path:
+        # write new file first so interrupted run doesn't leave it broken
+        with open(path + '.tmp', 'w') as f:
+            f.write(json_util.dumps(checkpoint))
+        os.replace(path + '.tmp', path)
+
+
+def remove_checkpoint(path):
+    if path and os.path.exists(path):
+        os.remove(path)
+
+
+def get_file_signature(path):
+    """Get file signature used to check checkpoint was created for the same file.
+
+    :return: dict with path, size and modification time of file
+    """
+    stat = os.stat(path)
+    return {'file': path, 'size': stat.st_size, 'mtime': stat.st_mtime}
@@ -1,151 +1,360 @@
 import superdesk
 import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 
+import pymongo
+from eve.utils import config, document_etag
+from flask import current_app as app
 from superdesk import get_resource_service
+from superdesk.utc import utcnow
 import logging
 
+from belga.command.checkpoint import get_file_signature, read_checkpoint, remove_checkpoint, write_checkpoint
+
 logger = logging.getLogger(__name__)
 
+EMAIL_FIELDS = ('email', 'personalEmail')
+PHONE_FIELDS = ('directPhone1', 'directPhone2', 'phoneGeneral', 'personalPhone')
+JSON_CHUNK_SIZE = 64 * 1024
+
+
+def iter_json_array(file, chunk_size=JSON_CHUNK_SIZE):
+    """Parse items of JSON array one by one without loading whole file.
+
+    :param file: text file containing JSON array
+    :return: generator of array items
+    """
+    decoder = json.JSONDecoder()
+    whitespace = json.decoder.WHITESPACE
+    buffer = ''
+    pos = 0
+    started = False
+    eof = False
+    while True:
+        pos = whitespace.match(buffer, pos).end()
+        if pos < len(buffer):
+            if not started:
+                if buffer[pos] != '[':
+                    raise ValueError('JSON array expected')
+                started = True
+                pos += 1
+                continue
+            if buffer[pos] == ']':
+                return
+            if buffer[pos] == ',':
+                pos += 1
+                continue
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                # value at the end of buffer might continue in next chunk, only objects are complete
+                if end < len(buffer) or eof or buffer[end - 1] in '}]"':
+                    pos = end
+                    yield item
+                    continue
+        elif eof:
+            raise ValueError('Unexpected end of JSON array')
+        chunk = file.read(chunk_size)
+        eof = not chunk
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+
+def get_contact_key(item):
+    """Get dedup index key of contact from file, same name or company if there is no name."""
+    if not item.get('firstName') and not item.get('lastName'):
+        return ('organisation', item.get('company', ''))
+    return ('name', item.get('firstName', ''), item.get('lastName', ''))
+
+
+def get_contact_keys(contact):
+    """Get dedup index keys of stored contact."""
+    return [
+        ('organisation', contact.get('organisation')),
+        ('name', contact.get('first_name'), contact.get('last_name')),
+    ]
+
+
+def get_index_entry(contact):
+    emails = set(contact.get('contact_email') or [])
+    phones = {phone.get('number') for phone in contact.get('contact_phone') or [] if phone}
+    return emails, phones
+
+
+class ContactsIndex():
+    """Index of contacts used to detect duplicates.
+
+    Contact is a duplicate if there is a contact with the same first and last name
+    (or company if contact has no name) having all its emails and phones.
+    """
+
+    def __init__(self):
+        self.entries = {}
+
+    def add(self, contact):
+        entry = get_index_entry(contact)
+        for key in get_contact_keys(contact):
+            self.entries.setdefault(key, []).append(entry)
+
+    def load(self):
+        """Index all stored contacts using single query."""
+        projection = {'first_name': 1, 'last_name': 1, 'organisation': 1, 'contact_email': 1,
+                      'contact_phone.number': 1}
+        for contact in app.data.get_mongo_collection('contacts').find({}, projection):
+            self.add(contact)
+        return self
+
+    def is_duplicate(self, item):
+        emails = {item[field] for field in EMAIL_FIELDS if item.get(field)}
+        phones = {item[field] for field in PHONE_FIELDS if item.get(field)}
+        return any(emails <= entry_emails and phones <= entry_phones
+                   for entry_emails, entry_phones in self.entries.get(get_contact_key(item), []))
 
-def import_contacts_via_json_file(path_file):
+
+def is_valid_contact(item):
+    # contact is not name and email, not import
+    if not item.get('email') and not item.get('personalEmail') and not item.get('firstName') and not item.get(
+            'lastName') and not item.get('company'):
+        logger.info("contact (id:%s) is not name, company and email, not import." % str(item.get('contactId')))
+        return False
+    return True
+
+
+def get_contact_doc(item):
+    """Map contact from file to superdesk contact."""
+    doc = {}
+    # mapping data
+    doc.setdefault('schema', {}).update({"is_active": True,
+                                         "public": item.get("belgaPublic", True)
+                                         })
+    doc['organisation'] = item.get("company", "")
+    doc['first_name'] = item.get("firstName", "")
+    doc['last_name'] = item.get("lastName", "")
+    if item.get('function'):
+        doc['job_title'] = item.get("function")
+    if item.get('mobile247'):
+        doc.setdefault('mobile', []).append({'number': item.get('mobile247'),
+                                             'usage': 'Business',
+                                             'public': True
+                                             })
+    if item.get('personalMobile'):
+        doc.setdefault('mobile', []).append({'number': item.get('personalMobile'),
+                                             'usage': 'Confidential',
+                                             'public': True
+                                             })
+    if item.get('phoneGeneral'):
+        doc.setdefault('contact_phone', []).append({'number': item.get('phoneGeneral'),
+                                                    'usage': 'Business',
+                                                    'public': True
+                                                    })
+    if item.get('directPhone1'):
+        doc.setdefault('contact_phone', []).append({'number': item.get('directPhone1'),
+                                                    'usage': 'Business',
+                                                    'public': True
+                                                    })
+    if item.get('directPhone2'):
+        doc.setdefault('contact_phone', []).append({'number': item.get('directPhone2'),
+                                                    'usage': 'Business',
+                                                    'public': True
+                                                    })
+    if item.get('personalPhone'):
+        doc.setdefault('contact_phone', []).append({'number': item.get('personalPhone'),
+                                                    'usage': 'Confidential',
+                                                    'public': True
+                                                    })
+    doc['fax'] = ''
+    if item.get('email'):
+        doc.setdefault('contact_email', []).append(item.get('email'))
+    if item.get('personalEmail'):
+        doc.setdefault('contact_email', []).append(item.get('personalEmail'))
+    if item.get('twitter'):
+        doc['twitter'] = item.get('twitter')
+    if item.get('personalTwitter'):
+        doc['twitter_personal'] = item.get('personalTwitter')
+    if item.get('facebook'):
+        doc['facebook'] = item.get('facebook')
+    if item.get('personalFacebook'):
+        doc['facebook_personal'] = item.get('personalFacebook')
+    if item.get('url'):
+        doc['website'] = item.get('url')
+    if item.get('professionalAddress'):
+        doc.setdefault('contact_address', []).append(item.get('professionalAddress'))
+    if item.get('professionalAddress'):
+        doc.setdefault('contact_address', []).append(item.get('personalAddress'))
+    if item.get('Comment1'):
+        doc['notes'] = item.get('Comment1', '')
+    if item.get('keywords'):
+        doc['keywords'] = item.get('keywords')
+    # use original_id check and sync the contact from the belga.
+    doc['original_id'] = str(item.get('contactId'))
+    return doc
+
+
+def import_contacts_via_json_file(path_file, batch_size=500):
     """
     Get info contacts in file and add to database
     :param path_file:
-    :param unit_test:
-    :return:
+    :param batch_size: number of contacts inserted at once
+    :return: imported contacts
     """
+    contact_service = get_resource_service('contacts')
+    index = ContactsIndex().load()
+    docs = []
+    batch = []
+    count_items = 0
+    start = time.perf_counter()
     with open(path_file, 'rt', encoding='utf-8') as contacts_data:
-        json_data = json.load(contacts_data)
-        contact_service = get_resource_service('contacts')
-        docs = []
-        count_items = len(json_data)
-        count_import = 0
-        for item in json_data:
+        for item in iter_json_array(contacts_data):
+            count_items += 1
 
             # Validate data contacts
-            # contact is not name and email, not import
-            if not item.get('email') and not item.get('personalEmail') and not item.get('firstName') and not item.get(
-                    'lastName') and not item.get('company'):
-                logger.info("contact (id:%s) is not name, company and email, not import." % str(item.get('contactId')))
+            if not is_valid_contact(item):
                 continue
-            else:
-                # contact same name, email, phone, not import
-                query = {'first_name': item.get('firstName', ''), "last_name": item.get('lastName', '')}
-                # if first and last name is empty, check company
-                if not item.get('firstName') and not item.get('lastName'):
-                    query = ({'organisation': item.get('company', '')})
-                and_query = []
-                if item.get('email'):
-                    and_query.append({"contact_email": item.get('email')})
-                if item.get('personalEmail'):
-                    and_query.append({"contact_email": item.get('personalEmail')})
-                if item.get('directPhone1'):
-                    and_query.append({"contact_phone.number": item.get('directPhone1')})
-                if item.get('directPhone2'):
-                    and_query.append({"contact_phone.number": item.get('directPhone2')})
-                if item.get('phoneGeneral'):
-                    and_query.append({"contact_phone.number": item.get('phoneGeneral')})
-                if item.get('personalPhone'):
-                    and_query.append({"contact_phone.number": item.get('personalPhone')})
-                if and_query:
-                    query.update({"$and": and_query})
-
-                contacts = contact_service.find(query)
-
-                if len(list(contacts)):
-                    logger.info(
-                        "contact (id:%s) is exist, same name(%s %s), email(%s, %s), phone(%s, %s), not import" % (
-                            str(item.get('contactId')), item.get('firstName'), item.get('lastName'),
-                            item.get('email', ''), item.get('personalEmail', ''), item.get('directPhone1', ''),
-                            item.get('directPhone2', '')))
-                    continue
-            doc = {}
-            logger.info("contact (id:%s) is insert successfully:" % str(item.get('contactId')))
-            # mapping data
-            doc.setdefault('schema', {}).update({"is_active": True,
-                                                 "public": item.get("belgaPublic", True)
-                                                 })
-            doc['organisation'] = item.get("company", "")
-            doc['first_name'] = item.get("firstName", "")
-            doc['last_name'] = item.get("lastName", "")
-            if item.get('function'):
-                doc['job_title'] = item.get("function")
-            if item.get('mobile247'):
-                doc.setdefault('mobile', []).append({'number': item.get('mobile247'),
-                                                     'usage': 'Business',
-                                                     'public': True
-                                                     })
-            if item.get('personalMobile'):
-                doc.setdefault('mobile', []).append({'number': item.get('personalMobile'),
-                                                     'usage': 'Confidential',
-                                                     'public': True
-                                                     })
-            if item.get('phoneGeneral'):
-                doc.setdefault('contact_phone', []).append({'number': item.get('phoneGeneral'),
-                                                            'usage': 'Business',
-                                                            'public': True
-                                                            })
-            if item.get('directPhone1'):
-                doc.setdefault('contact_phone', []).append({'number': item.get('directPhone1'),
-                                                            'usage': 'Business',
-                                                            'public': True
-                                                            })
-            if item.get('directPhone2'):
-                doc.setdefault('contact_phone', []).append({'number': item.get('directPhone2'),
-                                                            'usage': 'Business',
-                                                            'public': True
-                                                            })
-            if item.get('personalPhone'):
-                doc.setdefault('contact_phone', []).append({'number': item.get('personalPhone'),
-                                                            'usage': 'Confidential',
-                                                            'public': True
-                                                            })
-            doc['fax'] = ''
-            if item.get('email'):
-                doc.setdefault('contact_email', []).append(item.get('email'))
-            if item.get('personalEmail'):
-                doc.setdefault('contact_email', []).append(item.get('personalEmail'))
-            if item.get('twitter'):
-                doc['twitter'] = item.get('twitter')
-            if item.get('personalTwitter'):
-                doc['twitter_personal'] = item.get('personalTwitter')
-            if item.get('facebook'):
-                doc['facebook'] = item.get('facebook')
-            if item.get('personalFacebook'):
-                doc['facebook_personal'] = item.get('personalFacebook')
-            if item.get('url'):
-                doc['website'] = item.get('url')
-            if item.get('professionalAddress'):
-                doc.setdefault('contact_address', []).append(item.get('professionalAddress'))
-            if item.get('professionalAddress'):
-                doc.setdefault('contact_address', []).append(item.get('personalAddress'))
-            if item.get('Comment1'):
-                doc['notes'] = item.get('Comment1', '')
-            if item.get('keywords'):
-                doc['keywords'] = item.get('keywords')
-            # use original_id check and sync the contact from the belga.
-            doc['original_id'] = str(item.get('contactId'))
-            count_import += 1
-            contact_service.post([doc])
-            docs.append(doc)
-        logger.info("number item: " + str(count_items) + ", number imported item: " + str(count_import))
-        return docs
+
+            # contact same name, email, phone, not import
+            if index.is_duplicate(item):
+                logger.info(
+                    "contact (id:%s) is exist, same name(%s %s), email(%s, %s), phone(%s, %s), not import" % (
+                        str(item.get('contactId')), item.get('firstName'), item.get('lastName'),
+                        item.get('email', ''), item.get('personalEmail', ''), item.get('directPhone1', ''),
+                        item.get('directPhone2', '')))
+                continue
+
+            doc = get_contact_doc(item)
+            # later contacts in file are checked against this one
+            index.add(doc)
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                contact_service.post(batch)
+                docs.extend(batch)
+                batch = []
+                logger.info("imported %d contacts of %d read, %.1f contacts/s", len(docs), count_items,
+                            count_items / (time.perf_counter() - start))
+        if batch:
+            contact_service.post(batch)
+            docs.extend(batch)
+    logger.info("number item: " + str(count_items) + ", number imported item: " + str(len(docs)))
+    return docs
+
+
+def upsert_contacts(docs):
+    """Insert or update contacts by ``original_id`` using single bulk write.
+
+    :param list docs: contacts, later one wins if there are more with the same ``original_id``
+    :return: bulk write result
+    """
+    now = utcnow()
+    docs = list({doc['original_id']: doc for doc in docs}.values())
+    requests = []
+    for doc in docs:
+        doc[config.LAST_UPDATED] = now
+        doc[config.ETAG] = document_etag(doc)
+        requests.append(pymongo.UpdateOne({'original_id': doc['original_id']}, {
+            '$set': doc,
+            '$setOnInsert': {config.DATE_CREATED: now},
+        }, upsert=True))
+    collection = app.data.get_mongo_collection('contacts')
+    result = collection.bulk_write(requests, ordered=False)
+    search_backend = app.data._search_backend('contacts')
+    if search_backend is not None:
+        updated = collection.find({'original_id': {'$in': [doc['original_id'] for doc in docs]}})
+        search_backend.bulk_insert('contacts', list(updated))
+    return result
+
+
+def sync_contacts_via_json_file(path_file, batch_size=500, workers=1, checkpoint_path=None):
+    """Insert new and update existing contacts from file using ``original_id``.
+
+    Contacts are mapped in a pool of worker processes.  Number of processed contacts
+    is stored to checkpoint file after each batch, if it exists when starting
+    contacts until that offset are skipped.  Checkpoint is only valid for the same
+    unmodified file and it's removed once all contacts are synced.
+
+    :param path_file: path of JSON file
+    :param int batch_size: number of contacts stored at once
+    :param int workers: number of processes mapping contacts
+    :param checkpoint_path: path of checkpoint file
+    :return: dict with number of read, inserted and updated contacts
+    """
+    signature = get_file_signature(path_file)
+    checkpoint = read_checkpoint(checkpoint_path)
+    if checkpoint and any(checkpoint.get(key) != value for key, value in signature.items()):
+        raise ValueError('Checkpoint {} was created for other file or the file was modified'.format(checkpoint_path))
+    offset = checkpoint.get('offset', 0)
+    counts = {key: checkpoint.get(key, 0) for key in ('read', 'inserted', 'updated')}
+    if offset:
+        logger.info("continue after %d contacts", offset)
+    app.data.get_mongo_collection('contacts').create_index([('original_id', pymongo.ASCENDING)], background=True)
+
+    pool = ProcessPoolExecutor(workers) if workers > 1 else None
+    start = time.perf_counter()
+    try:
+        with open(path_file, 'rt', encoding='utf-8') as contacts_data:
+            items = islice(iter_json_array(contacts_data), offset, None)
+            while True:
+                batch = list(islice(items, batch_size))
+                if not batch:
+                    break
+                offset += len(batch)
+                counts['read'] += len(batch)
+                batch = [item for item in batch if item.get('contactId') is not None and is_valid_contact(item)]
+                if pool is not None:
+                    docs = list(pool.map(get_contact_doc, batch, chunksize=max(1, len(batch) // (workers * 4))))
+                else:
+                    docs = [get_contact_doc(item) for item in batch]
+                if docs:
+                    result = upsert_contacts(docs)
+                    counts['inserted'] += result.upserted_count
+                    counts['updated'] += result.modified_count
+                write_checkpoint(checkpoint_path, dict(counts, offset=offset, **signature))
+                logger.info("synced %d contacts, inserted %d, updated %d, %.1f contacts/s",
+                            counts['read'], counts['inserted'], counts['updated'],
+                            counts['read'] / (time.perf_counter() - start))
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    remove_checkpoint(checkpoint_path)
+    return counts
 
 
 class ContactImportCommand(superdesk.Command):
     """Import contact from belga to Superdesk.
     This command use for inserting a large number contact from Belga to Superdesk.
     Only support for format json file.
+    File is parsed contact by contact and contacts are inserted in batches.
+
+    With ``--upsert`` existing contacts are updated using ``original_id`` instead of being skipped,
+    it can be resumed using ``--checkpoint`` file.
+
+    Example:
+    ::
+
+        $ python manage.py contact:import -f contacts.json
+        $ python manage.py contact:import -f contacts.json --upsert -w 4 -c /tmp/contacts.checkpoint
+
     """
 
     option_list = [
         superdesk.Option('--file', '-f', dest='contacts_file_path',
-                         default='contacts.json')
+                         default='contacts.json'),
+        superdesk.Option('--batch-size', '-b', dest='batch_size', type=int, default=500),
+        superdesk.Option('--upsert', '-u', dest='upsert', action='store_true', default=False),
+        superdesk.Option('--workers', '-w', dest='workers', type=int, default=1),
+        superdesk.Option('--checkpoint', '-c', dest='checkpoint_path'),
     ]
 
-    def run(self, contacts_file_path):
+    def run(self, contacts_file_path, batch_size=500, upsert=False, workers=1, checkpoint_path=None):
         logger.info("import file: " + contacts_file_path)
-        import_contacts_via_json_file(contacts_file_path)
+        if upsert:
+            counts = sync_contacts_via_json_file(contacts_file_path, batch_size, workers, checkpoint_path)
+            print('read={read} inserted={inserted} updated={updated}'.format(**counts))
+        else:
+            import_contacts_via_json_file(contacts_file_path, batch_size)
 
 
 superdesk.command('contact:import', ContactImportCommand())
@@ -0,0 +1,104 @@
+import os
+import time
+import logging
+
+import superdesk
+from flask import current_app as app
+from superdesk.io.commands.update_ingest import ingest_items
+from superdesk.metadata.item import GUID_FIELD, GUID_NEWSML, FAMILY_ID, CONTENT_STATE
+from superdesk.metadata.utils import generate_guid
+from superdesk.utc import get_expiry_date
+from superdesk.workflow import set_default_state
+
+from belga.io.feeding_services.spreadsheet_file import REPORT_SUFFIX, SpreadsheetFileFeedingService
+
+logger = logging.getLogger(__name__)
+
+
+def insert_events(items, provider):
+    """Insert new events using single post to events service.
+
+    Items are prepared the same way ``ingest_item`` does it, except rule sets
+    and ingest provider sequence which are not used for events.  Events service
+    hooks run for the whole batch, those send notifications and record history,
+    and events are stored in mongo and elastic using bulk writes.
+
+    :return: list of items which were not inserted
+    """
+    if not items:
+        return []
+    service = superdesk.get_resource_service(SpreadsheetFileFeedingService.service)
+    for item in items:
+        item.setdefault(superdesk.config.ID_FIELD, generate_guid(type=GUID_NEWSML))
+        item[FAMILY_ID] = item[superdesk.config.ID_FIELD]
+        item['ingest_provider'] = str(provider[superdesk.config.ID_FIELD])
+        item.setdefault('source', provider.get('source', ''))
+        item.setdefault('uri', item[GUID_FIELD])
+        set_default_state(item, CONTENT_STATE.INGESTED)
+        item['expiry'] = get_expiry_date(provider.get('content_expiry') or app.config['INGEST_EXPIRY_MINUTES'],
+                                         item.get('versioncreated'))
+    try:
+        service.post(items)
+    except Exception as ex:
+        # events inserted before the failure are updated by ingest
+        logger.exception('Bulk insert of events failed, ingesting one by one: %s', ex)
+        return items
+    return []
+
+
+class ImportEventsFileCommand(superdesk.Command):
+    """Import events from CSV or XLSX file using spreadsheet file ingest provider.
+
+    File is imported even if it wasn't modified since last ingest update,
+    it's possible to import other file than the one configured in provider.
+    Rows processed before by the provider are skipped and hashes of imported
+    rows are stored in provider, like during ingest update.
+    New events are inserted in bulk, updated ones are ingested one by one.
+    Status of each row is written to a report file next to the imported one.
+
+    Example:
+    ::
+
+        $ python manage.py ingest:import_events_file -p "Sport calendars" -f /tmp/season.xlsx -b 1000
+
+    """
+
+    option_list = [
+        superdesk.Option('--provider', '-p', dest='provider_name', required=True),
+        superdesk.Option('--file', '-f', dest='path'),
+        superdesk.Option('--batch-size', '-b', dest='batch_size', type=int),
+    ]
+
+    def run(self, provider_name, path=None, batch_size=None):
+        provider_service = superdesk.get_resource_service('ingest_providers')
+        provider = provider_service.find_one(req=None, name=provider_name)
+        if not provider or provider.get('feeding_service') != SpreadsheetFileFeedingService.NAME:
+            print('Provider "{}" using {} feeding service not found'.format(
+                provider_name, SpreadsheetFileFeedingService.NAME))
+            return
+        if path:
+            provider['config'] = dict(provider.get('config') or {}, path=path)
+
+        service = SpreadsheetFileFeedingService()
+        private = provider.get('private') or {}
+        row_hashes = []
+        count = 0
+        start = time.perf_counter()
+        for items in service.import_file(provider, set(private.get('row_hashes') or []), row_hashes, batch_size):
+            new_items = [item for item in items if superdesk.config.ID_FIELD not in item]
+            updated_items = [item for item in items if superdesk.config.ID_FIELD in item]
+            updated_items.extend(insert_events(new_items, provider))
+            if updated_items:
+                ingest_items(updated_items, provider, service)
+            count += len(items)
+        elapsed = time.perf_counter() - start
+
+        stat = os.stat(provider['config']['path'])
+        update = {'private': dict(private, file=[stat.st_mtime, stat.st_size], row_hashes=row_hashes)}
+        provider_service.system_update(provider[superdesk.config.ID_FIELD], update, provider)
+        print('rows={} events={} time={:.2f}s rows/s={:.1f} report={}'.format(
+            len(row_hashes), count, elapsed, len(row_hashes) / elapsed if elapsed else 0,
+            provider['config']['path'] + REPORT_SUFFIX))
+
+
+superdesk.command('ingest:import_events_file', ImportEventsFileCommand())
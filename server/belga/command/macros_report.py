@@ -0,0 +1,41 @@
+from datetime import timedelta
+
+import superdesk
+from superdesk.utc import utcnow
+
+from belga.macro_stats import get_stats
+
+
+class MacrosReportCommand(superdesk.Command):
+    """Report latency of macros.
+
+    Percentiles of wall time (in milliseconds), average number of mongo commands
+    and average item size per macro are computed from samples stored by all processes.
+
+    Example:
+    ::
+
+        $ python manage.py macros:report --hours 24
+        $ python manage.py macros:report -n "Set Default Metadata With Translate"
+
+    """
+
+    option_list = [
+        superdesk.Option('--hours', '-H', dest='hours', type=int, default=24),
+        superdesk.Option('--name', '-n', dest='name'),
+    ]
+
+    def run(self, hours=24, name=None):
+        lookup = {'created': {'$gte': utcnow() - timedelta(hours=hours)}}
+        if name:
+            lookup['name'] = name
+        samples = superdesk.get_resource_service('macros_stats').find(lookup)
+        print('{:<45} {:>8} {:>9} {:>9} {:>9} {:>9} {:>8} {:>10}'.format(
+            'macro', 'count', 'p50', 'p90', 'p99', 'max', 'queries', 'size'))
+        for stat in get_stats(samples):
+            print('{:<45} {:>8} {:>9.1f} {:>9.1f} {:>9.1f} {:>9.1f} {:>8.1f} {:>10.0f}'.format(
+                stat['name'][:45], stat['count'], stat['p50'] * 1000, stat['p90'] * 1000,
+                stat['p99'] * 1000, stat['max'] * 1000, stat['queries'], stat['size']))
+
+
+superdesk.command('macros:report', MacrosReportCommand())
@@ -0,0 +1,51 @@
+import os
+import time
+import logging
+
+import superdesk
+from superdesk.errors import ParserError
+from superdesk.io.registry import registered_feed_parsers
+
+from belga.io.batch import parse_files
+
+logger = logging.getLogger(__name__)
+
+
+class ParseBacklogCommand(superdesk.Command):
+    """Parse backlog of wire files using a pool of worker processes.
+
+    Files are only parsed, nothing is ingested. It reports how long it takes
+    to drain the backlog for each given number of workers.
+
+    Example:
+    ::
+
+        $ python manage.py ingest:parse_backlog -p /mnt/afp -n belga_afp_newsml12 -w 1,2,4,8
+
+    """
+
+    option_list = [
+        superdesk.Option('--path', '-p', dest='path', required=True),
+        superdesk.Option('--parser', '-n', dest='parser_name', required=True),
+        superdesk.Option('--workers', '-w', dest='workers', default=str(os.cpu_count())),
+    ]
+
+    def run(self, path, parser_name, workers):
+        parser = registered_feed_parsers[parser_name]
+        file_paths = sorted(
+            os.path.join(path, filename) for filename in os.listdir(path)
+            if os.path.isfile(os.path.join(path, filename))
+        )
+        for count in (int(w) for w in workers.split(',')):
+            start = time.perf_counter()
+            results = parse_files(file_paths, parser, {'name': parser_name}, workers=count)
+            elapsed = time.perf_counter() - start
+            errors = [file_path for file_path, items in results if isinstance(items, ParserError)]
+            items = sum(len(items) for _, items in results if not isinstance(items, ParserError))
+            print('workers={} files={} items={} errors={} time={:.2f}s files/s={:.1f}'.format(
+                count, len(file_paths), items, len(errors), elapsed, len(file_paths) / elapsed if elapsed else 0))
+            for file_path in errors:
+                logger.warning('Failed to parse %s', file_path)
+
+
+superdesk.command('ingest:parse_backlog', ParseBacklogCommand())
@@ -0,0 +1,95 @@
+# -*- coding: utf-8; -*-
+#
+# This file is part of Superdesk.
+#
+# Copyright 2013 - 2020 Sourcefabric z.u. and contributors.
+#
+# For the full copyright and license information, please see the
+# AUTHORS and LICENSE files distributed with this source code, or
+# at https://www.sourcefabric.org/superdesk/license
+
+"""Editor state helpers complementing ``superdesk.editor_utils``."""
+
+from superdesk.editor_utils import ENTITY_MAP, ENTITY_RANGES, INLINE_STYLE_RANGES
+
+
+def _fix_ranges(content_state, block, changes):
+    """Move and resize ranges of block for replaced text.
+
+    Ranges overlapping with replaced text only partially are removed,
+    same as in ``superdesk.editor_utils.replace_text``.
+
+    :param changes: list of tuples (start, end, length difference) of replaced text
+    """
+    for range_field in (ENTITY_RANGES, INLINE_STYLE_RANGES):
+        if not block.get(range_field):
+            continue
+        ranges = []
+        for range_ in block[range_field]:
+            range_start = range_['offset']
+            range_end = range_start + range_['length']
+            offset = length = 0
+            overlapping = False
+            for start, end, diff in changes:
+                if end <= range_start:  # replaced before range, move it
+                    offset += diff
+                elif start >= range_end:  # replaced after range, changes are sorted
+                    break
+                elif range_start <= start and end <= range_end:  # replaced within range, fix length
+                    length += diff
+                else:
+                    overlapping = True
+                    break
+            if overlapping:
+                if range_field == ENTITY_RANGES:
+                    content_state[ENTITY_MAP].pop(str(range_['key']), None)
+                continue
+            range_['offset'] += offset
+            range_['length'] += length
+            ranges.append(range_)
+        block[range_field] = ranges
+
+
+def replace_all(content_state, pattern, repl):
+    """Replace all matches of compiled ``pattern`` in single pass over each text block.
+
+    Like ``superdesk.editor_utils.replace_text`` it only replaces text in text blocks
+    and tables, but any number of different strings can be replaced at once
+    using regex alternation.  Entity and inline style ranges are kept consistent.
+
+    :param dict content_state: Draft.js content state
+    :param pattern: compiled regular expression
+    :param repl: function getting match object and returning replacement
+    :return: number of replacements
+    """
+    count = 0
+    for block in content_state['blocks']:
+        if block.get('type') == 'atomic':
+            entity = content_state[ENTITY_MAP][str(block[ENTITY_RANGES][0]['key'])]
+            if entity['type'] == 'TABLE':
+                cells = entity['data']['data']['cells']
+                for row in cells.values():
+                    for cell in row.values():
+                        count += replace_all(cell, pattern, repl)
+            continue
+        text = block.get('text')
+        if not text:
+            continue
+        parts = []
+        changes = []
+        end = 0
+        for match in pattern.finditer(text):
+            new = repl(match)
+            if new == match.group():
+                continue
+            parts.append(text[end:match.start()])
+            parts.append(new)
+            changes.append((match.start(), match.end(), len(new) - len(match.group())))
+            end = match.end()
+        if not changes:
+            continue
+        parts.append(text[end:])
+        block['text'] = ''.join(parts)
+        _fix_ranges(content_state, block, changes)
+        count += len(changes)
+    return count
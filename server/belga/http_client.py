@@ -0,0 +1,128 @@
+# -*- coding: utf-8; -*-
+#
+# This file is part of Superdesk.
+#
+# Copyright 2013 - 2020 Sourcefabric z.u. and contributors.
+#
+# For the full copyright and license information, please see the
+# AUTHORS and LICENSE files distributed with this source code, or
+# at https://www.sourcefabric.org/superdesk/license
+
+"""HTTP clients shared by Belga search providers, formatters and feeding services.
+
+Search providers are created for every request, so each base url gets one
+process wide ``requests`` session with a connection pool, timeouts and retries
+which is reused by all provider instances and other callers of the same api.
+"""
+
+import time
+import logging
+import threading
+
+import requests
+from flask import current_app as app, has_app_context
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = (502, 503, 504)
+
+_clients = {}
+_lock = threading.Lock()
+
+
+def get_config(key, default):
+    # providers can be used outside of app context, eg. in tests
+    return app.config.get(key, default) if has_app_context() else default
+
+
+class HTTPClient():
+    """Pooled session for given base url."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        retries = get_config('HTTP_RETRIES', 3)
+        self.adapter = HTTPAdapter(
+            pool_maxsize=get_config('HTTP_POOL_SIZE', 10),
+            max_retries=Retry(
+                total=retries,
+                connect=retries,
+                read=retries,
+                status=retries,
+                backoff_factor=get_config('HTTP_RETRY_BACKOFF', 0.5),
+                status_forcelist=RETRY_STATUSES,
+                raise_on_status=False,
+            ),
+        )
+        self.session = requests.Session()
+        self.session.mount('http://', self.adapter)
+        self.session.mount('https://', self.adapter)
+        self.timeout = (get_config('HTTP_CONNECT_TIMEOUT', 5), get_config('HTTP_READ_TIMEOUT', 30))
+        self.stats_interval = get_config('HTTP_STATS_INTERVAL', 300)
+        self.stats_time = time.monotonic()
+
+    def get_stats(self):
+        """Get number of requests and new connections done by connection pools.
+
+        :return: dict with ``requests``, ``connections`` and ``reuse`` rate
+        """
+        requests_count = connections = 0
+        pools = self.adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is not None:
+                requests_count += pool.num_requests
+                connections += pool.num_connections
+        return {
+            'requests': requests_count,
+            'connections': connections,
+            'reuse': 1 - connections / requests_count if requests_count else 0,
+        }
+
+    def log_stats(self):
+        if not self.stats_interval or time.monotonic() - self.stats_time < self.stats_interval:
+            return
+        self.stats_time = time.monotonic()
+        stats = self.get_stats()
+        logger.info('HTTP client %s: %d requests, %d connections, reuse rate %.2f',
+                    self.base_url, stats['requests'], stats['connections'], stats['reuse'])
+
+
+class HTTPSession():
+    """Session like object using shared client of base url.
+
+    Requests use configured timeouts unless set explicitly.
+    """
+
+    def __init__(self, base_url):
+        self.client = get_client(base_url)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.client.timeout)
+        try:
+            return self.client.session.request(method, url, **kwargs)
+        finally:
+            self.client.log_stats()
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+
+def get_client(base_url):
+    """Get shared client of base url, it's created on first use."""
+    client = _clients.get(base_url)
+    if client is None:
+        with _lock:
+            client = _clients.get(base_url)
+            if client is None:
+                client = _clients[base_url] = HTTPClient(base_url)
+    return client
+
+
+def get_stats():
+    """Get connection stats of all clients in current process by base url."""
+    return {base_url: client.get_stats() for base_url, client in list(_clients.items())}
@@ -1,4 +1,3 @@
-
 # -*- coding: utf-8; -*-
 #
 # This file is part of Superdesk.
@@ -11,3 +10,10 @@
 
 from . import feed_parsers  # noqa
 from . import feeding_services  # noqa
+from . import duplicates
+from .feeding_services import email_belga
+
+
+def init_app(app):
+    duplicates.init_app(app)
+    email_belga.init_app(app)
@@ -0,0 +1,116 @@
+# -*- coding: utf-8; -*-
+#
+# This file is part of Superdesk.
+#
+# Copyright 2013 - 2020 Sourcefabric z.u. and contributors.
+#
+# For the full copyright and license information, please see the
+# AUTHORS and LICENSE files distributed with this source code, or
+# at https://www.sourcefabric.org/superdesk/license
+
+"""Parsing of wire files backlog using a pool of worker processes.
+
+Workers are forked from current process and get a snapshot of vocabularies
+used by parsers, so those don't have to query the database.  Duplicates are
+looked up for all items of the batch at once in the parent process, nothing
+is ingested so no fingerprints are recorded.
+
+It's used by ``ingest:parse_backlog`` command, feeding services of core
+(file, FTP) still parse files one by one.
+"""
+
+import os
+import logging
+
+from superdesk import get_resource_service
+from superdesk.errors import ParserError
+from superdesk.etree import etree
+from superdesk.io.feed_parsers import XMLFeedParser
+
+from belga.io.duplicates import filter_duplicates
+from belga.io.feed_parsers.belga_newsml_mixin import preloaded_vocabularies
+from belga.workers import get_pool
+
+logger = logging.getLogger(__name__)
+
+PRELOADED_VOCABULARIES = ('country', 'iptc_subject_codes')
+
+_worker = {}
+
+
+def get_vocabularies_snapshot():
+    vocabularies_service = get_resource_service('vocabularies')
+    snapshot = {}
+    for _id in PRELOADED_VOCABULARIES:
+        vocabulary = vocabularies_service.find_one(req=None, _id=_id)
+        if vocabulary is not None:
+            snapshot[_id] = vocabulary
+    return snapshot
+
+
+def _init_worker(parser, provider, vocabularies):
+    preloaded_vocabularies.update(vocabularies)
+    _worker.update(parser=parser, provider=provider)
+
+
+def parse_file(file_path, parser, provider=None):
+    """Parse single file the same way as file feeding service does.
+
+    :return: list of items
+    """
+    if isinstance(parser, XMLFeedParser):
+        with open(file_path, 'rb') as f:
+            items = parser.parse(etree.parse(f).getroot(), provider)
+    else:
+        items = parser.parse(file_path, provider)
+    return items if isinstance(items, list) else [items]
+
+
+def _parse_file(file_path):
+    try:
+        return parse_file(file_path, _worker['parser'], _worker['provider']), None
+    except Exception as ex:
+        # exceptions are not always picklable, only message is sent back
+        logger.exception('Failed to parse file %s', file_path)
+        return None, str(ex)
+
+
+def parse_files(file_paths, parser, provider=None, workers=None):
+    """Parse files in worker processes.
+
+    Results are in the same order as ``file_paths``, a file which can't be parsed
+    doesn't affect other files and gets ``ParserError`` instead of items.
+
+    :param list file_paths: paths of files to parse
+    :param parser: registered feed parser
+    :param dict provider: ingest provider
+    :param int workers: number of worker processes, number of CPUs by default
+    :return: list of tuples (file path, list of items or ``ParserError``)
+    """
+    provider = provider or {}
+    source = '{}-batch'.format(provider.get('name', parser.NAME))
+    workers = workers or os.cpu_count()
+    results = []
+
+    if workers > 1:
+        # workers are forked so parser is not pickled
+        with get_pool(workers, _init_worker, (parser, provider, get_vocabularies_snapshot())) as pool:
+            chunksize = max(1, len(file_paths) // (workers * 4))
+            for file_path, (items, error) in zip(file_paths, pool.imap(_parse_file, file_paths, chunksize)):
+                if error is not None:
+                    items = ParserError.parseFileError(source, os.path.basename(file_path), error, provider)
+                results.append((file_path, items))
+    else:
+        for file_path in file_paths:
+            try:
+                items = parse_file(file_path, parser, provider)
+            except Exception as ex:
+                items = ParserError.parseFileError(source, os.path.basename(file_path), ex, provider)
+            results.append((file_path, items))
+
+    parsed = [item for _, items in results if isinstance(items, list) for item in items]
+    kept = {id(item) for item in filter_duplicates(parsed, provider)}
+    return [
+        (file_path, [item for item in items if id(item) in kept] if isinstance(items, list) else items)
+        for file_path, items in results
+    ]
@@ -0,0 +1,288 @@
+# -*- coding: utf-8; -*-
+#
+# This file is part of Superdesk.
+#
+# Copyright 2013 - 2020 Sourcefabric z.u. and contributors.
+#
+# For the full copyright and license information, please see the
+# AUTHORS and LICENSE files distributed with this source code, or
+# at https://www.sourcefabric.org/superdesk/license
+
+"""Ingest-time detection of wire stories that were already received.
+
+Agencies re-send identical or near-identical stories.  Every parsed item gets a
+SimHash fingerprint of its normalized headline and body, which is looked up in
+a rolling index covering the last ``INGEST_DUPLICATES_WINDOW`` hours.  The index
+lives in memory for the current worker and in the ``ingest_fingerprints``
+collection so that it's shared between workers and survives restarts.
+
+Items are only looked up when parsed, fingerprints are recorded by feeding
+services once items are stored in ``ingest``, so items which failed to ingest
+or were parsed again don't hide stories received later.
+"""
+
+import re
+import hashlib
+import logging
+import threading
+from collections import deque
+from datetime import timedelta
+
+import superdesk
+from flask import current_app as app
+from superdesk.resource import Resource
+from superdesk.services import BaseService
+from superdesk.text_utils import get_text
+from superdesk.utc import utcnow
+
+logger = logging.getLogger(__name__)
+
+FINGERPRINT_BITS = 64
+BAND_BITS = 16
+SHINGLE_SIZE = 3
+#: fingerprint only the beginning of long stories, it keeps the cost per item bounded
+MAX_TOKENS = 1000
+#: maximal number of differing bits for stories to be considered near-identical
+MAX_DISTANCE = 3
+
+ACTION_TAG = 'tag'
+ACTION_SKIP = 'skip'
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def get_fingerprint(item):
+    """Compute SimHash fingerprint of item headline and body.
+
+    :param dict item: parsed item
+    :return: 64 bits fingerprint or ``None`` when there is no text
+    """
+    text = ' '.join((
+        item.get('headline') or '',
+        get_text(item.get('body_html') or '', content='html', lf_on_block=True),
+    ))
+    tokens = TOKEN_RE.findall(text.lower())[:MAX_TOKENS]
+    if not tokens:
+        return None
+    size = min(SHINGLE_SIZE, len(tokens))
+    shingles = {' '.join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+    bits = [
+        format(int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=8).digest(), 'big'), '064b')
+        for s in shingles
+    ]
+    # a bit is set in the fingerprint when it's set in majority of shingle hashes
+    threshold = len(bits) / 2
+    fingerprint = 0
+    for column in zip(*bits):
+        fingerprint = (fingerprint << 1) | (column.count('1') > threshold)
+    return fingerprint
+
+
+def get_bands(fingerprint):
+    """Split fingerprint into bands used as lookup keys.
+
+    Two fingerprints within ``MAX_DISTANCE`` bits share at least one band
+    as long as there are more bands than allowed differing bits.
+    """
+    mask = (1 << BAND_BITS) - 1
+    return ['{}:{:04x}'.format(i, (fingerprint >> (i * BAND_BITS)) & mask)
+            for i in range(FINGERPRINT_BITS // BAND_BITS)]
+
+
+def get_distance(a, b):
+    return bin(a ^ b).count('1')
+
+
+def get_family(item):
+    """Identifier shared by all revisions of the same story."""
+    return item.get('item_id') or item.get('guid')
+
+
+def is_duplicate(fingerprint, family, candidate):
+    """Test if fingerprint matches candidate entry.
+
+    Revisions of the same story are never considered duplicates, even re-sent
+    with identical text those can update metadata and are handled by ingest.
+    """
+    if candidate.get('family') == family:
+        return False
+    return get_distance(fingerprint, candidate['fingerprint']) <= MAX_DISTANCE
+
+
+def get_saved_guids(guids):
+    """Get guids of items which are stored in ingest using single query."""
+    if not guids:
+        return set()
+    cursor = app.data.get_mongo_collection('ingest').find({'guid': {'$in': list(guids)}}, projection={'guid': 1})
+    return {doc['guid'] for doc in cursor}
+
+
+class FingerprintIndex:
+    """Rolling in-memory fingerprint index looked up by bands."""
+
+    def __init__(self):
+        self._entries = deque()
+        self._bands = {}
+        self._lock = threading.Lock()
+
+    def add(self, entry):
+        with self._lock:
+            self._entries.append(entry)
+            for band in entry['bands']:
+                self._bands.setdefault(band, []).append(entry)
+
+    def find(self, fingerprint, family, bands):
+        """Get all entries matching fingerprint."""
+        with self._lock:
+            return [candidate for band in bands for candidate in self._bands.get(band, [])
+                    if is_duplicate(fingerprint, family, candidate)]
+
+    def expire(self, since):
+        with self._lock:
+            while self._entries and self._entries[0]['created'] < since:
+                entry = self._entries.popleft()
+                for band in entry['bands']:
+                    candidates = self._bands.get(band)
+                    if candidates is not None:
+                        candidates.remove(entry)
+                        if not candidates:
+                            del self._bands[band]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bands.clear()
+
+
+index = FingerprintIndex()
+
+
+class IngestFingerprintsResource(Resource):
+    schema = {
+        'guid': {'type': 'string'},
+        'family': {'type': 'string'},
+        'provider': {'type': 'string'},
+        'fingerprint': {'type': 'string'},
+        'bands': {'type': 'list'},
+        'created': {'type': 'datetime'},
+    }
+    internal_resource = True
+    mongo_indexes = {
+        'bands_1': ([('bands', 1)], {'background': True}),
+        # entries are only looked up within configured window, this is just housekeeping
+        'created_1': ([('created', 1)], {'expireAfterSeconds': 7 * 24 * 3600, 'background': True}),
+    }
+
+
+class IngestFingerprintsService(BaseService):
+
+    def find_entries(self, bands, since):
+        """Get entries having any of bands using single query."""
+        lookup = {'bands': {'$in': list(bands)}, 'created': {'$gte': since}}
+        return [dict(doc, fingerprint=int(doc['fingerprint'], 16)) for doc in self.find(lookup)]
+
+
+def get_entry(item, provider_id, created):
+    fingerprint = get_fingerprint(item)
+    if fingerprint is None:
+        return None
+    return {
+        'guid': item.get('guid'),
+        'family': get_family(item),
+        'provider': provider_id,
+        'fingerprint': fingerprint,
+        'bands': get_bands(fingerprint),
+        'created': created,
+    }
+
+
+def filter_duplicates(items, provider=None):
+    """Tag or skip items which were already ingested.
+
+    Does nothing unless ``INGEST_DUPLICATES_ENABLED`` is set.  With
+    ``INGEST_DUPLICATES_ACTION`` set to ``skip`` duplicates are removed,
+    otherwise those are kept with ``extra.duplicate_of`` set to the guid
+    of the matching item.  Items of the same batch are compared too.
+
+    Items missing in the in-memory index are looked up using single query,
+    and another one checks that matching items are still in ingest.
+    Nothing is recorded, see :func:`record_fingerprints`.
+
+    :param list items: parsed items
+    :param dict provider: ingest provider
+    :return: list of items
+    """
+    if not items or not app.config.get('INGEST_DUPLICATES_ENABLED'):
+        return items
+
+    now = utcnow()
+    since = now - timedelta(hours=app.config.get('INGEST_DUPLICATES_WINDOW', 24))
+    skip = app.config.get('INGEST_DUPLICATES_ACTION', ACTION_TAG) == ACTION_SKIP
+    provider_id = str((provider or {}).get('_id', ''))
+    index.expire(since)
+
+    entries = [get_entry(item, provider_id, now) for item in items]
+    candidates = [
+        index.find(entry['fingerprint'], entry['family'], entry['bands']) if entry else []
+        for entry in entries
+    ]
+    missing = {band for entry, found in zip(entries, candidates) if entry and not found for band in entry['bands']}
+    if missing:
+        stored = FingerprintIndex()
+        for candidate in superdesk.get_resource_service('ingest_fingerprints').find_entries(missing, since):
+            stored.add(candidate)
+        for entry, found in zip(entries, candidates):
+            if entry and not found:
+                found.extend(stored.find(entry['fingerprint'], entry['family'], entry['bands']))
+    saved = get_saved_guids({candidate['guid'] for found in candidates for candidate in found})
+
+    output = []
+    # items of this batch are not stored yet, but will be ingested together
+    batch = FingerprintIndex()
+    for item, entry, found in zip(items, entries, candidates):
+        if entry is None:
+            output.append(item)
+            continue
+        found = [candidate for candidate in found if candidate['guid'] in saved]
+        found.extend(batch.find(entry['fingerprint'], entry['family'], entry['bands']))
+        if found:
+            logger.info('Item %s is a duplicate of %s', item.get('guid'), found[0]['guid'])
+            if skip:
+                continue
+            item.setdefault('extra', {})['duplicate_of'] = found[0]['guid']
+        else:
+            batch.add(entry)
+        output.append(item)
+    return output
+
+
+def record_fingerprints(items, provider=None):
+    """Add fingerprints of ingested items to the index.
+
+    It must be called once items are stored in ingest.  Tagged duplicates
+    are not recorded, the original item is in the index already.
+
+    :param list items: ingested items
+    :param dict provider: ingest provider
+    """
+    if not items or not app.config.get('INGEST_DUPLICATES_ENABLED'):
+        return
+
+    now = utcnow()
+    provider_id = str((provider or {}).get('_id', ''))
+    entries = [
+        entry for entry in (
+            get_entry(item, provider_id, now) for item in items if not (item.get('extra') or {}).get('duplicate_of')
+        ) if entry is not None
+    ]
+    for entry in entries:
+        index.add(entry)
+    if entries:
+        superdesk.get_resource_service('ingest_fingerprints').post([
+            dict(entry, fingerprint='{:016x}'.format(entry['fingerprint'])) for entry in entries
+        ])
+
+
+def init_app(app):
+    superdesk.register_resource('ingest_fingerprints', IngestFingerprintsResource, IngestFingerprintsService,
+                                _app=app)
@@ -8,16 +8,15 @@
 # AUTHORS and LICENSE files distributed with this source code, or
 # at https://www.appendsourcefabric.org/superdesk/license
 
-import itertools
 import html
 import datetime
-import superdesk
 from superdesk.errors import ParserError
 from superdesk.etree import etree
 from superdesk.io.feed_parsers.newsml_1_2 import NewsMLOneFeedParser
 from superdesk.io.iptc import subject_codes
 
-from .belga_newsml_mixin import BelgaNewsMLMixin
+from belga.io.subjects import get_subjects, set_subjects_list
+from .belga_newsml_mixin import BelgaNewsMLMixin, get_vocabulary
 
 
 class SkipItemException(Exception):
@@ -74,24 +73,21 @@ class BaseBelgaNewsMLOneFeedParser(BelgaNewsMLMixin, NewsMLOneFeedParser):
                     item = item_envelop.copy()
                     self.parser_newsitem(item, newsitem_el)
                     # add product is NEWS/GENERAL, if product is empty
-                    if not [it for it in item.get('subject', []) if it.get('scheme') == 'services-products']:
-                        item.setdefault('subject', []).append({
+                    if not get_subjects(item).has_scheme('services-products'):
+                        get_subjects(item).add({
                             'name': 'NEWS/GENERAL',
                             'qcode': 'NEWS/GENERAL',
                             'parent': 'NEWS',
                             'scheme': 'services-products'
                         })
                     # Distribution is default
-                    item.setdefault('subject', []).extend([
+                    get_subjects(item).extend([
                         {"name": 'default', "qcode": 'default', "scheme": "distribution"},
                     ])
                     # Slugline and keywords is epmty
                     item['slugline'] = None
                     item['keywords'] = []
-                    # remove duplicated subject
-                    item['subject'] = [
-                        dict(i) for i, _ in itertools.groupby(sorted(item['subject'], key=lambda k: k['name']))
-                    ]
+                    set_subjects_list(item, key=lambda k: k['name'])
                     item = self.populate_fields(item)
                 except SkipItemException:
                     continue
@@ -178,7 +174,7 @@ class BaseBelgaNewsMLOneFeedParser(BelgaNewsMLMixin, NewsMLOneFeedParser):
         # LinkType is CV
         link_type = newsitem_el.attrib.get('LinkType', '')
         if link_type != '':
-            item.setdefault('subject', []).append({
+            get_subjects(item).add({
                 "name": link_type,
                 "qcode": link_type,
                 "scheme": "link_type"
@@ -251,7 +247,7 @@ class BaseBelgaNewsMLOneFeedParser(BelgaNewsMLMixin, NewsMLOneFeedParser):
 
         element = indent_el.find('NameLabel')
         if element is not None and element.text:
-            item.setdefault('subject', []).append({
+            get_subjects(item).add({
                 "name": element.text,
                 "qcode": element.text,
                 "scheme": "label"
@@ -360,7 +356,7 @@ class BaseBelgaNewsMLOneFeedParser(BelgaNewsMLMixin, NewsMLOneFeedParser):
         # Essential is CV
         essential = component_el.attrib.get('Essential')
         if essential:
-            item.setdefault('subject', []).append({
+            get_subjects(item).add({
                 "name": essential,
                 "qcode": essential,
                 "scheme": "essential"
@@ -369,7 +365,7 @@ class BaseBelgaNewsMLOneFeedParser(BelgaNewsMLMixin, NewsMLOneFeedParser):
         # EquivalentsList is CV
         equivalents_list = component_el.attrib.get('EquivalentsList')
         if equivalents_list:
-            item.setdefault('subject', []).append({
+            get_subjects(item).add({
                 "name": equivalents_list,
                 "qcode": equivalents_list,
                 "scheme": "equivalents_list"
@@ -509,7 +505,7 @@ class BaseBelgaNewsMLOneFeedParser(BelgaNewsMLMixin, NewsMLOneFeedParser):
         for element in descript_el.findall('Genre'):
             if element is not None and element.get('FormalName'):
                 # genre CV
-                item.setdefault('subject', []).append({
+                get_subjects(item).add({
                     "name": element.get('FormalName'),
                     "qcode": element.get('FormalName'),
                     "scheme": "genre"
@@ -523,7 +519,7 @@ class BaseBelgaNewsMLOneFeedParser(BelgaNewsMLMixin, NewsMLOneFeedParser):
         subjects = descript_el.findall('SubjectCode/SubjectDetail')
         subjects += descript_el.findall('SubjectCode/SubjectMatter')
         subjects += descript_el.findall('SubjectCode/Subject')
-        item.setdefault('subject', []).extend(self.format_subjects(subjects))
+        get_subjects(item).extend(self.format_subjects(subjects))
         for subject in subjects:
             if subject.get('cat'):
                 category = {'qcode': subject.get('cat')}
@@ -533,7 +529,7 @@ class BaseBelgaNewsMLOneFeedParser(BelgaNewsMLMixin, NewsMLOneFeedParser):
         # parser OfInterestTo is CV
         for element in descript_el.findall('OfInterestTo'):
             if element is not None and element.get('FormalName'):
-                item.setdefault('subject', []).append({
+                get_subjects(item).add({
                     "name": element.get('FormalName'),
                     "qcode": element.get('FormalName'),
                     "scheme": "of_interest_to"
@@ -557,7 +553,7 @@ class BaseBelgaNewsMLOneFeedParser(BelgaNewsMLMixin, NewsMLOneFeedParser):
                     country = element.attrib.get('Value')
                     item['extra']['country'] = country
                     # country keywords is CV
-                    item.setdefault('subject', []).extend(self._get_country(country))
+                    get_subjects(item).extend(self._get_country(country))
                 if element.attrib.get('FormalName', '') == 'City':
                     item['extra']['city'] = element.attrib.get('Value')
                 if element.attrib.get('FormalName', '') == 'CountryArea':
@@ -717,4 +713,4 @@ class BaseBelgaNewsMLOneFeedParser(BelgaNewsMLMixin, NewsMLOneFeedParser):
         return '<p>' + text + '</p>'
 
     def _get_cv(self, _id):
-        return superdesk.get_resource_service('vocabularies').find_one(req=None, _id=_id)
+        return get_vocabulary(_id)
@@ -10,6 +10,7 @@
 
 from superdesk.io.registry import register_feed_parser
 from superdesk.text_utils import get_text
+from belga.io.subjects import get_subjects
 from .base_belga_newsml_1_2 import BaseBelgaNewsMLOneFeedParser
 
 
@@ -33,7 +34,7 @@ class BelgaAFPNewsMLOneFeedParser(BaseBelgaNewsMLOneFeedParser):
         # mapping services-products from category, and have only one product
         for category in item.get('anpa_category', []):
             qcode = self.MAPPING_CATEGORY.get(category.get('qcode'), 'NEWS/GENERAL')
-            item.setdefault('subject', []).append({
+            get_subjects(item).add({
                 'name': qcode,
                 'qcode': qcode,
                 'parent': 'NEWS',
@@ -41,7 +42,7 @@ class BelgaAFPNewsMLOneFeedParser(BaseBelgaNewsMLOneFeedParser):
             })
             break
         else:
-            item.setdefault('subject', []).append({
+            get_subjects(item).add({
                 'name': 'NEWS/GENERAL',
                 'qcode': 'NEWS/GENERAL',
                 'parent': 'NEWS',
@@ -54,10 +55,10 @@ class BelgaAFPNewsMLOneFeedParser(BaseBelgaNewsMLOneFeedParser):
                     item['headline'] = 'URGENT: ' + line.strip()
                     break
         # Label must be empty
-        item['subject'] = [i for i in item['subject'] if i.get('scheme') != 'label']
+        get_subjects(item).discard_scheme('label')
         # Source is AFP
         credit = {"name": 'AFP', "qcode": 'AFP', "scheme": "sources"}
-        item.setdefault('subject', []).append(credit)
+        get_subjects(item).add(credit)
 
         return item
 
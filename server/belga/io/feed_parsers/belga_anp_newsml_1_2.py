@@ -12,6 +12,7 @@ import pytz
 
 from superdesk.io.registry import register_feed_parser
 
+from belga.io.subjects import get_subjects
 from .base_belga_newsml_1_2 import BaseBelgaNewsMLOneFeedParser
 
 
@@ -34,26 +35,18 @@ class BelgaANPNewsMLOneFeedParser(BaseBelgaNewsMLOneFeedParser):
 
     def parser_newsitem(self, item, newsitem_el):
         super().parser_newsitem(item, newsitem_el)
-        for subject in item.get('subject', []):
-            if subject.get('scheme', '') == 'genre':
-                qcode = self.MAPPING_PRODUCTS.get(subject.get('name'), 'NEWS/GENERAL')
-                item.setdefault('subject', []).append({
-                    'name': qcode,
-                    'qcode': qcode,
-                    'parent': 'NEWS',
-                    'scheme': 'services-products'
-                })
-                break
-        else:
-            item.setdefault('subject', []).append({
-                'name': 'NEWS/GENERAL',
-                'qcode': 'NEWS/GENERAL',
-                'parent': 'NEWS',
-                'scheme': 'services-products'
-            })
+        subjects = get_subjects(item)
+        genre = next((subject for subject in subjects if subject.get('scheme', '') == 'genre'), None)
+        qcode = self.MAPPING_PRODUCTS.get(genre.get('name'), 'NEWS/GENERAL') if genre else 'NEWS/GENERAL'
+        subjects.add({
+            'name': qcode,
+            'qcode': qcode,
+            'parent': 'NEWS',
+            'scheme': 'services-products'
+        })
         # Source is ANP
         credit = {"name": 'ANP', "qcode": 'ANP', "scheme": "sources"}
-        item.setdefault('subject', []).append(credit)
+        get_subjects(item).add(credit)
         return item
 
 
@@ -18,6 +18,7 @@ from superdesk.io.feed_parsers.anpa import ANPAFeedParser
 from superdesk.metadata.item import ITEM_TYPE, CONTENT_TYPE, GUID_FIELD, GUID_TAG, FORMAT, FORMATS
 import pytz
 from superdesk.metadata.utils import generate_guid
+from belga.io.subjects import get_subjects, set_subjects_list
 
 
 class BelgaANPAFeedParser(ANPAFeedParser):
@@ -67,7 +68,7 @@ class BelgaANPAFeedParser(ANPAFeedParser):
                 item['anpa_category'] = [{'qcode': qcode}]
                 # Mapping product
                 qcode = self.MAPPING_PRODUCTS.get(qcode, 'NEWS/GENERAL')
-                item.setdefault('subject', []).extend([
+                get_subjects(item).extend([
                     {'name': qcode, 'qcode': qcode, 'parent': 'NEWS', 'scheme': 'services-products'},
                     {'name': 'KYODO', 'qcode': 'KYODO', 'scheme': 'sources'},
                     {'name': 'default', 'qcode': 'default', 'scheme': 'distribution'},
@@ -125,7 +126,7 @@ class BelgaANPAFeedParser(ANPAFeedParser):
             # Slugline and keywords is epmty
             item['slugline'] = None
             item['keywords'] = []
-            return item
+            return set_subjects_list(item)
         except Exception as ex:
             raise ParserError.anpaParseFileError(file_path, ex)
 
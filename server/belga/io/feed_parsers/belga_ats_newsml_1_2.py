@@ -12,6 +12,7 @@ import logging
 import pytz
 
 from superdesk.io.registry import register_feed_parser
+from belga.io.subjects import get_subjects
 from .base_belga_newsml_1_2 import BaseBelgaNewsMLOneFeedParser
 
 logger = logging.getLogger(__name__)
@@ -41,7 +42,7 @@ class BelgaATSNewsMLOneFeedParser(BaseBelgaNewsMLOneFeedParser):
         item['versioncreated'] = item['versioncreated'].astimezone(pytz.utc)
         # Source is ATS
         credit = {"name": 'ATS', "qcode": 'ATS', "scheme": "sources"}
-        item.setdefault('subject', []).append(credit)
+        get_subjects(item).add(credit)
 
     def parser_newscomponent(self, item, newscomponent_el):
         """
@@ -20,6 +20,7 @@ from superdesk.io.registry import register_feed_parser
 from superdesk.errors import ParserError
 from superdesk.metadata.item import CONTENT_TYPE
 
+from belga.io.subjects import SubjectSet, get_subjects, set_subjects_list
 from .belga_newsml_mixin import BelgaNewsMLMixin
 
 logger = logging.getLogger(__name__)
@@ -75,7 +76,7 @@ class BelgaDPANewsMLTwoFeedParser(BelgaNewsMLMixin, NewsMLTwoFeedParser):
                             cat.get('qcode', '').upper(),
                             'NEWS/GENERAL'
                         )
-                        item.setdefault('subject', []).append({
+                        get_subjects(item).add({
                             'name': qcode,
                             'qcode': qcode,
                             'parent': 'NEWS',
@@ -83,7 +84,7 @@ class BelgaDPANewsMLTwoFeedParser(BelgaNewsMLMixin, NewsMLTwoFeedParser):
                         })
                         break
                     else:
-                        item.setdefault('subject', []).append({
+                        get_subjects(item).add({
                             'name': 'NEWS/GENERAL',
                             'qcode': 'NEWS/GENERAL',
                             'parent': 'NEWS',
@@ -92,14 +93,14 @@ class BelgaDPANewsMLTwoFeedParser(BelgaNewsMLMixin, NewsMLTwoFeedParser):
 
                     # Source is DPA
                     credit = {"name": 'DPA', "qcode": 'DPA', "scheme": "sources"}
-                    item.setdefault('subject', []).append(credit)
+                    get_subjects(item).add(credit)
                     # Distribution is default
                     dist = {"name": 'default', "qcode": 'default', "scheme": "distribution"}
-                    item.setdefault('subject', []).append(dist)
+                    get_subjects(item).add(dist)
                     # Slugline and keywords is epmty
                     item['slugline'] = None
                     item['keywords'] = []
-                    items.append(item)
+                    items.append(set_subjects_list(item))
             return items
         except Exception as ex:
             raise ParserError.newsmlTwoParserError(ex, provider)
@@ -153,7 +154,7 @@ class BelgaDPANewsMLTwoFeedParser(BelgaNewsMLMixin, NewsMLTwoFeedParser):
 
     def parse_content_subject(self, tree, item):
         """Parse subj type subjects into subject list."""
-        item['subject'] = []
+        item['subject'] = SubjectSet()
         item['extra'] = {}
         for subject_elt in tree.findall(self.qname('subject')):
             sub_type = subject_elt.get('type', '')
@@ -162,7 +163,7 @@ class BelgaDPANewsMLTwoFeedParser(BelgaNewsMLMixin, NewsMLTwoFeedParser):
                 for same_as_elt in same_as_elts:
                     subject_data = self._get_data_subject(same_as_elt)
                     if subject_data:
-                        item.setdefault('subject', []).append(subject_data)
+                        get_subjects(item).add(subject_data)
                         break
             if sub_type == 'dpatype:category':
                 qcode_parts = subject_elt.get('qcode', '').split(':')
@@ -177,7 +178,7 @@ class BelgaDPANewsMLTwoFeedParser(BelgaNewsMLMixin, NewsMLTwoFeedParser):
                     code = i.find(self.qname('name')).text
                     if len(code) == 3:
                         country_keyword = self._get_country(code)
-                        item.setdefault('subject', []).extend(country_keyword)
+                        get_subjects(item).extend(country_keyword)
                         break
 
     def parse_authors(self, meta, item):
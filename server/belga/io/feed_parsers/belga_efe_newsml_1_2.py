@@ -11,6 +11,7 @@
 from superdesk import get_resource_service
 from superdesk.io.registry import register_feed_parser
 
+from belga.io.subjects import get_subjects
 from .base_belga_newsml_1_2 import BaseBelgaNewsMLOneFeedParser
 
 
@@ -35,14 +36,14 @@ class BelgaEFENewsMLOneFeedParser(BaseBelgaNewsMLOneFeedParser):
             if qcode:
                 item.setdefault('anpa_category', []).append({'qcode': qcode})
                 qcode = self.MAPPING_PRODUCTS.get(qcode, 'NEWS/GENERAL')
-                item.setdefault('subject', []).append({
+                get_subjects(item).add({
                     'name': qcode,
                     'qcode': qcode,
                     'parent': 'NEWS',
                     'scheme': 'services-products'
                 })
             else:
-                item.setdefault('subject', []).append({
+                get_subjects(item).add({
                     'name': 'NEWS/GENERAL',
                     'qcode': 'NEWS/GENERAL',
                     'parent': 'NEWS',
@@ -50,7 +51,7 @@ class BelgaEFENewsMLOneFeedParser(BaseBelgaNewsMLOneFeedParser):
                 })
         # source is EFE
         credit = {"name": 'EFE', "qcode": 'EFE', "scheme": "sources"}
-        item.setdefault('subject', []).append(credit)
+        get_subjects(item).add(credit)
         return item
 
 
@@ -0,0 +1,244 @@
+# -*- coding: utf-8; -*-
+#
+# This file is part of Superdesk.
+#
+# Copyright 2013 - 2020 Sourcefabric z.u. and contributors.
+#
+# For the full copyright and license information, please see the
+# AUTHORS and LICENSE files distributed with this source code, or
+# at https://www.sourcefabric.org/superdesk/license
+
+import io
+import email
+import binascii
+import logging
+import datetime
+import tempfile
+
+import eve
+from flask import current_app as app
+from pytz import timezone
+from superdesk import get_resource_service
+from superdesk.errors import IngestEmailError
+from superdesk.filemeta import set_filemeta
+from superdesk.io.feed_parsers.rfc822 import EMailRFC822FeedParser, email_regex
+from superdesk.media.media_operations import process_file_from_stream
+from superdesk.metadata.item import ITEM_TYPE, CONTENT_TYPE, GUID_TAG, FORMATS, FORMAT
+from superdesk.metadata.utils import generate_guid
+from superdesk.text_utils import sanitize_html
+from superdesk.users.errors import UserNotRegisteredException
+from superdesk.utc import utcnow
+
+logger = logging.getLogger(__name__)
+
+DECODE_CHUNK_SIZE = 64 * 1024
+
+
+def get_message(data):
+    """Parse email message from fetched data."""
+    for response_part in data:
+        if isinstance(response_part, tuple):
+            return email.message_from_bytes(response_part[1])
+
+
+def decode_payload(part):
+    """Decode message part payload into a temporary file.
+
+    Payload is decoded in chunks so that decoded content is never in memory
+    as a whole, file is moved to disk once it's bigger than ``EMAIL_ATTACHMENT_SPOOL_SIZE``.
+
+    :param part: email message part
+    :return: file object positioned at the beginning
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=app.config.get('EMAIL_ATTACHMENT_SPOOL_SIZE', 1024 * 1024))
+    encoding = part.get('Content-Transfer-Encoding', '').strip().lower()
+    payload = part.get_payload()
+    if encoding == 'base64' and isinstance(payload, str):
+        buffer = []
+        size = 0
+        for line in io.StringIO(payload):
+            line = line.strip()
+            buffer.append(line)
+            size += len(line)
+            if size >= DECODE_CHUNK_SIZE:
+                chunk = ''.join(buffer)
+                # decode only whole 4 characters groups, rest goes to next chunk
+                end = len(chunk) - len(chunk) % 4
+                spool.write(binascii.a2b_base64(chunk[:end]))
+                buffer = [chunk[end:]]
+                size = len(buffer[0])
+        chunk = ''.join(buffer)
+        if chunk:
+            spool.write(binascii.a2b_base64(chunk + '=' * (-len(chunk) % 4)))
+    elif encoding == 'quoted-printable' and isinstance(payload, str):
+        for line in io.StringIO(payload):
+            spool.write(binascii.a2b_qp(line.encode('ascii', 'surrogateescape')))
+    else:
+        spool.write(part.get_payload(decode=True) or b'')
+    spool.seek(0)
+    return spool
+
+
+class BelgaEmailRFC822FeedParser(EMailRFC822FeedParser):
+    """RFC822 parser which can parse already parsed email message.
+
+    It's used by email belga feeding service instead of core parser, so the message
+    parsed by the service is shared with the parser and attachments processing.
+    Items are the same as core parser creates, except images are decoded into temporary
+    files and mails without any text part get empty body.
+    """
+
+    def parse(self, data, provider=None):
+        if provider.get('config', {}).get('formatted', False):
+            return self._parse_formatted_email(data, provider)
+        return self.parse_message(get_message(data), provider)
+
+    def parse_message(self, msg, provider=None):
+        """Parse email message, works the same way as ``parse`` of core parser.
+
+        Core parser only parses raw data, so walking message parts is done here
+        and storing of images is done by :meth:`_save_image`.
+
+        :param msg: ``email.message.Message`` instance
+        :param dict provider: ingest provider
+        :return: list of items
+        """
+        if provider.get('config', {}).get('formatted', False):
+            # rarely used, core parser only works with raw data
+            return self._parse_formatted_email([(b'', msg.as_bytes())], provider)
+        try:
+            new_items = []
+            # create an item for the body text of the email
+            item = {ITEM_TYPE: CONTENT_TYPE.TEXT, 'versioncreated': utcnow()}
+            comp_item = None
+            # a list to keep the references to the attachments
+            refs = []
+            html_body = None
+            text_body = None
+
+            item['headline'] = self.parse_header(msg['subject'])
+            field_from = self.parse_header(msg['from'])
+            item['original_source'] = field_from
+            try:
+                if email_regex.findall(field_from):
+                    email_address = email_regex.findall(field_from)[0]
+                    user = get_resource_service('users').get_user_by_email(email_address)
+                    item['original_creator'] = user[eve.utils.config.ID_FIELD]
+            except UserNotRegisteredException:
+                pass
+            item['guid'] = msg['Message-ID']
+            date_tuple = email.utils.parsedate_tz(msg['Date'])
+            if date_tuple:
+                dt = datetime.datetime.utcfromtimestamp(email.utils.mktime_tz(date_tuple))
+                item['firstcreated'] = dt.replace(tzinfo=timezone('utc'))
+
+            for part in msg.walk():
+                if part.get_content_type() == 'text/plain':
+                    try:
+                        text_body = self._decode_body(part)
+                    except Exception as ex:
+                        logger.exception('Exception parsing text body for {0} from {1}: {2}'.format(
+                            item['headline'], field_from, ex))
+                    continue
+                if part.get_content_type() == 'text/html':
+                    try:
+                        html_body = sanitize_html(self._decode_body(part))
+                    except Exception as ex:
+                        logger.exception('Exception parsing html body for {0} from {1}: {2}'.format(
+                            item['headline'], field_from, ex))
+                    continue
+                if part.get_content_maintype() == 'multipart' or part.get('Content-Disposition') is None:
+                    continue
+                # we are only going to pull off image attachments at this stage
+                if part.get_content_maintype() != 'image':
+                    continue
+
+                file_name = part.get_filename()
+                if not file_name:
+                    continue
+                image = self._save_image(part)
+                if image is None:
+                    continue
+                image_id, content_type, metadata = image
+
+                # if we have not got a composite item then create one
+                if not comp_item:
+                    comp_item = {
+                        ITEM_TYPE: CONTENT_TYPE.COMPOSITE,
+                        'guid': generate_guid(type=GUID_TAG),
+                        'versioncreated': utcnow(),
+                        'groups': [],
+                        'headline': item['headline'],
+                        'original_source': item['original_source'],
+                    }
+                    # create a reference to the item that stores the body of the email
+                    item_ref = {'guid': item['guid'], 'residRef': item['guid'],
+                                'headline': item['headline'], 'location': 'ingest',
+                                'itemClass': 'icls:text', 'original_source': item['original_source']}
+                    if 'original_creator' in item:
+                        comp_item['original_creator'] = item['original_creator']
+                        item_ref['original_creator'] = item['original_creator']
+                    refs.append(item_ref)
+
+                media_item = {
+                    'guid': generate_guid(type=GUID_TAG),
+                    'versioncreated': utcnow(),
+                    ITEM_TYPE: CONTENT_TYPE.PICTURE,
+                    'renditions': {'baseImage': {'href': image_id}},
+                    'mimetype': content_type,
+                    'slugline': file_name,
+                    'headline': item['headline'],
+                    'original_source': item['original_source'],
+                }
+                set_filemeta(media_item, metadata)
+                if text_body is not None:
+                    media_item['body_html'] = text_body
+                # add a reference to this item in the composite item
+                media_ref = {'guid': media_item['guid'], 'residRef': media_item['guid'],
+                             'headline': file_name, 'location': 'ingest', 'itemClass': 'icls:picture',
+                             'original_source': item['original_source']}
+                if 'original_creator' in item:
+                    media_item['original_creator'] = item['original_creator']
+                    media_ref['original_creator'] = item['original_creator']
+                new_items.append(media_item)
+                refs.append(media_ref)
+
+            if html_body:
+                item['body_html'] = html_body
+            elif text_body is not None:
+                item['body_html'] = '<pre>' + text_body + '</pre>'
+                item[FORMAT] = FORMATS.PRESERVED
+            else:
+                item['body_html'] = ''
+
+            # if there is composite item then add the main group and references
+            if comp_item:
+                comp_item['groups'].append({'refs': [{'idRef': 'main'}], 'id': 'root', 'role': 'grpRole:NEP'})
+                comp_item['groups'].append({'refs': refs, 'id': 'main', 'role': 'grpRole:Main'})
+                new_items.append(comp_item)
+
+            new_items.append(item)
+            return new_items
+        except Exception as ex:
+            raise IngestEmailError.emailParseError(ex, provider)
+
+    def _save_image(self, part):
+        """Store image attachment using temporary file instead of decoding it in memory.
+
+        :param part: email message part
+        :return: tuple (media id, content type, metadata) or ``None`` for images which are not ingested
+        """
+        with decode_payload(part) as content:
+            _, content_type, metadata = process_file_from_stream(content, part.get_content_type())
+            if content_type == 'image/gif' or content_type == 'image/png':
+                return None
+            content.seek(0)
+            image_id = self.parser_app.media.put(content, filename=part.get_filename(),
+                                                 content_type=content_type, metadata=metadata)
+        return image_id, content_type, metadata
+
+    def _decode_body(self, part):
+        body = part.get_payload(decode=True)
+        charset = part.get_content_charset()
+        # if we don't know the charset just have a go!
+        return body.decode(charset) if charset else body.decode()
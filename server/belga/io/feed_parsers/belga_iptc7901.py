@@ -18,6 +18,7 @@ from superdesk.io.feed_parsers.dpa_iptc7901 import DPAIPTC7901FeedParser
 from superdesk.metadata.utils import generate_guid
 from superdesk.metadata.item import ITEM_TYPE, CONTENT_TYPE, GUID_TAG
 from superdesk.utc import utcnow
+from belga.io.subjects import get_subjects, set_subjects_list
 
 logger = logging.getLogger(__name__)
 
@@ -89,7 +90,7 @@ class BelgaIPTC7901FeedParser(DPAIPTC7901FeedParser):
             item.get('lead', '').replace(char, replace_char)
 
         item[ITEM_TYPE] = CONTENT_TYPE.TEXT
-        return item
+        return set_subjects_list(item)
 
     def parse_content_ats(self, file_path, provider=None):
         try:
@@ -112,13 +113,13 @@ class BelgaIPTC7901FeedParser(DPAIPTC7901FeedParser):
                 item['priority'] = self.map_priority(m.group(3).decode())
                 item['anpa_category'] = [{'qcode': self.map_category(qcode)}]
                 qcode = self.MAPPING_PRODUCTS['ats'].get(qcode, 'NEWS/GENERAL')
-                item.setdefault('subject', []).append({
+                get_subjects(item).add({
                     'name': qcode,
                     'qcode': qcode,
                     'parent': 'NEWS',
                     'scheme': 'services-products'
                 })
-                item['subject'].extend([
+                get_subjects(item).extend([
                     {"name": 'ATS', "qcode": 'ATS', "scheme": "sources"},
                     {"name": 'default', "qcode": 'default', "scheme": "distribution"},
                 ])
@@ -159,7 +160,7 @@ class BelgaIPTC7901FeedParser(DPAIPTC7901FeedParser):
                 item['anpa_category'] = [{'qcode': self.map_category(qcode)}]
                 # mapping product
                 qcode = self.MAPPING_PRODUCTS['dpa'].get(qcode, 'NEWS/GENERAL')
-                item.setdefault('subject', []).append({
+                get_subjects(item).add({
                     'name': qcode,
                     'qcode': qcode,
                     'parent': 'NEWS',
@@ -167,10 +168,10 @@ class BelgaIPTC7901FeedParser(DPAIPTC7901FeedParser):
                 })
                 # source is DPA
                 credit = {"name": 'DPA', "qcode": 'DPA', "scheme": "sources"}
-                item.setdefault('subject', []).append(credit)
+                get_subjects(item).add(credit)
                 # Distribution is default
                 dist = {"name": 'default', "qcode": 'default', "scheme": "distribution"}
-                item.setdefault('subject', []).append(dist)
+                get_subjects(item).add(dist)
                 item['word_count'] = int(m.group(5).decode())
 
             inHeader = False
@@ -14,6 +14,7 @@ from superdesk.errors import ParserError
 from superdesk.io.registry import register_feed_parser
 from superdesk.publish.formatters.newsml_g2_formatter import XML_LANG
 from superdesk.utc import local_to_utc
+from belga.io.subjects import get_subjects, set_subjects_list
 from .base_belga_newsml_1_2 import BaseBelgaNewsMLOneFeedParser, SkipItemException
 
 
@@ -85,8 +86,7 @@ class BelgaNewsMLOneFeedParser(BaseBelgaNewsMLOneFeedParser):
                     self.parser_newsitem(newsitem_el)
                 except SkipItemException:
                     continue
-                # l_item.append(item)
-            return self._items
+            return [set_subjects_list(item) for item in self._items]
 
         except Exception as ex:
             raise ParserError.newsmlOneParserError(ex, provider)
@@ -148,7 +148,7 @@ class BelgaNewsMLOneFeedParser(BaseBelgaNewsMLOneFeedParser):
             for element in news_component_1.findall('DescriptiveMetadata/Genre'):
                 if element.get('FormalName'):
                     # genre CV
-                    self._item_seed.setdefault('subject', []).append({
+                    get_subjects(self._item_seed).add({
                         "name": element.get('FormalName'),
                         "qcode": element.get('FormalName'),
                         "scheme": "genre"
@@ -461,7 +461,7 @@ class BelgaNewsMLOneFeedParser(BaseBelgaNewsMLOneFeedParser):
             news_product = news_package_elem.find('Property[@FormalName="NewsProduct"]')
             if news_service is not None and news_product is not None:
                 qcode = '{}/{}'.format(news_service.get('Value'), news_product.get('Value'))
-                item.setdefault('subject', []).append({
+                get_subjects(item).add({
                     'name': qcode,
                     'qcode': qcode,
                     'parent': news_service.get('Value'),
@@ -471,7 +471,7 @@ class BelgaNewsMLOneFeedParser(BaseBelgaNewsMLOneFeedParser):
         # label CV
         for element in admin_el.findall('Property[@FormalName="Label"]'):
             if element is not None and element.get('Value'):
-                item.setdefault('subject', []).append({
+                get_subjects(item).add({
                     "name": element.get('Value'),
                     "qcode": element.get('Value'),
                     "scheme": "label"
@@ -10,6 +10,15 @@
 
 from superdesk import get_resource_service
 
+#: vocabularies loaded upfront by batch parsing workers, see :mod:`belga.io.batch`
+preloaded_vocabularies = {}
+
+
+def get_vocabulary(_id):
+    if _id in preloaded_vocabularies:
+        return preloaded_vocabularies[_id]
+    return get_resource_service('vocabularies').find_one(req=None, _id=_id)
+
 
 class BelgaNewsMLMixin:
     def __init__(self, *args, **kwargs):
@@ -18,7 +27,7 @@ class BelgaNewsMLMixin:
 
     def _get_country(self, country_code):
         if not self._countries:
-            self._countries = get_resource_service('vocabularies').find_one(req=None, _id='country').get('items', [])
+            self._countries = get_vocabulary('country').get('items', [])
 
         return [
             {'name': c['name'], 'qcode': c['qcode'], 'translations': c['translations'], 'scheme': 'country'}
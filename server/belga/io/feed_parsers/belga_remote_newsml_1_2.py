@@ -25,6 +25,7 @@ from superdesk.io.feeding_services import FileFeedingService, FTPFeedingService
 from superdesk.io.registry import register_feed_parser
 from superdesk.media.media_operations import process_file_from_stream
 
+from belga.io.subjects import get_subjects
 from .belga_newsml_1_2 import BelgaNewsMLOneFeedParser, SkipItemException
 
 logger = logging.getLogger(__name__)
@@ -86,7 +87,7 @@ class BelgaRemoteNewsMLOneFeedParser(BelgaNewsMLOneFeedParser):
             for element in news_component_1.findall('DescriptiveMetadata/Genre'):
                 if element.get('FormalName'):
                     # genre CV
-                    self._item_seed.setdefault('subject', []).append({
+                    get_subjects(self._item_seed).add({
                         "name": element.get('FormalName'),
                         "qcode": element.get('FormalName'),
                         "scheme": "genre"
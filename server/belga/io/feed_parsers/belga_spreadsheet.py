@@ -8,6 +8,7 @@
 # AUTHORS and LICENSE files distributed with this source code, or
 # at https://www.sourcefabric.org/superdesk/license
 
+import hashlib
 import logging
 from datetime import timedelta
 
@@ -66,139 +67,242 @@ class BelgaSpreadsheetParser(FeedParser):
             return False
 
     def parse(self, data, provider=None):
+        items, cells_list, _ = self.parse_rows(data, provider)
+        return items, cells_list
+
+    def parse_rows(self, data, provider=None, row_hashes=None):
+        """Parse rows which are new or were modified since last time.
+
+        Rows are identified by hash of their values, a row with hash in ``row_hashes``
+        was already processed and is skipped.  Hashes are keyed by content rather than
+        row number so inserting or sorting rows doesn't trigger reprocessing, identical
+        rows are told apart by their occurrence, see :meth:`get_row_hashes`.
+
+        :param list data: worksheet values, first row contains titles
+        :param dict provider: ingest provider
+        :param set row_hashes: hashes of rows processed before
+        :return: tuple (items, cells to update, hashes of rows once cells are updated)
+        """
         index = self.parse_titles(data[0])
+        # skip first two title rows
+        rows = [(row, data[row - 1]) for row in range(3, len(data) + 1)]
+        return self.parse_batch(rows, index, provider, row_hashes)
+
+    def parse_batch(self, rows, index, provider=None, row_hashes=None, hashes=None):
+        """Parse batch of rows, see :meth:`parse_rows`.
+
+        :param list rows: list of tuples (row number, row values)
+        :param dict index: titles index
+        :param dict provider: ingest provider
+        :param set row_hashes: hashes of rows processed before
+        :param list hashes: hashes of rows, computed using :meth:`get_row_hashes` if not set
+        :return: tuple (items, cells to update, hashes of rows once cells are updated)
+        """
+        row_hashes = row_hashes or set()
         items = []
         cells_list = []  # use for patch update to reduce write requests usage
-        # skip first two title rows
-        for row in range(3, len(data) + 1):
-            if not row:
-                break
-            item = {}
-            error_message = None
-            values = data[row - 1]
-            is_updated = values[index['_STATUS']].strip().upper() if len(values) - 1 > index['_STATUS'] else None
-
-            try:
-                # only insert item if _STATUS is empty
-                if is_updated in ('UPDATED', 'ERROR'):
-                    guid = values[index['_GUID']]
-                    # check if it's exists and guid is valid
-                    if not superdesk.get_resource_service('events').find_one(guid=guid, req=None):
-                        raise KeyError('GUID is not exists')
+        if hashes is None:
+            hashes = self.get_row_hashes([values for _, values in rows])
+        updated_values = [values for _, values in rows]
+        rows = [(i, row, values) for i, (row, values) in enumerate(rows) if hashes[i] not in row_hashes]
+
+        # check all guids of updated rows using single query
+        guids = [guid for guid in (self.get_updated_guid(values, index) for _, _, values in rows) if guid]
+        existing_guids = set()
+        if guids:
+            events = superdesk.get_resource_service('events').find({'guid': {'$in': guids}})
+            existing_guids.update(event['guid'] for event in events)
+
+        for i, row, values in rows:
+            item, cells = self.parse_row(row, values, index, provider, existing_guids)
+            if item is not None:
+                items.append(item)
+            cells_list.extend(cells)
+            # store hash of the row as it will be after writing status back
+            updated_values[i] = self.apply_cells(values, cells)
+        return items, cells_list, self.get_row_hashes(updated_values)
+
+    def parse_row(self, row, values, index, provider=None, existing_guids=None):
+        """Parse single row.
+
+        :param int row: row number starting from 1
+        :param list values: row values
+        :param dict index: titles index
+        :param dict provider: ingest provider
+        :param set existing_guids: guids of existing events, those are looked up if not set
+        :return: tuple (item or ``None``, cells to update)
+        """
+        provider = provider or {}
+        item = {}
+        cells = []
+        error_message = None
+        is_updated = self.get_status(values, index)
+
+        try:
+            # only insert item if _STATUS is empty
+            if is_updated in ('UPDATED', 'ERROR'):
+                guid = values[index['_GUID']]
+                # check if it's exists and guid is valid
+                if existing_guids is not None:
+                    exists = guid in existing_guids
                 else:
-                    guid = generate_guid(type=GUID_NEWSML)
-
-                # avoid momentsJS throw null timezone value error
-                tzone = values[index['Timezone']] if values[index['Timezone']] != 'none' else 'UTC'
-                start_datetime = parse(values[index['Start date']] + ' ' + values[index['Start time']])
-                end_datetime = parse(values[index['End date']] + ' ' + values[index['End time']])
-                if values[index['All day']] == 'TRUE':
-                    start_datetime = parse(values[index['Start date']])
-                    end_datetime = parse(values[index['End date']]) + timedelta(days=1, seconds=-1)
-                if end_datetime < start_datetime:
-                    raise ValueError('End datetime is smaller than Start datetime')
-
-                item = {
-                    'type': 'event',
-                    'name': values[index['Event name']],
-                    'slugline': values[index['Slugline']],
-                    'dates': {
-                        'start': local_to_utc(tzone, start_datetime),
-                        'end': local_to_utc(tzone, end_datetime),
-                        'tz': tzone,
-                    },
-                    'definition_short': values[index['Description']],
-                    'definition_long': values[index['Long description']],
-                    'internal_note': values[index['Internal note']],
-                    'ednote': values[index['Ed note']],
-                    'links': [values[index['External links']]],
-                    'guid': guid,
-                    'status': is_updated,
-                }
-                item.setdefault(ITEM_STATE, CONTENT_STATE.DRAFT)
-
-                occur_status = values[index['Occurence status']]
-                if occur_status and occur_status in self.occur_status_qcode_mapping:
-                    item['occur_status'] = {
-                        'qcode': self.occur_status_qcode_mapping.get(values[index['Occurence status']]),
-                        'name': values[index['Occurence status']],
-                        'label': values[index['Occurence status']].lower(),
-                    }
+                    exists = superdesk.get_resource_service('events').find_one(guid=guid, req=None)
+                if not exists:
+                    raise KeyError('GUID is not exists')
+            else:
+                guid = generate_guid(type=GUID_NEWSML)
 
-                calendars = values[index['Calendars']]
-                if calendars:
-                    item['calendars'] = [{
-                        'is_active': True,
-                        'name': calendars,
-                        'qcode': calendars.lower(),
-                    }]
+            # avoid momentsJS throw null timezone value error
+            tzone = values[index['Timezone']] if values[index['Timezone']] != 'none' else 'UTC'
+            start_datetime = parse(values[index['Start date']] + ' ' + values[index['Start time']])
+            end_datetime = parse(values[index['End date']] + ' ' + values[index['End time']])
+            if values[index['All day']] == 'TRUE':
+                start_datetime = parse(values[index['Start date']])
+                end_datetime = parse(values[index['End date']]) + timedelta(days=1, seconds=-1)
+            if end_datetime < start_datetime:
+                raise ValueError('End datetime is smaller than Start datetime')
 
-                if all(values[index[field]] for field in self.required_location_field):
-                    item['location'] = [{
-                        'name': values[index['Location Name']],
-                        'address': {
-                            'line': [values[index['Location Address']]],
-                            'locality': values[index['Location City/Town']],
-                            'area': values[index['Location State/Province/Region']],
-                            'country': values[index['Location Country']],
-                        }
-                    }]
+            item = {
+                'type': 'event',
+                'name': values[index['Event name']],
+                'slugline': values[index['Slugline']],
+                'dates': {
+                    'start': local_to_utc(tzone, start_datetime),
+                    'end': local_to_utc(tzone, end_datetime),
+                    'tz': tzone,
+                },
+                'definition_short': values[index['Description']],
+                'definition_long': values[index['Long description']],
+                'internal_note': values[index['Internal note']],
+                'ednote': values[index['Ed note']],
+                'links': [values[index['External links']]],
+                'guid': guid,
+                'status': is_updated,
+            }
+            item.setdefault(ITEM_STATE, CONTENT_STATE.DRAFT)
+
+            occur_status = values[index['Occurence status']]
+            if occur_status and occur_status in self.occur_status_qcode_mapping:
+                item['occur_status'] = {
+                    'qcode': self.occur_status_qcode_mapping.get(values[index['Occurence status']]),
+                    'name': values[index['Occurence status']],
+                    'label': values[index['Occurence status']].lower(),
+                }
+
+            calendars = values[index['Calendars']]
+            if calendars:
+                item['calendars'] = [{
+                    'is_active': True,
+                    'name': calendars,
+                    'qcode': calendars.lower(),
+                }]
 
-                if all(values[index[field]] for field in self.required_contact_field) \
-                   and (all(values[index[field]] for field in ['Contact First name', 'Contact Last name'])
-                        or values[index['Contact Organisation']]):
-                    is_public = values[index['Contact Phone Public']] == 'TRUE'
-                    if values[index['Contact Phone Usage']] == 'Confidential':
-                        is_public = False
-                    item['contact'] = {
-                        'honorific': values[index['Contact Honorific']],
-                        'first_name': values[index['Contact First name']],
-                        'last_name': values[index['Contact Last name']],
-                        'organisation': values[index['Contact Organisation']],
-                        'contact_email': [values[index['Contact Email']]],
-                        'contact_address': [values[index['Contact Point of Contact']]],
-                        'contact_phone': [{
-                            'number': values[index['Contact Phone Number']],
-                            'public': is_public,
-                            'usage': values[index['Contact Phone Usage']],
-                        }]
+            if all(values[index[field]] for field in self.required_location_field):
+                item['location'] = [{
+                    'name': values[index['Location Name']],
+                    'address': {
+                        'line': [values[index['Location Address']]],
+                        'locality': values[index['Location City/Town']],
+                        'area': values[index['Location State/Province/Region']],
+                        'country': values[index['Location Country']],
                     }
-                # ignore invalid item
-                missing_fields = [field for field in self.required_field if not item.get(field)]
-                if missing_fields:
-                    missing_fields = ', '.join(missing_fields)
-                    logger.error(
-                        'Provider %s: Event "%s". Missing %s fields',
-                        provider.get('name'), item.get('name'), missing_fields,
-                    )
-                    error_message = 'Missing ' + missing_fields + ' fields'
-            except UnknownTimeZoneError:
-                error_message = 'Invalid timezone'
+                }]
+
+            if all(values[index[field]] for field in self.required_contact_field) \
+               and (all(values[index[field]] for field in ['Contact First name', 'Contact Last name'])
+                    or values[index['Contact Organisation']]):
+                is_public = values[index['Contact Phone Public']] == 'TRUE'
+                if values[index['Contact Phone Usage']] == 'Confidential':
+                    is_public = False
+                item['contact'] = {
+                    'honorific': values[index['Contact Honorific']],
+                    'first_name': values[index['Contact First name']],
+                    'last_name': values[index['Contact Last name']],
+                    'organisation': values[index['Contact Organisation']],
+                    'contact_email': [values[index['Contact Email']]],
+                    'contact_address': [values[index['Contact Point of Contact']]],
+                    'contact_phone': [{
+                        'number': values[index['Contact Phone Number']],
+                        'public': is_public,
+                        'usage': values[index['Contact Phone Usage']],
+                    }]
+                }
+            # ignore invalid item
+            missing_fields = [field for field in self.required_field if not item.get(field)]
+            if missing_fields:
+                missing_fields = ', '.join(missing_fields)
                 logger.error(
-                    'Provider %s: Event "%s": Invalid timezone %s',
-                    provider.get('name'), values[index['Event name']], tzone
+                    'Provider %s: Event "%s". Missing %s fields',
+                    provider.get('name'), item.get('name'), missing_fields,
                 )
-            except (TypeError, ValueError, KeyError) as e:
-                error_message = e.args[0]
-                logger.error(
-                    'Provider %s: Event "%s": %s',
-                    provider.get('name'), item.get('name'), error_message)
-
-            if error_message:
-                cells_list.extend([
-                    Cell(row, index['_STATUS'] + 1, 'ERROR'),
-                    Cell(row, index['_ERR_MESSAGE'] + 1, error_message)
-                ])
-            elif not is_updated or is_updated == 'UPDATED':
-                cells_list.extend([
-                    Cell(row, index['_STATUS'] + 1, 'DONE'),
-                    Cell(row, index['_ERR_MESSAGE'] + 1, ''),
-                ])
-                if not is_updated:
-                    # only update _GUID when status is empty
-                    cells_list.append(Cell(row, index['_GUID'] + 1, guid))
-                items.append(item)
-        return items, cells_list
+                error_message = 'Missing ' + missing_fields + ' fields'
+        except UnknownTimeZoneError:
+            error_message = 'Invalid timezone'
+            logger.error(
+                'Provider %s: Event "%s": Invalid timezone %s',
+                provider.get('name'), values[index['Event name']], tzone
+            )
+        except (TypeError, ValueError, KeyError) as e:
+            error_message = e.args[0]
+            logger.error(
+                'Provider %s: Event "%s": %s',
+                provider.get('name'), item.get('name'), error_message)
+
+        if error_message:
+            cells.extend([
+                Cell(row, index['_STATUS'] + 1, 'ERROR'),
+                Cell(row, index['_ERR_MESSAGE'] + 1, error_message)
+            ])
+            return None, cells
+        elif not is_updated or is_updated == 'UPDATED':
+            cells.extend([
+                Cell(row, index['_STATUS'] + 1, 'DONE'),
+                Cell(row, index['_ERR_MESSAGE'] + 1, ''),
+            ])
+            if not is_updated:
+                # only update _GUID when status is empty
+                cells.append(Cell(row, index['_GUID'] + 1, guid))
+            return item, cells
+        return None, cells
+
+    def get_status(self, values, index):
+        return values[index['_STATUS']].strip().upper() if len(values) - 1 > index['_STATUS'] else None
+
+    def get_updated_guid(self, values, index):
+        if self.get_status(values, index) in ('UPDATED', 'ERROR') and len(values) > index['_GUID']:
+            return values[index['_GUID']]
+
+    def get_row_hash(self, values):
+        # trailing empty cells depend on sheet width only
+        values = list(values)
+        while values and not values[-1]:
+            values.pop()
+        return hashlib.blake2b('\x1f'.join(values).encode('utf-8'), digest_size=8).hexdigest()
+
+    def get_row_hashes(self, rows, counts=None):
+        """Get hashes of rows, identical rows get hash suffixed by number of the occurrence.
+
+        :param list rows: list of row values
+        :param dict counts: occurrences of hashes in previous batches, it's updated
+        :return: list of hashes
+        """
+        counts = {} if counts is None else counts
+        hashes = []
+        for values in rows:
+            row_hash = self.get_row_hash(values)
+            count = counts.get(row_hash, 0)
+            counts[row_hash] = count + 1
+            hashes.append('{}-{}'.format(row_hash, count) if count else row_hash)
+        return hashes
+
+    def apply_cells(self, values, cells):
+        """Get copy of row values with cells updated."""
+        values = list(values)
+        for cell in cells:
+            if len(values) < cell.col:
+                values.extend([''] * (cell.col - len(values)))
+            values[cell.col - 1] = cell.value
+        return values
 
     def parse_titles(self, titles):
         """Lookup title columns and return dictionary of titles index
@@ -9,6 +9,7 @@
 # at https://www.appendsourcefabric.org/superdesk/license
 
 from superdesk.io.registry import register_feed_parser
+from belga.io.subjects import get_subjects
 from .base_belga_newsml_1_2 import BaseBelgaNewsMLOneFeedParser
 from superdesk.utc import local_to_utc
 
@@ -41,7 +42,7 @@ class BelgaTASSNewsMLOneFeedParser(BaseBelgaNewsMLOneFeedParser):
             for keyword in item['keywords']:
                 qcode = [self.MAPPING_PRODUCTS.get(k) for k in self.MAPPING_PRODUCTS if k in keyword]
                 if qcode:
-                    item.setdefault('subject', []).append({
+                    get_subjects(item).add({
                         'name': qcode[0],
                         'qcode': qcode[0],
                         'parent': 'NEWS',
@@ -49,7 +50,7 @@ class BelgaTASSNewsMLOneFeedParser(BaseBelgaNewsMLOneFeedParser):
                     })
                     break
             else:
-                item.setdefault('subject', []).append({
+                get_subjects(item).add({
                     'name': 'NEWS/GENERAL',
                     'qcode': 'NEWS/GENERAL',
                     'parent': 'NEWS',
@@ -57,7 +58,7 @@ class BelgaTASSNewsMLOneFeedParser(BaseBelgaNewsMLOneFeedParser):
                 })
         # source is TASS
         credit = {"name": 'TASS', "qcode": 'TASS', "scheme": "sources"}
-        item['subject'].append(credit)
+        get_subjects(item).add(credit)
 
     def parser_newscomponent(self, item, newscomponent_el):
         """
@@ -80,7 +81,7 @@ class BelgaTASSNewsMLOneFeedParser(BaseBelgaNewsMLOneFeedParser):
         # Essential is CV
         essential = newscomponent_el.attrib.get('Essential')
         if essential:
-            item.setdefault('subject', []).append({
+            get_subjects(item).add({
                 "name": essential,
                 "qcode": essential,
                 "scheme": "essential"
@@ -89,7 +90,7 @@ class BelgaTASSNewsMLOneFeedParser(BaseBelgaNewsMLOneFeedParser):
         # EquivalentsList is CV
         equivalents_list = newscomponent_el.attrib.get('EquivalentsList')
         if equivalents_list:
-            item.setdefault('subject', []).append({
+            get_subjects(item).add({
                 "name": equivalents_list,
                 "qcode": equivalents_list,
                 "scheme": "equivalents_list"
@@ -1,6 +1,7 @@
 import logging
 import hashlib
 from xml.etree import ElementTree
+from belga.io.subjects import get_subjects
 from .belga_newsml_1_2 import BelgaNewsMLOneFeedParser
 from superdesk.io.registry import register_feed_parser
 from superdesk.publish.formatters.newsml_g2_formatter import XML_LANG
@@ -55,7 +56,7 @@ class BelgaTipNewsMLOneFeedParser(BelgaNewsMLOneFeedParser):
             for element in news_component_1.findall('DescriptiveMetadata/Genre'):
                 if element.get('FormalName'):
                     # genre CV
-                    self._item_seed.setdefault('subject', []).append({
+                    get_subjects(self._item_seed).add({
                         "name": element.get('FormalName'),
                         "qcode": element.get('FormalName'),
                         "scheme": "genre"
@@ -7,8 +7,12 @@
 # For the full copyright and license information, please see the
 # AUTHORS and LICENSE files distributed with this source code, or
 # at https://www.sourcefabric.org/superdesk/license
+import re
 import socket
+import select
 import email
+import email.parser
+import hashlib
 import imaplib
 import io
 import logging
@@ -17,11 +21,23 @@ from superdesk.media.media_operations import process_file_from_stream
 from superdesk.io.feeding_services import EmailFeedingService
 from superdesk.io.feed_parsers.rfc822 import EMailRFC822FeedParser
 from superdesk.io.registry import register_feeding_service, register_feeding_service_parser
-from superdesk.errors import IngestEmailError
+from superdesk.errors import IngestEmailError, SuperdeskIngestError
+import superdesk
 from superdesk import get_resource_service
+from superdesk.resource import Resource
+from superdesk.services import BaseService
+from superdesk.utc import utcnow
+from belga.io.feed_parsers.belga_email_rfc822 import BelgaEmailRFC822FeedParser, decode_payload, get_message
+from belga.io.priority import sort_batches_by_priority
 
 logger = logging.getLogger(__name__)
 
+FETCH_UID_RE = re.compile(rb'UID (\d+)')
+FETCH_SIZE_RE = re.compile(rb'RFC822\.SIZE (\d+)')
+
+#: open mailbox connections kept between polls, by provider id
+_connections = {}
+
 
 class EmailBelgaFeedingService(EmailFeedingService):
     NAME = 'email-belga'
@@ -67,96 +83,319 @@ class EmailBelgaFeedingService(EmailFeedingService):
 
     def _update(self, provider, update, test=False):
         config = provider.get('config', {})
-        server = config.get('server', '')
-        port = int(config.get('port', 993))
         new_items = []
 
         try:
+            imap = self._get_connection(provider, reuse=not test)
             try:
-                socket.setdefaulttimeout(app.config.get('EMAIL_TIMEOUT', 10))
-                imap = imaplib.IMAP4_SSL(host=server, port=port)
-            except (socket.gaierror, OSError) as e:
-                raise IngestEmailError.emailHostError(exception=e, provider=provider)
-
-            try:
-                imap.login(config.get('user', None), config.get('password', None))
-            except imaplib.IMAP4.error:
-                raise IngestEmailError.emailLoginError(imaplib.IMAP4.error, provider)
-
-            try:
-                rv, data = imap.select(config.get('mailbox', None), readonly=False)
-                if rv != 'OK':
-                    raise IngestEmailError.emailMailboxError()
-                try:
-                    rv, data = imap.search(None, config.get('filter', '(UNSEEN)'))
-                    if rv != 'OK':
-                        raise IngestEmailError.emailFilterError()
-                    for num in data[0].split():
-                        rv, data = imap.fetch(num, '(RFC822)')
-                        if rv == 'OK' and not test:
-                            try:
-                                parser = self.get_feed_parser(provider, data)
-                                item = parser.parse(data, provider)
-                                if config.get('attachment'):
-                                    self.save_attachment(data, item)
-                                new_items.append(item)
-                                rv, data = imap.store(num, '+FLAGS', '\\Seen')
-                            except IngestEmailError:
-                                continue
-                finally:
-                    imap.close()
+                uids = self._search(imap, config, provider)
+                if not uids and not test and self._idle(imap):
+                    uids = self._search(imap, config, provider)
+                if test:
+                    return new_items
+                seen = []
+                messages_service = get_resource_service('ingest_email_messages')
+                batch_size = app.config.get('EMAIL_FETCH_BATCH_SIZE', 50)
+                for i in range(0, len(uids), batch_size):
+                    chunk = uids[i:i + batch_size]
+                    # skip mails which were already ingested before fetching whole message
+                    message_ids, sizes = self._fetch_headers(imap, chunk)
+                    known = messages_service.get_known_keys(provider, message_ids.values())
+                    duplicates = [uid for uid in chunk if message_ids.get(uid) in known]
+                    if duplicates:
+                        logger.info('Skipping %d already ingested mails', len(duplicates))
+                        seen.extend(duplicates)
+                    new_keys = []
+                    for uid, data in self._fetch(imap, [uid for uid in chunk if uid not in duplicates], sizes):
+                        key = message_ids.get(uid)
+                        if key is None:
+                            # mails without Message-ID were not part of the lookup above
+                            key = get_content_key(data)
+                            known.update(messages_service.get_known_keys(provider, [key]))
+                        if key in known:
+                            seen.append(uid)
+                            continue
+                        try:
+                            msg = get_message(data)
+                            parser = self._get_parser(provider, msg)
+                            item = parser.parse_message(msg, provider)
+                            if config.get('attachment'):
+                                self.save_attachment(data, item, msg)
+                            new_items.append(item)
+                            seen.append(uid)
+                            known.add(key)
+                            new_keys.append(key)
+                        except IngestEmailError:
+                            continue
+                    messages_service.add_keys(provider, new_keys)
+                if seen:
+                    imap.uid('store', b','.join(seen), '+FLAGS', '\\Seen')
+            except Exception:
+                self._close_connection(provider)
+                raise
             finally:
-                imap.logout()
+                if test:
+                    self._close_connection(provider, imap)
         except IngestEmailError:
             raise
         except Exception as ex:
             raise IngestEmailError.emailError(ex, provider)
-        return new_items
+        return sort_batches_by_priority(new_items)
+
+    def _get_connection(self, provider, reuse=True):
+        """Get connection to mailbox, connections are kept open between polls.
 
-    def save_attachment(self, data, items):
+        Connection is reused only if it's still alive and provider config didn't change.
         """
-        Given a data email for getting stream of attachment.
+        config = provider.get('config', {})
+        key = tuple(config.get(field) for field in ('server', 'port', 'user', 'password', 'mailbox'))
+        if reuse:
+            cached = _connections.get(provider.get('_id'))
+            if cached is not None:
+                cached_key, imap = cached
+                try:
+                    if cached_key == key and imap.noop()[0] == 'OK':
+                        return imap
+                except (imaplib.IMAP4.error, OSError):
+                    pass
+                self._close_connection(provider)
+
+        try:
+            socket.setdefaulttimeout(app.config.get('EMAIL_TIMEOUT', 10))
+            imap = imaplib.IMAP4_SSL(host=config.get('server', ''), port=int(config.get('port', 993)))
+        except (socket.gaierror, OSError) as e:
+            raise IngestEmailError.emailHostError(exception=e, provider=provider)
+
+        try:
+            imap.login(config.get('user', None), config.get('password', None))
+        except imaplib.IMAP4.error:
+            imap.shutdown()
+            raise IngestEmailError.emailLoginError(imaplib.IMAP4.error, provider)
 
+        rv, data = imap.select(config.get('mailbox', None), readonly=False)
+        if rv != 'OK':
+            imap.logout()
+            raise IngestEmailError.emailMailboxError()
+
+        if reuse:
+            _connections[provider.get('_id')] = (key, imap)
+        return imap
+
+    def _close_connection(self, provider, imap=None):
+        if imap is None:
+            imap = _connections.pop(provider.get('_id'), (None, None))[1]
+        if imap is None:
+            return
+        try:
+            imap.close()
+            imap.logout()
+        except (imaplib.IMAP4.error, OSError):
+            pass
+
+    def _search(self, imap, config, provider):
+        rv, data = imap.uid('search', None, config.get('filter', '(UNSEEN)'))
+        if rv != 'OK':
+            raise IngestEmailError.emailFilterError()
+        return data[0].split()
+
+    def _fetch(self, imap, uids, sizes=None):
+        """Fetch messages with given uids.
+
+        Messages are fetched in batches of up to ``EMAIL_FETCH_MAX_SIZE`` bytes, so only
+        limited number of messages is in memory at once.  Messages of unknown size are
+        fetched one by one.
+
+        :param list uids: message uids
+        :param dict sizes: message sizes by uid
+        :return: generator of (uid, data) where data is in the same format as returned when fetching single message
         """
-        attachments = []
+        sizes = sizes or {}
+        max_size = app.config.get('EMAIL_FETCH_MAX_SIZE', 10 * 1024 * 1024)
+        batch = []
+        batch_size = 0
+        for uid in uids:
+            size = sizes.get(uid, max_size)
+            if batch and batch_size + size > max_size:
+                yield from self._fetch_batch(imap, batch)
+                batch = []
+                batch_size = 0
+            batch.append(uid)
+            batch_size += size
+        if batch:
+            yield from self._fetch_batch(imap, batch)
+
+    def _fetch_batch(self, imap, uids):
+        """Fetch messages with given uids using single command.
+
+        :return: list of (uid, data)
+        """
+        rv, data = imap.uid('fetch', b','.join(uids), '(RFC822)')
+        if rv != 'OK':
+            return []
+        messages = []
+        for i, response_part in enumerate(data):
+            if isinstance(response_part, tuple):
+                m = FETCH_UID_RE.search(response_part[0])
+                if m is None and i + 1 < len(data) and isinstance(data[i + 1], bytes):
+                    # some servers send UID after the message literal
+                    m = FETCH_UID_RE.search(data[i + 1])
+                if m is not None:
+                    messages.append((m.group(1), [response_part]))
+        return messages
+
+    def _fetch_headers(self, imap, uids):
+        """Fetch Message-ID headers and sizes of messages with given uids.
+
+        :return: tuple of dicts uid: Message-ID and uid: size
+        """
+        rv, data = imap.uid('fetch', b','.join(uids), '(RFC822.SIZE BODY.PEEK[HEADER.FIELDS (MESSAGE-ID)])')
+        if rv != 'OK':
+            return {}, {}
+        message_ids = {}
+        sizes = {}
         for response_part in data:
             if isinstance(response_part, tuple):
-                msg = email.message_from_bytes(response_part[1])
-                for part in msg.walk():
-                    if part.get_content_maintype() == 'multipart':
-                        continue
-                    disposition = part.get('Content-Disposition')
-                    if disposition is not None and disposition.split(';')[0] == 'attachment':
-                        fileName = part.get_filename()
-                        if bool(fileName):
-                            content = part.get_payload(decode=True)
-                            content = io.BytesIO(content)
-                            res = process_file_from_stream(content, part.get_content_type())
-                            file_name, content_type, metadata = res
-                            content.seek(0)
-                            media_id = app.media.put(content,
-                                                     filename=fileName,
-                                                     content_type=content_type,
-                                                     metadata=metadata,
-                                                     resource='attachments')
-                            try:
-                                attachment_service = get_resource_service('attachments')
-                                ids = attachment_service.post([{"media": media_id,
-                                                                "filename": fileName,
-                                                                "title": 'attachment',
-                                                                "description": "email's attachment"
-                                                                }])
-                                if ids:
-                                    attachments.append({'attachment': next(iter(ids), None)})
-                            except Exception as ex:
-                                logger.error("cannot add attachment for %s, %s" % (fileName, ex.args[0]))
-                                app.media.delete(media_id)
-
-                if attachments:
-                    for item in items:
-                        if item['type'] == 'text':
-                            item['attachments'] = attachments
-                            item['ednote'] = 'The story has %s attachment(s)' % str(len(attachments))
+                m = FETCH_UID_RE.search(response_part[0])
+                size = FETCH_SIZE_RE.search(response_part[0])
+                if m is not None and size is not None:
+                    sizes[m.group(1)] = int(size.group(1))
+                if m is not None:
+                    headers = email.parser.BytesHeaderParser().parsebytes(response_part[1])
+                    message_id = (headers.get('Message-ID') or '').strip()
+                    if message_id:
+                        message_ids[m.group(1)] = message_id
+        return message_ids, sizes
+
+    def _idle(self, imap):
+        """Wait for new mail using IMAP IDLE.
+
+        It's only used when ``EMAIL_IDLE_TIMEOUT`` is set and server supports it,
+        so mail arriving during polling interval can be ingested right away.
+
+        :return: ``True`` if there is new mail
+        """
+        timeout = app.config.get('EMAIL_IDLE_TIMEOUT', 0)
+        if not timeout or 'IDLE' not in imap.capabilities:
+            return False
+        tag = b'BIDLE'
+        imap.send(tag + b' IDLE\r\n')
+        if not imap.readline().startswith(b'+'):
+            return False
+        # wait for data before reading, reading from socket file after timeout would break it
+        ready = getattr(imap.sock, 'pending', lambda: 0)() or select.select([imap.sock], [], [], timeout)[0]
+        lines = [imap.readline()] if ready else []
+        if not lines or not lines[-1].startswith(tag):
+            imap.send(b'DONE\r\n')
+        while not lines or not lines[-1].startswith(tag):
+            lines.append(imap.readline())
+            if not lines[-1]:
+                raise imaplib.IMAP4.abort('socket closed during IDLE')
+        return any(line.rstrip().endswith(b'EXISTS') for line in lines)
+
+    def _get_parser(self, provider, msg):
+        """Get feed parser for already parsed message.
+
+        Does the same check as ``parser.can_parse`` but without parsing the message again,
+        returned parser can parse the message without parsing it from raw data.
+        """
+        parser = self.get_feed_parser(provider)
+        if msg is None or not parser.parse_header(msg['from']):
+            raise SuperdeskIngestError.parserNotFoundError(provider=provider)
+        return BelgaEmailRFC822FeedParser()
+
+    def save_attachment(self, data, items, msg=None):
+        """
+        Given a data email for getting stream of attachment.
+
+        Attachments are decoded into temporary files which are kept in memory
+        only up to ``EMAIL_ATTACHMENT_SPOOL_SIZE`` bytes.
+
+        :param data: fetched email data
+        :param items: items parsed from email
+        :param msg: email message parsed from data, parsed again if not set
+        """
+        if msg is None:
+            msg = get_message(data)
+            if msg is None:
+                return
+
+        attachments = []
+        for part in msg.walk():
+            if part.get_content_maintype() == 'multipart':
+                continue
+            disposition = part.get('Content-Disposition')
+            if disposition is not None and disposition.split(';')[0] == 'attachment':
+                fileName = part.get_filename()
+                if bool(fileName):
+                    with decode_payload(part) as content:
+                        res = process_file_from_stream(content, part.get_content_type())
+                        file_name, content_type, metadata = res
+                        content.seek(0)
+                        media_id = app.media.put(content,
+                                                 filename=fileName,
+                                                 content_type=content_type,
+                                                 metadata=metadata,
+                                                 resource='attachments')
+                    try:
+                        attachment_service = get_resource_service('attachments')
+                        ids = attachment_service.post([{"media": media_id,
+                                                        "filename": fileName,
+                                                        "title": 'attachment',
+                                                        "description": "email's attachment"
+                                                        }])
+                        if ids:
+                            attachments.append({'attachment': next(iter(ids), None)})
+                    except Exception as ex:
+                        logger.error("cannot add attachment for %s, %s" % (fileName, ex.args[0]))
+                        app.media.delete(media_id)
+
+        if attachments:
+            for item in items:
+                if item['type'] == 'text':
+                    item['attachments'] = attachments
+                    item['ednote'] = 'The story has %s attachment(s)' % str(len(attachments))
+
+
+def get_content_key(data):
+    """Get message key based on content for messages without Message-ID."""
+    for response_part in data:
+        if isinstance(response_part, tuple):
+            return 'sha1:' + hashlib.sha1(response_part[1]).hexdigest()
+
+
+class IngestEmailMessagesResource(Resource):
+    """Mails ingested by email providers, identified by Message-ID or content hash."""
+
+    schema = {
+        'provider': {'type': 'string'},
+        'key': {'type': 'string'},
+        'created': {'type': 'datetime'},
+    }
+    internal_resource = True
+    mongo_indexes = {
+        'provider_1_key_1': ([('provider', 1), ('key', 1)], {'background': True}),
+        'created_1': ([('created', 1)], {'expireAfterSeconds': 90 * 24 * 3600, 'background': True}),
+    }
+
+
+class IngestEmailMessagesService(BaseService):
+
+    def get_known_keys(self, provider, keys):
+        keys = [key for key in keys if key]
+        if not keys:
+            return set()
+        lookup = {'provider': str(provider.get('_id')), 'key': {'$in': keys}}
+        return {doc['key'] for doc in self.find(lookup)}
+
+    def add_keys(self, provider, keys):
+        if keys:
+            now = utcnow()
+            self.post([{'provider': str(provider.get('_id')), 'key': key, 'created': now} for key in keys])
+
+
+def init_app(app):
+    superdesk.register_resource('ingest_email_messages', IngestEmailMessagesResource, IngestEmailMessagesService,
+                                _app=app)
 
 
 register_feeding_service(EmailBelgaFeedingService)
@@ -0,0 +1,110 @@
+# -*- coding: utf-8; -*-
+#
+# This file is part of Superdesk.
+#
+# Copyright 2013 - 2020 Sourcefabric z.u. and contributors.
+#
+# For the full copyright and license information, please see the
+# AUTHORS and LICENSE files distributed with this source code, or
+# at https://www.sourcefabric.org/superdesk/license
+
+import os
+import logging
+
+from flask import current_app as app
+from superdesk.errors import ParserError
+from superdesk.etree import etree
+from superdesk.io.feed_parsers import XMLFeedParser
+from superdesk.io.feeding_services import FileFeedingService
+from superdesk.io.registry import register_feeding_service
+from superdesk.metadata.item import GUID_FIELD
+from superdesk.notification import push_notification
+from superdesk.utils import get_sorted_files, FileSortAttributes
+
+from belga.io.duplicates import filter_duplicates, record_fingerprints
+from belga.io.priority import get_batch_priority, sort_by_priority
+
+logger = logging.getLogger(__name__)
+
+
+class FileBelgaFeedingService(FileFeedingService):
+    """Local folder feed ingesting files in batches.
+
+    Up to ``INGEST_FILE_BATCH_SIZE`` files are parsed before their items are ingested,
+    so duplicates are detected for the whole batch with a fixed number of queries
+    and files with urgent items are ingested first.
+    Fingerprints of items are recorded once those are ingested.
+    """
+
+    NAME = 'file-belga'
+    label = 'File feed BELGA'
+
+    def _update(self, provider, update):
+        self.provider = provider
+        self.path = provider.get('config', {}).get('path', None)
+
+        if not self.path:
+            logger.warning('File Feeding Service {} is configured without path. Please check the configuration'
+                           .format(provider['name']))
+            return
+
+        registered_parser = self.get_feed_parser(provider)
+        batch_size = app.config.get('INGEST_FILE_BATCH_SIZE', 100)
+        batch = []
+        for filename in get_sorted_files(self.path, sort_by=FileSortAttributes.created):
+            file_path = os.path.join(self.path, filename)
+            if not os.path.isfile(file_path):
+                continue
+            last_updated = self.get_last_updated(file_path)
+            if not self.is_latest_content(last_updated, provider.get('last_updated')):
+                self.move_file(self.path, filename, provider=provider, success=False)
+                continue
+            try:
+                batch.append((filename, self._parse_file(file_path, registered_parser, provider)))
+            except Exception as ex:
+                # files parsed before are not affected
+                yield from self._ingest_batch(batch, provider)
+                if self.is_old_content(last_updated):
+                    self.move_file(self.path, filename, provider=provider, success=False)
+                raise ParserError.parseFileError('{}-{}'.format(provider['name'], self.NAME), filename, ex, provider)
+            if len(batch) >= batch_size:
+                yield from self._ingest_batch(batch, provider)
+                batch = []
+        yield from self._ingest_batch(batch, provider)
+
+        push_notification('ingest:update')
+
+    def _parse_file(self, file_path, registered_parser, provider):
+        """Parse file the same way as core file feeding service.
+
+        :return: list of items
+        """
+        if isinstance(registered_parser, XMLFeedParser):
+            with open(file_path, 'rb') as f:
+                xml = etree.parse(f)
+            parser = self.get_feed_parser(provider, xml.getroot())
+            items = parser.parse(xml.getroot(), provider)
+        else:
+            parser = self.get_feed_parser(provider, file_path)
+            items = parser.parse(file_path, provider)
+        self.after_extracting(items, provider)
+        return items if isinstance(items, list) else [items]
+
+    def _ingest_batch(self, batch, provider):
+        """Yield items of parsed files and move each file once its items are ingested.
+
+        Files are ordered by their most urgent item, files with same priority keep their order.
+
+        :param list batch: tuples (filename, list of items)
+        """
+        kept = {id(item) for item in filter_duplicates([item for _, items in batch for item in items], provider)}
+        batch = sorted(((filename, sort_by_priority([item for item in items if id(item) in kept]))
+                        for filename, items in batch), key=lambda file: get_batch_priority(file[1]))
+        for filename, items in batch:
+            # ingest returns guids of items which failed
+            failed = (yield items) if items else None
+            self.move_file(self.path, filename, provider=provider, success=not failed)
+            record_fingerprints([item for item in items if item.get(GUID_FIELD) not in (failed or ())], provider)
+
+
+register_feeding_service(FileBelgaFeedingService)
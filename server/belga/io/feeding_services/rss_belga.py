@@ -8,15 +8,58 @@
 # AUTHORS and LICENSE files distributed with this source code, or
 # at https://www.sourcefabric.org/superdesk/license
 
-
 from superdesk.io.feeding_services import RSSFeedingService
 from superdesk.io.registry import register_feeding_service, register_feeding_service_parser
+from belga.io.priority import sort_by_priority
+
+
+class FeedNotModified(Exception):
+    """Feed was not modified since previous poll."""
 
 
 class RSSBelgaFeedingService(RSSFeedingService):
     NAME = 'rss-belga'
     label = 'RSS BELGA'
 
+    def _update(self, provider, update):
+        """Get new items from feed.
+
+        Feed is requested with ``If-None-Match``/``If-Modified-Since`` headers so unchanged feed
+        is not downloaded and parsed again, values of ``ETag``/``Last-Modified`` response headers
+        are stored in provider ``private`` data.
+        Entries older than the last ingested item are skipped by core service.
+        """
+        self._validators = None
+        try:
+            batches = super()._update(provider, update)
+        except FeedNotModified:
+            return []
+        if self._validators:
+            update.setdefault('private', dict(provider.get('private') or {})).update(self._validators)
+        return [sort_by_priority(items) for items in batches]
+
+    def _fetch_data(self):
+        """Fetch feed using conditional request.
+
+        :raises FeedNotModified: if feed was not modified
+        """
+        private = self.provider.get('private') or {}
+        headers = {}
+        if private.get('etag'):
+            headers['If-None-Match'] = private['etag']
+        if private.get('last_modified'):
+            headers['If-Modified-Since'] = private['last_modified']
+
+        response = self.get_url(self.config['url'], headers=headers)
+        if response.status_code == 304:
+            raise FeedNotModified()
+
+        self._validators = {
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+        }
+        return response.content
+
     def _create_item(self, data, field_aliases=None, source='source'):
         item = super()._create_item(data, field_aliases, source)
 
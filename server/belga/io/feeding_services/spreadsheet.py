@@ -9,11 +9,17 @@
 # at https://www.sourcefabric.org/superdesk/license
 
 import json
+import time
+import hashlib
 import logging
 from copy import deepcopy
 from datetime import datetime
 
 import gspread
+import pymongo
+from eve.utils import document_etag
+from gspread import Cell
+from flask import current_app as app
 from oauth2client.service_account import ServiceAccountCredentials
 
 import superdesk
@@ -23,9 +29,21 @@ from superdesk.io.feeding_services import FeedingService
 from superdesk.io.registry import register_feeding_service, register_feeding_service_parser
 from superdesk.metadata.item import GUID_FIELD, GUID_NEWSML
 from superdesk.metadata.utils import generate_guid
+from superdesk.utc import utcnow
 
 logger = logging.getLogger(__name__)
 
+SCOPE = [
+    'https://spreadsheets.google.com/feeds',
+    'https://www.googleapis.com/auth/drive',
+]
+
+#: authorized clients and worksheets by provider config
+_worksheets = {}
+
+#: maximal delay in seconds between write retries, writes are deferred to next update otherwise
+MAX_WRITE_DELAY = 4
+
 
 class IngestSpreadsheetError(SuperdeskIngestError):
     _codes = {
@@ -89,7 +107,7 @@ class SpreadsheetFeedingService(FeedingService):
     ]
 
     def _test(self, provider):
-        worksheet = self._get_worksheet(provider)
+        worksheet = self._get_worksheet(provider, refresh=True)
         data = worksheet.get_all_values()
         BelgaSpreadsheetParser().parse_titles(data[0])
 
@@ -98,11 +116,31 @@ class SpreadsheetFeedingService(FeedingService):
 
         If STATUS field is empty, create new item
         If STATUS field is UPDATED, update item
+
+        Hashes of processed rows are stored in provider, so only rows which are new
+        or were modified since last update are parsed.  Status cells which can't be
+        written are stored too and written on next update, hashes of their rows are
+        only stored once those are written.
         """
+        private = provider.get('private') or {}
         worksheet = self._get_worksheet(provider)
 
+        # flush status updates which couldn't be written last time first,
+        # rows would be processed again otherwise
+        pending = [Cell(*cell) for cell in private.get('pending_cells') or []]
+        if pending:
+            pending = self._write_cells(worksheet, pending, provider)
+            if pending:
+                update['private'] = dict(private, pending_cells=self._serialize_cells(pending))
+                return
+            row_hashes = (private.get('row_hashes') or []) + (private.get('pending_row_hashes') or [])
+            private = dict(private, row_hashes=row_hashes, pending_cells=[], pending_row_hashes=[])
+
         # Get all values to avoid reaching read limit
-        data = worksheet.get_all_values()
+        try:
+            data = worksheet.get_all_values()
+        except gspread.exceptions.APIError as e:
+            self._handle_api_error(e, provider)
         titles = [s.lower().strip() for s in data[0]]
 
         # avoid maximum limit cols error
@@ -110,47 +148,122 @@ class SpreadsheetFeedingService(FeedingService):
         if total_col < len(titles) + 3:
             worksheet.add_cols(len(titles) + 3 - total_col)
 
+        cells_list = []
         for field in ('_STATUS', '_ERR_MESSAGE', '_GUID'):
             if field.lower() not in titles:
                 titles.append(field)
-                worksheet.update_cell(1, len(titles), field)
+                cells_list.append(Cell(1, len(titles), field))
         data[0] = titles  # pass to parser uses for looking up index
 
         parser = BelgaSpreadsheetParser()
-        items, cells_list = parser.parse(data, provider)
+        items, cells, row_hashes = parser.parse_rows(data, provider, set(private.get('row_hashes') or []))
+        cells_list.extend(cells)
         items = self._process_event_items(items, provider)
         # add ingest item
         yield items
         # Update status for google sheet
-        if cells_list:
-            worksheet.update_cells(cells_list)
+        pending = self._write_cells(worksheet, cells_list, provider)
+        # rows are hashed as those will be once cells are written, rows with pending cells
+        # are read again only after flushing those so their hashes are stored then
+        pending_rows = {cell.row for cell in pending}
+        update['private'] = dict(
+            private,
+            row_hashes=[row_hash for row, row_hash in enumerate(row_hashes, 3) if row not in pending_rows],
+            pending_cells=self._serialize_cells(pending),
+            pending_row_hashes=[row_hash for row, row_hash in enumerate(row_hashes, 3) if row in pending_rows],
+        )
+
+    def _write_cells(self, worksheet, cells_list, provider):
+        """Write cells in batches of ``SPREADSHEET_WRITE_BATCH_ROWS`` rows.
+
+        Each batch is retried shortly when quota is exceeded, remaining batches
+        are deferred to next update once retries are exhausted or for other errors
+        (eg. permission denied), cells are never dropped.
+
+        :return: list of cells which were not written and should be retried
+        """
+        batch_rows = app.config.get('SPREADSHEET_WRITE_BATCH_ROWS', 500)
+        batches = []
+        for cell in sorted(cells_list, key=lambda cell: (cell.row, cell.col)):
+            if not batches or cell.row - batches[-1][0].row >= batch_rows:
+                batches.append([])
+            batches[-1].append(cell)
+
+        for i, batch in enumerate(batches):
+            try:
+                self._update_cells(worksheet, batch, provider)
+            except gspread.exceptions.APIError as e:
+                status = e.response.status_code
+                if status != 429:
+                    # permissions are checked again on next update
+                    _worksheets.pop(self._get_cache_key(provider), None)
+                logger.error('Provider %s: failed to update cells, deferring %d batches: %s',
+                             provider.get('name'), len(batches) - i, e)
+                return [cell for batch in batches[i:] for cell in batch]
+        return []
 
-    def _get_worksheet(self, provider):
+    def _update_cells(self, worksheet, cells, provider):
+        retries = app.config.get('SPREADSHEET_WRITE_RETRIES', 2)
+        delay = app.config.get('SPREADSHEET_WRITE_DELAY', 1)
+        for attempt in range(retries + 1):
+            try:
+                return worksheet.update_cells(cells)
+            except gspread.exceptions.APIError as e:
+                status = e.response.status_code
+                if (status != 429 and status < 500) or attempt == retries:
+                    raise
+                retry_after = e.response.headers.get('Retry-After', '')
+                wait = int(retry_after) if retry_after.isdigit() else delay * 2 ** attempt
+                if wait > MAX_WRITE_DELAY:
+                    raise
+                logger.warning('Provider %s: write failed with status %s, retry in %ss',
+                               provider.get('name'), status, wait)
+                time.sleep(wait)
+
+    def _serialize_cells(self, cells):
+        return [[cell.row, cell.col, cell.value] for cell in cells]
+
+    def _get_worksheet(self, provider, refresh=False):
         """Get worksheet from google spreadsheet
 
+        Authorized client and worksheet are reused by following updates, the client
+        refreshes its token when it expires and spreadsheet permissions are checked
+        again every ``SPREADSHEET_PERMISSION_CHECK_INTERVAL`` seconds.
+
+        :param dict provider: ingest provider
+        :param bool refresh: authorize and check permissions even if cached
         :return: worksheet
         :rtype: object
         """
-        scope = [
-            'https://spreadsheets.google.com/feeds',
-            'https://www.googleapis.com/auth/drive',
-        ]
         config = provider.get('config', {})
         url = config.get('url', '')
         service_account = config.get('service_account', '')
         title = config.get('worksheet_title', '')
+        key = self._get_cache_key(provider)
 
         try:
-            service_account = json.loads(service_account)
-            credentials = ServiceAccountCredentials.from_json_keyfile_dict(service_account, scope)
-            gc = gspread.authorize(credentials)
-            spreadsheet = gc.open_by_url(url)
-            permission = spreadsheet.list_permissions()[0]
-            if permission['role'] != 'writer':
-                raise IngestSpreadsheetError.SpreadsheetPermissionError()
-            worksheet = spreadsheet.worksheet(title)
-            return worksheet
+            cached = _worksheets.get(key) if not refresh else None
+            if cached is None:
+                credentials = ServiceAccountCredentials.from_json_keyfile_dict(json.loads(service_account), SCOPE)
+                gc = gspread.authorize(credentials)
+                spreadsheet = gc.open_by_url(url)
+                cached = {'client': gc, 'spreadsheet': spreadsheet, 'worksheet': None, 'checked': None}
+            else:
+                # refreshes access token if it's expired
+                cached['client'].login()
+
+            interval = app.config.get('SPREADSHEET_PERMISSION_CHECK_INTERVAL', 3600)
+            if cached['checked'] is None or time.monotonic() - cached['checked'] >= interval:
+                permission = cached['spreadsheet'].list_permissions()[0]
+                if permission['role'] != 'writer':
+                    raise IngestSpreadsheetError.SpreadsheetPermissionError()
+                cached['checked'] = time.monotonic()
+            if cached['worksheet'] is None:
+                cached['worksheet'] = cached['spreadsheet'].worksheet(title)
+            _worksheets[key] = cached
+            return cached['worksheet']
         except (json.decoder.JSONDecodeError, AttributeError, ValueError) as e:
+            _worksheets.pop(key, None)
             # both permission and credential raise Value error
             if e.args[0] == 15100:
                 raise IngestSpreadsheetError.SpreadsheetPermissionError()
@@ -160,53 +273,121 @@ class SpreadsheetFeedingService(FeedingService):
         except gspread.exceptions.WorksheetNotFound:
             raise IngestSpreadsheetError.WorksheetNotFoundError()
         except gspread.exceptions.APIError as e:
-            error = e.response.json()['error']
-            response_code = error['code']
-            logger.error('Provider %s: %s', provider.get('name'), error['message'])
-            if response_code == 403:
-                raise IngestSpreadsheetError.SpreadsheetPermissionError()
-            elif response_code == 429:
-                raise IngestSpreadsheetError.SpreadsheetQuotaLimitError()
-            else:
-                raise IngestApiError.apiNotFoundError()
+            self._handle_api_error(e, provider)
+
+    def _get_cache_key(self, provider):
+        config = provider.get('config', {})
+        values = [config.get(field, '') for field in ('url', 'service_account', 'worksheet_title')]
+        return hashlib.sha1(json.dumps(values).encode('utf-8')).hexdigest()
+
+    def _handle_api_error(self, error, provider):
+        """Drop cached worksheet and raise ingest error for google api error."""
+        _worksheets.pop(self._get_cache_key(provider), None)
+        error = error.response.json()['error']
+        response_code = error['code']
+        logger.error('Provider %s: %s', provider.get('name'), error['message'])
+        if response_code == 403:
+            raise IngestSpreadsheetError.SpreadsheetPermissionError()
+        elif response_code == 429:
+            raise IngestSpreadsheetError.SpreadsheetQuotaLimitError()
+        else:
+            raise IngestApiError.apiNotFoundError()
 
     def _process_event_items(self, items, provider):
+        """Save contacts and locations of items and merge items with existing events.
+
+        Existing events, contacts and locations are fetched using single query per
+        collection, new contacts and locations are created in bulk and changes
+        of existing ones from updated rows are stored using single bulk write.
+        """
         events_service = superdesk.get_resource_service('events')
-        list_items = []
+        contact_service = superdesk.get_resource_service('contacts')
+        location_service = superdesk.get_resource_service('locations')
+
+        old_items = {}
+        if items:
+            lookup = {GUID_FIELD: {'$in': [item[GUID_FIELD] for item in items]}}
+            old_items = {event[GUID_FIELD]: event for event in events_service.find(lookup)}
+
+        contacts = {}
+        locations = {}
         for item in items:
-            status = item.pop('status')
-            location = item.get('location')
             if item.get('contact'):
-                contact = item.pop('contact')
-                contact_service = superdesk.get_resource_service('contacts')
-                _contact = contact_service.find_one(req=None, **{
-                    'first_name': contact['first_name'],
-                    'last_name': contact['last_name'],
-                    'organisation': contact['organisation'],
-                    'contact_email': contact['contact_email'][0],
-                    'contact_phone.number': contact['contact_phone'][0]['number'],
-                })
+                contacts.setdefault(self._get_contact_key(item['contact']), item['contact'])
+            if item.get('location'):
+                locations.setdefault(self._get_location_key(item['location'][0]), item['location'][0])
+
+        saved_contacts = {}
+        if contacts:
+            lookup = {'$or': [{
+                'first_name': contact['first_name'],
+                'last_name': contact['last_name'],
+                'organisation': contact['organisation'],
+                'contact_email': contact['contact_email'][0],
+                'contact_phone.number': contact['contact_phone'][0]['number'],
+            } for contact in contacts.values()]}
+            for contact in contact_service.find(lookup):
+                for email in contact.get('contact_email') or []:
+                    for phone in contact.get('contact_phone') or []:
+                        key = self._get_contact_key(contact, email, phone.get('number'))
+                        saved_contacts.setdefault(key, contact)
+
+        saved_locations = {}
+        if locations:
+            lookup = {'$or': [{
+                'name': location['name'],
+                'address.line': location['address']['line'],
+                'address.country': location['address']['country'],
+            } for location in locations.values()]}
+            for location in location_service.find(lookup):
+                saved_locations.setdefault(self._get_location_key(location), location)
+
+        new_contacts = {}
+        new_locations = {}
+        contact_updates = {}
+        location_updates = {}
+        for item in items:
+            status = item.get('status')
+            if item.get('contact'):
+                key = self._get_contact_key(item['contact'])
+                _contact = saved_contacts.get(key)
                 if _contact and status == 'UPDATED':
-                    item.setdefault('event_contact_info', [_contact[superdesk.config.ID_FIELD]])
-                    contact_service.patch(_contact[superdesk.config.ID_FIELD], contact)
+                    self._add_updates(contact_updates, _contact, item['contact'])
                 else:
-                    item.setdefault('event_contact_info', list(contact_service.post([contact])))
-
-            if location:
-                location_service = superdesk.get_resource_service('locations')
-                saved_location = list(location_service.find({
-                    'name': location[0]['name'],
-                    'address.line': location[0]['address']['line'],
-                    'address.country': location[0]['address']['country'],
-                }))
+                    new_contacts.setdefault(key, item['contact'])
+            if item.get('location'):
+                key = self._get_location_key(item['location'][0])
+                saved_location = saved_locations.get(key)
                 if saved_location and status == 'UPDATED':
-                    location_service.patch(saved_location[0][superdesk.config.ID_FIELD], location[0])
-                elif not saved_location:
-                    _location = deepcopy(location)
-                    location_service.post(_location)
-                    item['location'][0]['qcode'] = _location[0]['guid']
+                    self._add_updates(location_updates, saved_location, item['location'][0])
+                elif not saved_location and key not in new_locations:
+                    new_locations[key] = deepcopy(item['location'][0])
+
+        self._patch_many('contacts', contact_updates)
+        self._patch_many('locations', location_updates)
+
+        contact_ids = {}
+        if new_contacts:
+            ids = contact_service.post(list(new_contacts.values()))
+            contact_ids = dict(zip(new_contacts.keys(), ids))
+        if new_locations:
+            location_service.post(list(new_locations.values()))
+
+        list_items = []
+        for item in items:
+            status = item.pop('status')
+            if item.get('contact'):
+                key = self._get_contact_key(item.pop('contact'))
+                if key in saved_contacts and status == 'UPDATED':
+                    item.setdefault('event_contact_info', [saved_contacts[key][superdesk.config.ID_FIELD]])
+                else:
+                    item.setdefault('event_contact_info', [contact_ids[key]])
+            if item.get('location'):
+                key = self._get_location_key(item['location'][0])
+                if key in new_locations:
+                    item['location'][0]['qcode'] = new_locations[key]['guid']
 
-            old_item = events_service.find_one(guid=item[GUID_FIELD], req=None)
+            old_item = old_items.get(item[GUID_FIELD])
             if not old_item:
                 if not status:
                     item.setdefault('firstcreated', datetime.now())
@@ -217,6 +398,51 @@ class SpreadsheetFeedingService(FeedingService):
                 list_items.append(old_item)
         return list_items
 
+    def _add_updates(self, updates, original, doc):
+        """Collect changed fields of original document.
+
+        :param dict updates: tuples (original, changes) by document id
+        """
+        changes = {key: value for key, value in doc.items() if original.get(key) != value}
+        if changes:
+            original_changes = updates.setdefault(original[superdesk.config.ID_FIELD], (original, {}))[1]
+            original_changes.update(changes)
+            # following rows are compared with updated document
+            original.update(changes)
+
+    def _patch_many(self, resource, updates):
+        """Store changes of documents using single bulk write and reindex them.
+
+        :param str resource: resource name
+        :param dict updates: tuples (original, changes) by document id
+        """
+        if not updates:
+            return
+        now = utcnow()
+        docs = []
+        requests = []
+        for _id, (original, changes) in updates.items():
+            doc = dict(original, **{superdesk.config.LAST_UPDATED: now})
+            doc[superdesk.config.ETAG] = document_etag(doc)
+            docs.append(doc)
+            requests.append(pymongo.UpdateOne({superdesk.config.ID_FIELD: _id}, {'$set': dict(
+                changes, **{superdesk.config.LAST_UPDATED: now, superdesk.config.ETAG: doc[superdesk.config.ETAG]})}))
+        app.data.get_mongo_collection(resource).bulk_write(requests, ordered=False)
+        search_backend = app.data._search_backend(resource)
+        if search_backend is not None:
+            search_backend.bulk_insert(resource, docs)
+
+    def _get_contact_key(self, contact, email=None, phone=None):
+        if email is None:
+            email = contact['contact_email'][0]
+        if phone is None:
+            phone = contact['contact_phone'][0]['number']
+        return contact.get('first_name'), contact.get('last_name'), contact.get('organisation'), email, phone
+
+    def _get_location_key(self, location):
+        address = location.get('address') or {}
+        return location.get('name'), tuple(address.get('line') or []), address.get('country')
+
 
 register_feeding_service(SpreadsheetFeedingService)
 register_feeding_service_parser(SpreadsheetFeedingService.NAME, 'belgaspreadsheet')
@@ -0,0 +1,196 @@
+# -*- coding: utf-8; -*-
+#
+# This file is part of Superdesk.
+#
+# Copyright 2013 - 2020 Sourcefabric z.u. and contributors.
+#
+# For the full copyright and license information, please see the
+# AUTHORS and LICENSE files distributed with this source code, or
+# at https://www.sourcefabric.org/superdesk/license
+
+import os
+import csv
+import logging
+import datetime
+from itertools import islice
+
+import openpyxl
+from flask import current_app as app
+from superdesk.errors import IngestApiError, ParserError
+from superdesk.io.registry import register_feeding_service, register_feeding_service_parser
+
+from belga.io.feed_parsers.belga_spreadsheet import BelgaSpreadsheetParser
+from belga.io.feeding_services.spreadsheet import SpreadsheetFeedingService
+
+logger = logging.getLogger(__name__)
+
+CSV_DELIMITERS = ',;\t'
+REPORT_SUFFIX = '.report.csv'
+
+
+def _get_cell_value(value):
+    """Format xlsx cell value the way it's exported from google spreadsheet."""
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    if isinstance(value, datetime.datetime):
+        if value.time() == datetime.time():
+            return value.date().isoformat()
+        return value.strftime('%Y-%m-%d %H:%M')
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    if isinstance(value, datetime.time):
+        return value.strftime('%H:%M')
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def read_csv(path):
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        # titles don't contain any of delimiters, unlike values
+        titles = f.readline()
+        delimiter = max(CSV_DELIMITERS, key=titles.count)
+        f.seek(0)
+        yield from csv.reader(f, delimiter=delimiter)
+
+
+def read_xlsx(path, worksheet_title=None):
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        worksheet = workbook[worksheet_title] if worksheet_title else workbook.active
+        for values in worksheet.iter_rows(values_only=True):
+            yield [_get_cell_value(value) for value in values]
+    finally:
+        workbook.close()
+
+
+def read_rows(path, worksheet_title=None):
+    """Read rows of csv or xlsx file one by one.
+
+    :param str path: file path
+    :param str worksheet_title: sheet of xlsx file, active one if not set
+    :return: generator of lists of cell values
+    """
+    if os.path.splitext(path)[1].lower() in ('.xlsx', '.xlsm'):
+        return read_xlsx(path, worksheet_title)
+    return read_csv(path)
+
+
+class SpreadsheetFileFeedingService(SpreadsheetFeedingService):
+    """Events from local csv or xlsx file using spreadsheet template.
+
+    File is read row by row and events are ingested in batches of
+    ``SPREADSHEET_FILE_BATCH_SIZE``.  It's not modified, status of processed
+    rows is written to report file next to it instead.
+    """
+
+    NAME = 'spreadsheet_file'
+    ERRORS = [
+        IngestApiError.apiNotFoundError().get_error_description(),
+        ParserError.parseFileError().get_error_description(),
+    ]
+
+    label = 'Events from CSV/XLSX file'
+
+    fields = [
+        {
+            'id': 'path', 'type': 'text', 'label': 'File path',
+            'placeholder': 'Path to CSV or XLSX file', 'required': True,
+            'errors': {
+                1001: 'Can\'t parse file.',
+                1002: 'Can\'t parse file.',
+                4006: 'File not found.',
+            }
+        },
+        {
+            'id': 'worksheet_title', 'type': 'text', 'label': 'Sheet title',
+            'placeholder': 'Title / Name of XLSX sheet, first one if empty', 'required': False,
+        },
+    ]
+
+    def _test(self, provider):
+        rows = read_rows(self._get_path(provider), provider.get('config', {}).get('worksheet_title'))
+        BelgaSpreadsheetParser().parse_titles(next(rows, []))
+
+    def _update(self, provider, update):
+        """Ingest events from file if it was modified since last update.
+
+        Only rows which are new or were modified are parsed.
+        """
+        path = self._get_path(provider)
+        stat = os.stat(path)
+        private = provider.get('private') or {}
+        signature = [stat.st_mtime, stat.st_size]
+        if private.get('file') == signature:
+            return
+
+        row_hashes = []
+        yield from self.import_file(provider, set(private.get('row_hashes') or []), row_hashes)
+        update['private'] = dict(private, file=signature, row_hashes=row_hashes)
+
+    def import_file(self, provider, row_hashes=None, new_row_hashes=None, batch_size=None):
+        """Parse file and yield batches of events to ingest.
+
+        The file uses the same layout as google spreadsheet, titles in first row
+        and events starting on third row.  Columns ``_STATUS``, ``_ERR_MESSAGE`` and
+        ``_GUID`` are optional, it's possible to update events using report file columns.
+
+        :param dict provider: ingest provider
+        :param set row_hashes: hashes of rows processed before, those are skipped
+        :param list new_row_hashes: hashes of all file rows are added to this list
+        :param int batch_size: number of rows parsed at once
+        :return: generator of lists of events
+        """
+        config = provider.get('config', {})
+        path = self._get_path(provider)
+        batch_size = batch_size or app.config.get('SPREADSHEET_FILE_BATCH_SIZE', 500)
+        parser = BelgaSpreadsheetParser()
+
+        rows = read_rows(path, config.get('worksheet_title'))
+        titles = [s.lower().strip() for s in next(rows, [])]
+        for field in parser.generate_fields:
+            if field.lower() not in titles:
+                titles.append(field.lower())
+        index = parser.parse_titles(titles)
+        # skip second title row
+        next(rows, None)
+        rows = enumerate(rows, 3)
+        counts = {}
+
+        with open(path + REPORT_SUFFIX, 'w', newline='', encoding='utf-8') as report_file:
+            report = csv.writer(report_file)
+            report.writerow(['Row'] + parser.generate_fields)
+            while True:
+                batch = [(row, values + [''] * (len(titles) - len(values))) for row, values in islice(rows, batch_size)]
+                if not batch:
+                    break
+                # hashes of rows as those are in file, it's not updated
+                hashes = parser.get_row_hashes([values for _, values in batch], counts)
+                items, cells_list, _ = parser.parse_batch(batch, index, provider, row_hashes, hashes)
+                if new_row_hashes is not None:
+                    new_row_hashes.extend(hashes)
+                self._write_report(report, parser, batch, cells_list, index)
+                items = self._process_event_items(items, provider)
+                if items:
+                    yield items
+
+    def _get_path(self, provider):
+        path = provider.get('config', {}).get('path', '')
+        if not os.path.isfile(path):
+            raise IngestApiError.apiNotFoundError()
+        return path
+
+    def _write_report(self, report, parser, batch, cells_list, index):
+        cells = {}
+        for cell in cells_list:
+            cells.setdefault(cell.row, []).append(cell)
+        for row, values in batch:
+            if row in cells:
+                values = parser.apply_cells(values, cells[row])
+                report.writerow([row] + [values[index[field]] for field in parser.generate_fields])
+
+
+register_feeding_service(SpreadsheetFileFeedingService)
+register_feeding_service_parser(SpreadsheetFileFeedingService.NAME, 'belgaspreadsheet')
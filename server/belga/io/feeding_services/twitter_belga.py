@@ -8,9 +8,13 @@
 # AUTHORS and LICENSE files distributed with this source code, or
 # at https://www.sourcefabric.org/superdesk/license
 import re
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 
 import requests
+from flask import current_app as app
 
 import superdesk
 from superdesk.errors import IngestTwitterError, SuperdeskIngestError
@@ -18,6 +22,21 @@ from superdesk.io.feeding_services import TwitterFeedingService
 from superdesk.io.registry import register_feeding_service, register_feeding_service_parser
 from superdesk.metadata.item import GUID_FIELD
 
+from belga.http_client import HTTPSession
+from belga.io.priority import get_groups
+
+logger = logging.getLogger(__name__)
+
+URL_RE = re.compile(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-;]|[\[\]?@_~]|(?:%[0-9a-fA-F][0-9a-fA-F]))+')
+#: connect and read timeout for iframely requests
+EMBED_TIMEOUT = (3.05, 10)
+EMBED_CACHE_SIZE = 10000
+
+#: url embeds by (url, iframely key)
+_embed_cache = {}
+
+IFRAMELY_URL = 'https://iframe.ly/'
+
 
 class IngestTwitterBelgaError(SuperdeskIngestError):
     _codes = {
@@ -80,45 +99,157 @@ class TwitterBelgaFeedingService(TwitterFeedingService):
         self._create_embed('https://iframely.com', key)
 
     def _update(self, provider, update, test=False):
-        items = super()._update(provider, update, test)[0]
-        return self.parse_twitter_belga(items, provider)
+        """Get new tweets.
+
+        Tweets are fetched by core service for each screen name, only those newer than
+        the last one ingested for the screen name are kept. Ids of those are stored
+        in provider ``private`` data as ``since_id``.
+        """
+        config = provider.get('config', {})
+        screen_names = [name.replace(' ', '') for name in (config.get('screen_names') or '').split(',')]
+        if not any(screen_names):
+            raise IngestTwitterError.TwitterNoScreenNamesError(provider=provider)
+
+        private = provider.get('private') or {}
+        since_ids = dict(private.get('since_id') or {})
+        new_items = []
+        for screen_name in screen_names:
+            single = dict(provider, config=dict(config, screen_names=screen_name))
+            try:
+                items = super()._update(single, update, test)[0]
+            except UnboundLocalError:
+                # core service fails this way on twitter errors other than invalid credentials or missing page
+                logger.warning('Failed to get tweets for %s', screen_name)
+                continue
+            since_id = since_ids.get(screen_name)
+            for group in get_groups(items):
+                status_id = max(get_status_id(item) for item in group)
+                if since_id is None or status_id > since_id:
+                    new_items.extend(group)
+                    since_ids[screen_name] = max(status_id, since_ids.get(screen_name) or 0)
+
+        if update is not None and not test:
+            update['private'] = dict(private, since_id=since_ids)
+        return self.parse_twitter_belga(new_items, provider)
 
     def parse_twitter_belga(self, items, provider):
         config = provider.get('config', {})
         key = config.get('iframely_key')
         embed = config.get('embed_tweet')
-        ingest_service = superdesk.get_resource_service('ingest')
-        # get all guid of old items
-        old_guid = [item[GUID_FIELD] for item in
-                    ingest_service.find({GUID_FIELD: {"$in": [item[GUID_FIELD] for item in items]}})]
-        # remove all old item
-        [items.remove(item) for item in items.copy() if item[GUID_FIELD] in old_guid]
-        for item in items:
-            if embed:
-                urls = re.findall(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-;]|[\[\]?@_~]|'
-                                  r'(?:%[0-9a-fA-F][0-9a-fA-F]))+',
-                                  item.get('body_html', ''))
-                for url in set(urls):
-                    embed_content = self._create_embed(url, key)
+        if items:
+            # since_id should filter out old tweets, this is just to be safe
+            ingest_service = superdesk.get_resource_service('ingest')
+            old_guids = {item[GUID_FIELD] for item in
+                         ingest_service.find({GUID_FIELD: {"$in": [item[GUID_FIELD] for item in items]}})}
+            items = [item for item in items if item[GUID_FIELD] not in old_guids]
+        if embed:
+            item_urls = [list(dict.fromkeys(URL_RE.findall(item.get('body_html', '')))) for item in items]
+            embeds = self._get_embeds({url for urls in item_urls for url in urls}, key)
+            for item, urls in zip(items, item_urls):
+                for url in urls:
+                    embed_content = embeds.get(url)
                     if embed_content:
                         item['body_html'] += '<!-- EMBED START Twitter -->'
                         item['body_html'] += embed_content
                         item['body_html'] += '<!-- EMBED END Twitter -->'
         return [items]
 
+    def _get_embeds(self, urls, key):
+        """Get embed html for all urls.
+
+        Each url is resolved only once per poll, results are cached for ``TWITTER_EMBED_CACHE_TTL``
+        seconds and urls not found are cached for ``TWITTER_EMBED_NEGATIVE_CACHE_TTL`` seconds.
+        Missing urls are resolved concurrently.
+
+        :return: dict of url: embed html
+        """
+        now = time.monotonic()
+        embeds = {}
+        missing = []
+        for url in urls:
+            cached = _embed_cache.get((url, key))
+            if cached is not None and cached[0] > now:
+                embeds[url] = cached[1]
+            else:
+                missing.append(url)
+
+        if missing:
+            workers = min(len(missing), app.config.get('TWITTER_EMBED_WORKERS', 10))
+            executor = ThreadPoolExecutor(workers)
+            futures = {url: executor.submit(self._create_embed, url, key) for url in missing}
+            try:
+                results = self._get_results(futures)
+            except IngestTwitterBelgaError:
+                # invalid key would fail for every url, so don't wait for the rest
+                for future in futures.values():
+                    future.cancel()
+                raise
+            finally:
+                executor.shutdown(wait=False)
+            for url, embed_content in results.items():
+                if embed_content is None:
+                    embeds[url] = ''
+                    ttl = app.config.get('TWITTER_EMBED_NEGATIVE_CACHE_TTL', 3600)
+                else:
+                    embeds[url] = embed_content
+                    ttl = app.config.get('TWITTER_EMBED_CACHE_TTL', 24 * 3600)
+                _cache_embed((url, key), embeds[url], now + ttl)
+        return embeds
+
+    def _get_results(self, futures):
+        """Get embeds as lookups finish, urls which failed are left out.
+
+        :param dict futures: url: future
+        :raises IngestTwitterBelgaError: if iframely key is invalid
+        """
+        results = {}
+        urls = {future: url for url, future in futures.items()}
+        for future in as_completed(urls):
+            url = urls[future]
+            try:
+                results[url] = future.result()
+            except IngestTwitterBelgaError:
+                raise
+            except (requests.RequestException, ValueError) as ex:
+                logger.warning('Failed to get embed for %s: %s', url, ex)
+        return results
+
     def _create_embed(self, url, key):
         """
         Get embed html from iframely service for provided url
+
+        :return: embed html or ``None`` when iframely can't handle the url
+        :raises requests.HTTPError: on temporary failure (rate limit or server error)
         """
-        response = requests.get('https://iframe.ly/api/oembed?url={}&api_key={}'.format(url, key))
-        content = response.json()
+        response = HTTPSession(IFRAMELY_URL).get(
+            '{}api/oembed?url={}&api_key={}'.format(IFRAMELY_URL, url, key), timeout=EMBED_TIMEOUT)
         if response.status_code == 200:
-            return content.get('html', '')
+            return response.json().get('html', '')
         elif response.status_code == 403:
             raise IngestTwitterBelgaError.TwitterInvalidIframelyKey()
+        elif response.status_code == 429 or response.status_code >= 500:
+            # not cached, url is resolved again during next poll
+            response.raise_for_status()
         # when turn off setting: On URL errors, don't repeat it as HTTP status (use code 200 instead)
         # iframely will return 417 response on URL error
-        return ''
+        return None
+
+
+def get_status_id(item):
+    """Get id of tweet from item created by core service, packages and images have none."""
+    url = (item.get('extra') or {}).get('tweet_url')
+    return int(url.rsplit('/', 1)[-1]) if url else 0
+
+
+def _cache_embed(key, embed_content, expires):
+    if len(_embed_cache) >= EMBED_CACHE_SIZE:
+        now = time.monotonic()
+        for cache_key in [k for k, v in _embed_cache.items() if v[0] <= now]:
+            del _embed_cache[cache_key]
+        while len(_embed_cache) >= EMBED_CACHE_SIZE:
+            # dict keeps insertion order so the oldest entry goes first
+            del _embed_cache[next(iter(_embed_cache))]
+    _embed_cache[key] = (expires, embed_content)
 
 
 register_feeding_service(TwitterBelgaFeedingService)
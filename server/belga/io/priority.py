@@ -0,0 +1,101 @@
+# -*- coding: utf-8; -*-
+#
+# This file is part of Superdesk.
+#
+# Copyright 2013 - 2020 Sourcefabric z.u. and contributors.
+#
+# For the full copyright and license information, please see the
+# AUTHORS and LICENSE files distributed with this source code, or
+# at https://www.sourcefabric.org/superdesk/license
+
+"""Ordering of ingested items so that urgent news is saved and routed first."""
+
+import heapq
+
+#: items without priority or urgency go after all others
+LOWEST_PRIORITY = float('inf')
+
+
+def get_priority(item):
+    """Get item priority, lower is more urgent.
+
+    Uses the most urgent value of ``priority`` and ``urgency``,
+    both can be set as int or string by parsers.
+    """
+    values = []
+    for field in ('priority', 'urgency'):
+        try:
+            value = int(item.get(field))
+        except (TypeError, ValueError):
+            continue
+        if value > 0:
+            values.append(value)
+    return min(values, default=LOWEST_PRIORITY)
+
+
+def get_batch_priority(items):
+    """Get priority of the most urgent item."""
+    return min(map(get_priority, items), default=LOWEST_PRIORITY)
+
+
+def get_refs(item):
+    """Get guids of items referenced by a package."""
+    return [ref['residRef'] for group in item.get('groups') or [] for ref in group.get('refs') or []
+            if ref.get('residRef')]
+
+
+def get_groups(items):
+    """Group packages with items they reference.
+
+    Items of a group keep their order, groups are ordered by their first item.
+
+    :param list items: parsed items
+    :return: list of lists of items
+    """
+    positions = {item.get('guid'): i for i, item in enumerate(items)}
+    parents = list(range(len(items)))
+
+    def find(i):
+        while parents[i] != i:
+            i = parents[i]
+        return i
+
+    for i, item in enumerate(items):
+        for ref in get_refs(item):
+            if ref in positions:
+                a, b = find(i), find(positions[ref])
+                parents[max(a, b)] = min(a, b)
+    groups = {}
+    for i, item in enumerate(items):
+        groups.setdefault(find(i), []).append(item)
+    return [groups[i] for i in sorted(groups)]
+
+
+def sort_by_priority(items):
+    """Return items ordered by priority, items with same priority keep their order.
+
+    A package is moved together with items it references, using the most urgent
+    of those, so the order of package and its items is kept.
+
+    :param list items: parsed items
+    :return: list of items
+    """
+    queue = [(get_batch_priority(group), i, group) for i, group in enumerate(get_groups(items))]
+    heapq.heapify(queue)
+    return [item for _ in range(len(queue)) for item in heapq.heappop(queue)[2]]
+
+
+def sort_batches_by_priority(batches):
+    """Order items within batches and batches by their most urgent item.
+
+    Feeding services return list of batches which are ingested one after another,
+    so a flash must be in the first batch to not wait for the rest.
+
+    :param list batches: list of lists of items
+    :return: list of lists of items
+    """
+    queue = []
+    for i, batch in enumerate(batches):
+        queue.append((get_batch_priority(batch), i, sort_by_priority(batch)))
+    heapq.heapify(queue)
+    return [heapq.heappop(queue)[2] for _ in range(len(queue))]
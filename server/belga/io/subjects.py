@@ -0,0 +1,76 @@
+# -*- coding: utf-8; -*-
+#
+# This file is part of Superdesk.
+#
+# Copyright 2013 - 2020 Sourcefabric z.u. and contributors.
+#
+# For the full copyright and license information, please see the
+# AUTHORS and LICENSE files distributed with this source code, or
+# at https://www.sourcefabric.org/superdesk/license
+
+
+class SubjectSet:
+    """Item subjects deduplicated by scheme and qcode.
+
+    Subjects are kept in insertion order, adding a subject which is already
+    there (same scheme and qcode) keeps the first one.
+    """
+
+    __slots__ = ('_subjects',)
+
+    def __init__(self, subjects=None):
+        self._subjects = {}
+        if subjects:
+            self.extend(subjects)
+
+    @staticmethod
+    def get_key(subject):
+        return subject.get('scheme'), subject.get('qcode')
+
+    def add(self, subject):
+        self._subjects.setdefault(self.get_key(subject), subject)
+
+    def extend(self, subjects):
+        for subject in subjects:
+            self.add(subject)
+
+    def has_scheme(self, scheme):
+        return any(key[0] == scheme for key in self._subjects)
+
+    def discard_scheme(self, scheme):
+        self._subjects = {key: subject for key, subject in self._subjects.items() if key[0] != scheme}
+
+    def to_list(self, key=None):
+        """Get subjects as list of dicts, sorted using ``key`` if set."""
+        subjects = [dict(subject) for subject in self._subjects.values()]
+        if key is not None:
+            subjects.sort(key=key)
+        return subjects
+
+    def __contains__(self, subject):
+        return self.get_key(subject) in self._subjects
+
+    def __iter__(self):
+        return iter(self._subjects.values())
+
+    def __len__(self):
+        return len(self._subjects)
+
+
+def get_subjects(item):
+    """Get item subjects as ``SubjectSet``, it's stored in item until parsing is done.
+
+    :param dict item: item being parsed
+    :rtype: SubjectSet
+    """
+    subjects = item.get('subject')
+    if not isinstance(subjects, SubjectSet):
+        subjects = item['subject'] = SubjectSet(subjects)
+    return subjects
+
+
+def set_subjects_list(item, key=None):
+    """Replace ``SubjectSet`` in item with list once parsing is done."""
+    if 'subject' in item:
+        item['subject'] = get_subjects(item).to_list(key=key)
+    return item
@@ -0,0 +1,237 @@
+# -*- coding: utf-8; -*-
+#
+# This file is part of Superdesk.
+#
+# Copyright 2013 - 2020 Sourcefabric z.u. and contributors.
+#
+# For the full copyright and license information, please see the
+# AUTHORS and LICENSE files distributed with this source code, or
+# at https://www.sourcefabric.org/superdesk/license
+
+"""Latency metrics of Belga macros.
+
+Each call of a macro callback records wall time, number of mongo commands and
+size of the item.  Samples are buffered in memory and stored in the
+``macros_stats`` collection in batches, so metrics of all processes (api and
+celery workers) can be reported by ``macros:report`` command.
+
+When ``MACROS_PROFILE_THRESHOLD`` is set macros are run with cProfile and
+stats of calls slower than threshold are dumped to ``MACROS_PROFILE_DIR``.
+"""
+
+import os
+import re
+import sys
+import json
+import math
+import time
+import cProfile
+import logging
+import tempfile
+import functools
+import threading
+
+import superdesk
+import superdesk.macros
+from flask import current_app as app
+from pymongo import monitoring
+from superdesk.resource import Resource
+from superdesk.services import BaseService
+from superdesk.utc import utcnow
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+_lock = threading.Lock()
+_samples = []
+_last_flush = time.monotonic()
+
+
+class QueryCounter(monitoring.CommandListener):
+    """Count mongo commands sent by current thread."""
+
+    def started(self, event):
+        _local.queries = getattr(_local, 'queries', 0) + 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+_query_counter = None
+
+
+def register_query_counter():
+    """Register mongo commands listener once.
+
+    Listeners are used by clients created later, eve creates those on first use.
+    """
+    global _query_counter
+    with _lock:
+        if _query_counter is None:
+            _query_counter = QueryCounter()
+            monitoring.register(_query_counter)
+
+
+def get_item_size(item):
+    try:
+        return len(json.dumps(item, default=str))
+    except (TypeError, ValueError):
+        return 0
+
+
+def get_percentile(values, percent):
+    """Get percentile of sorted values using nearest rank method."""
+    if not values:
+        return None
+    rank = math.ceil(percent * len(values) / 100.0)
+    return values[min(max(rank, 1), len(values)) - 1]
+
+
+def get_stats(samples):
+    """Aggregate samples per macro.
+
+    :param samples: iterable of samples with ``name``, ``time``, ``queries`` and ``size``
+    :return: list of dicts sorted by total time spent in macro
+    """
+    grouped = {}
+    for sample in samples:
+        grouped.setdefault(sample['name'], []).append(sample)
+    stats = []
+    for name, group in grouped.items():
+        times = sorted(sample['time'] for sample in group)
+        stats.append({
+            'name': name,
+            'count': len(group),
+            'total': sum(times),
+            'p50': get_percentile(times, 50),
+            'p90': get_percentile(times, 90),
+            'p99': get_percentile(times, 99),
+            'max': times[-1],
+            'queries': sum(sample.get('queries') or 0 for sample in group) / len(group),
+            'size': sum(sample.get('size') or 0 for sample in group) / len(group),
+        })
+    return sorted(stats, key=lambda stat: stat['total'], reverse=True)
+
+
+def flush():
+    """Store buffered samples."""
+    global _last_flush
+    with _lock:
+        samples = _samples[:]
+        del _samples[:]
+        _last_flush = time.monotonic()
+    if samples:
+        try:
+            superdesk.get_resource_service('macros_stats').post(samples)
+        except Exception:
+            logger.exception('Failed to store macro stats')
+
+
+def _add_sample(sample):
+    with _lock:
+        _samples.append(sample)
+        full = len(_samples) >= app.config.get('MACROS_STATS_FLUSH_SIZE', 100) or \
+            time.monotonic() - _last_flush >= app.config.get('MACROS_STATS_FLUSH_INTERVAL', 60)
+    if full:
+        flush()
+
+
+def _dump_profile(profile, name, elapsed):
+    path = os.path.join(
+        app.config.get('MACROS_PROFILE_DIR') or tempfile.gettempdir(),
+        '{}-{}.prof'.format(re.sub(r'\W+', '_', name).lower(), int(time.time() * 1000)))
+    try:
+        profile.dump_stats(path)
+        logger.warning('Macro "%s" took %.3fs, profile stored to %s', name, elapsed, path)
+    except OSError:
+        logger.exception('Failed to store profile of macro "%s"', name)
+
+
+def profile_macro(name, callback):
+    """Wrap macro callback to record its metrics.
+
+    :param str name: macro name
+    :param callback: macro callback
+    :return: wrapped callback
+    """
+    @functools.wraps(callback)
+    def wrapper(item, **kwargs):
+        if not app.config.get('MACROS_STATS_ENABLED', False):
+            return callback(item, **kwargs)
+
+        threshold = app.config.get('MACROS_PROFILE_THRESHOLD', 0)
+        # only one profiler can be active, nested macros are profiled by outer one
+        profile = cProfile.Profile() if threshold and not getattr(_local, 'profiling', False) else None
+        size = get_item_size(item)
+        queries = getattr(_local, 'queries', 0)
+        start = time.perf_counter()
+        if profile is not None:
+            _local.profiling = True
+            profile.enable()
+        try:
+            return callback(item, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            if profile is not None:
+                profile.disable()
+                _local.profiling = False
+                if elapsed >= threshold:
+                    _dump_profile(profile, name, elapsed)
+            _add_sample({
+                'name': name,
+                'time': elapsed,
+                'queries': getattr(_local, 'queries', 0) - queries,
+                'size': size,
+                'item': str(item.get('_id') or item.get('guid') or '') if isinstance(item, dict) else '',
+                'created': utcnow(),
+            })
+
+    return wrapper
+
+
+def profile_macros(package_prefix):
+    """Wrap callbacks of all loaded macros from given package."""
+    prefix = package_prefix + '.'
+    for module_name, module in list(sys.modules.items()):
+        if not module_name.startswith(prefix) or not hasattr(module, 'callback') or not hasattr(module, 'name'):
+            continue
+        if not hasattr(module.callback, '__wrapped__'):
+            module.callback = profile_macro(module.name, module.callback)
+
+
+def load_macros(path, package_prefix):
+    """Load macros from given path and wrap their callbacks.
+
+    Macro modules are reloaded whenever macros are used, which resets their
+    callbacks, so those are wrapped again by every load.
+    """
+    superdesk.macros.load_macros(path, package_prefix=package_prefix)
+    profile_macros(package_prefix)
+
+
+class MacrosStatsResource(Resource):
+    schema = {
+        'name': {'type': 'string'},
+        'time': {'type': 'float'},
+        'queries': {'type': 'integer'},
+        'size': {'type': 'integer'},
+        'item': {'type': 'string'},
+        'created': {'type': 'datetime'},
+    }
+    internal_resource = True
+    mongo_indexes = {
+        'created_1': ([('created', 1)], {'expireAfterSeconds': 7 * 24 * 3600, 'background': True}),
+    }
+
+
+class MacrosStatsService(BaseService):
+    pass
+
+
+def init_app(app):
+    superdesk.register_resource('macros_stats', MacrosStatsResource, MacrosStatsService, _app=app)
+    if app.config.get('MACROS_STATS_ENABLED'):
+        register_query_counter()
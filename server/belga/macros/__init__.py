@@ -9,7 +9,7 @@
 # at https://www.sourcefabric.org/superdesk/license
 
 import os.path
-from superdesk.macros import load_macros
+from belga.macro_stats import load_macros
 
 
 macros_folder = os.path.realpath(os.path.dirname(__file__))
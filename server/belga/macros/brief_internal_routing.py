@@ -1,4 +1,5 @@
 
+import re
 import logging
 import superdesk
 
@@ -6,12 +7,14 @@ from flask import current_app as app
 from datetime import timedelta
 from superdesk.metadata.item import CONTENT_STATE, PUBLISH_SCHEDULE, SCHEDULE_SETTINGS
 from superdesk.macros.internal_destination_auto_publish import internal_destination_auto_publish
-from superdesk.editor_utils import replace_text, filter_blocks
+from superdesk.editor_utils import Editor3Content
 from apps.archive.common import update_schedule_settings
 from superdesk.errors import StopDuplication, ValidationError
-from superdesk.text_utils import get_word_count
+from superdesk.text_utils import get_text_word_count
 from superdesk.utc import utcnow, utc_to_local
 
+from belga.editor_utils import replace_all
+
 
 CREDITS = 'credits'
 COUNTRY = 'country'
@@ -28,6 +31,9 @@ PRODUCT_MAPPING = {
 TEXT_PROFILE = 'TEXT'
 BRIEF_PROFILE = 'Brief'
 
+MAX_WORD_COUNT = 300
+HEADLINE_PATTERN = re.compile(' BELGANIGHT|BELGANIGHT |BELGANIGHT')
+
 logger = logging.getLogger(__name__)
 
 
@@ -80,8 +86,9 @@ def _get_product_subject(subject: list):
 
 
 def _fix_headline(item):
-    for old in (' BELGANIGHT', 'BELGANIGHT ', 'BELGANIGHT'):
-        replace_text(item, 'headline', old, '', is_html=False)
+    editor = Editor3Content(item, 'headline', is_html=False)
+    if replace_all(editor.content_state, HEADLINE_PATTERN, lambda match: ''):
+        editor.update_item()
 
 
 class BlockFilter():
@@ -94,8 +101,30 @@ class BlockFilter():
         return not self.filtered
 
 
-def _fix_body_html(item):
-    filter_blocks(item, 'body_html', BlockFilter())
+def _get_body(item):
+    """Parse body once, it's used both for word count and filtering."""
+    if 'body_html' not in item:
+        raise KeyError('body_html')
+    return Editor3Content(item, 'body_html')
+
+
+def _get_word_count(content_state):
+    count = 0
+    for block in content_state['blocks']:
+        if block.get('type') == 'atomic':
+            entity = content_state['entityMap'].get(str(block['entityRanges'][0]['key'])) or {}
+            if entity.get('type') == 'TABLE':
+                for row in entity['data']['data']['cells'].values():
+                    count += sum(_get_word_count(cell) for cell in row.values())
+            continue
+        count += get_text_word_count(block.get('text') or '')
+    return count
+
+
+def _fix_body_html(body):
+    block_filter = BlockFilter()
+    body.set_blocks([block for block in body.blocks if block_filter(block)])
+    body.update_item()
 
 
 def brief_internal_routing(item: dict, **kwargs):
@@ -104,7 +133,8 @@ def brief_internal_routing(item: dict, **kwargs):
 
     try:
         assert str(item['profile']) == str(_get_profile_id(TEXT_PROFILE)), 'profile is not text'
-        assert get_word_count(item['body_html']) < 301, 'body is too long'
+        body = _get_body(item)
+        assert _get_word_count(body.content_state) <= MAX_WORD_COUNT, 'body is too long'
     except AssertionError as err:
         logger.info('macro stop on assert item=%s error=%s', guid, err)
         raise StopDuplication()
@@ -120,7 +150,7 @@ def brief_internal_routing(item: dict, **kwargs):
     item['operation'] = 'publish'
 
     _fix_headline(item)
-    _fix_body_html(item)
+    _fix_body_html(body)
 
     # schedule +30m
     UTC_FIELD = 'utc_{}'.format(PUBLISH_SCHEDULE)
@@ -8,7 +8,8 @@
 # AUTHORS and LICENSE files distributed with this source code, or
 # at https://www.sourcefabric.org/superdesk/license
 import logging
-from superdesk import get_resource_service
+
+from belga.cache import get_content_template, get_desk
 
 
 logger = logging.getLogger(__name__)
@@ -30,7 +31,7 @@ def get_default_content_template(item, **kwargs):
         return
 
     if desk is None:
-        desk = get_resource_service('desks').find_one(req=None, _id=desk_id)
+        desk = get_desk(desk_id)
     if not desk:
         logger.warning('Can\'t find desk with id "{desk_id}"'.format(desk_id=desk_id))
         return
@@ -40,7 +41,7 @@ def get_default_content_template(item, **kwargs):
         logger.warning("No default content template set for {desk_name}".format(
             desk_name=desk.get('name', desk_id)))
         return
-    content_template = get_resource_service("content_templates").find_one(req=None, _id=content_template_id)
+    content_template = get_content_template(content_template_id)
     if not content_template:
         logger.warning('Can\'t find content_template with id "{content_template_id}"'.format(
             content_template_id=content_template_id))
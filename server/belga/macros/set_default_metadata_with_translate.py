@@ -10,12 +10,58 @@
 import logging
 from copy import deepcopy
 from superdesk import get_resource_service
-from superdesk.errors import StopDuplication
+from superdesk.errors import StopDuplication, InvalidStateTransitionError
+from superdesk.metadata.item import ITEM_STATE
+from superdesk.metadata.packages import RESIDREF
+from superdesk.utc import utcnow
+from superdesk.workflow import is_workflow_state_transition_valid
 from apps.archive.common import ITEM_DUPLICATE
+from apps.content import push_content_notification
+from apps.packages import PackageService
+from apps.tasks import send_to, apply_onstage_rule
 from .set_default_metadata import get_default_content_template, set_default_metadata
 
 
 logger = logging.getLogger(__name__)
+package_service = PackageService()
+
+
+def _set_translation(new_item, original_item, language):
+    """Set translation metadata like ``translate`` service does.
+
+    Package items are translated using ``translate`` service.
+    """
+    if not is_workflow_state_transition_valid('translate', original_item[ITEM_STATE]):
+        raise InvalidStateTransitionError()
+    if package_service.is_package(new_item):
+        translate_service = get_resource_service('translate')
+        for ref in package_service.get_item_refs(new_item):
+            ref[RESIDREF] = translate_service._translate_item(ref[RESIDREF], language, service=ref.get('location'),
+                                                              task=new_item.get('task'))
+    get_resource_service('macros').execute_translation_macro(new_item, original_item.get('language'), language)
+    new_item['translation_id'] = original_item.get('translation_id') or original_item['_id']
+    new_item['translated_from'] = original_item['_id']
+    new_item['language'] = language
+    new_item['versioncreated'] = new_item['firstcreated'] = utcnow()
+
+
+def _add_translation(original_id, new_id):
+    """Link translation to original item like ``translate`` service does.
+
+    Stored original is used, macro item was already sent to destination.
+    """
+    archive_service = get_resource_service('archive')
+    original = archive_service.find_one(req=None, _id=original_id)
+    updates = {
+        'translation_id': original.get('translation_id') or original['_id'],
+        'translations': original.get('translations', []) + [new_id],
+    }
+    archive_service.system_update(original['_id'], updates, original)
+    published_service = get_resource_service('published')
+    published_service.update_published_items(original['_id'], 'translation_id', updates['translation_id'])
+    published_service.update_published_items(original['_id'], 'translations', updates['translations'])
+    original.update(updates)
+    push_content_notification([original])
 
 
 def set_default_metadata_with_translate(item, **kwargs):
@@ -23,11 +69,10 @@ def set_default_metadata_with_translate(item, **kwargs):
 
     This macro is the same as "Set Default Metadata" + adding a translation
     link to original item.
-    """
-    archive_service = get_resource_service('archive')
-    move_service = get_resource_service('move')
-    original_item = archive_service.find_one(None, _id=item['_id'])
 
+    New item is created already moved to destination desk and with default metadata
+    applied, so there is single write of the translated/duplicated item.
+    """
     desk_id = kwargs.get('dest_desk_id')
     if not desk_id:
         logger.warning("no destination id specified")
@@ -37,28 +82,36 @@ def set_default_metadata_with_translate(item, **kwargs):
         logger.warning("no stage id specified")
         return
 
-    # we first do the translation, we need destination language for that
+    # we need destination language for the translation
     content_template = get_default_content_template(item, **kwargs)
     template_language = content_template['data'].get('language')
+    new_item = deepcopy(item)
+    translate = template_language and template_language != item.get('language')
     if not template_language:
         logger.warning("no language set in default content template")
-        new_id = archive_service.duplicate_item(original_doc=original_item, operation=ITEM_DUPLICATE)
-    elif template_language == original_item.get('language'):
-        new_id = archive_service.duplicate_item(original_doc=original_item, operation=ITEM_DUPLICATE)
-    else:
-        new_item = deepcopy(original_item)
-        new_item['language'] = template_language
-        translate_service = get_resource_service('translate')
-        new_id = translate_service.create([new_item])[0]
 
-    # translation/duplication is done, we now move the item to the new desk
-    dest = {"task": {"desk": desk_id, "stage": stage_id}}
-    move_service.move_content(new_id, dest)
-
-    # and now we apply the update
-    new_item = archive_service.find_one(req=None, _id=new_id)
+    # item is sent to destination already by internal destinations
+    task = new_item.get('task') or {}
+    if str(task.get('desk')) != str(desk_id) or str(task.get('stage')) != str(stage_id):
+        send_to(new_item, desk_id=desk_id, stage_id=stage_id)
+        get_resource_service('move').set_change_in_desk_type(new_item, item)
+    if translate:
+        # package items are translated to destination too
+        _set_translation(new_item, item, template_language)
     set_default_metadata(new_item, **kwargs)
-    archive_service.put(new_id, new_item)
+
+    archive_service = get_resource_service('archive')
+    if translate:
+        new_id = archive_service.duplicate_item(
+            new_item, extra_fields=['translation_id', 'translated_from'], operation='translate')
+        _add_translation(item['_id'], new_id)
+    else:
+        new_id = archive_service.duplicate_item(new_item, operation=ITEM_DUPLICATE)
+
+    # finally apply any on stage rules/macros like move does, using stored item
+    stage = get_resource_service('stages').find_one(req=None, _id=stage_id)
+    if stage and stage.get('onstage_macro'):
+        apply_onstage_rule(archive_service.find_one(req=None, _id=new_id), new_id)
 
     # no need for further treatment, we stop here internal_destinations workflow
     raise StopDuplication
@@ -1,4 +1,8 @@
-from superdesk.editor_utils import replace_text
+import re
+
+from superdesk.editor_utils import Editor3Content
+
+from belga.editor_utils import replace_all
 
 COUNTRIES = {
     "nl": [
@@ -625,19 +629,63 @@ COUNTRIES = {
 }
 
 
+def get_translations(countries):
+    """Compile mapping of country codes for every (source, target) language pair.
+
+    Codes are translated using their position in language lists,
+    so lists must have same length and no duplicate codes.
+
+    :param dict countries: country codes per language
+    :return: dict of code mappings by (source, target) language tuple
+    """
+    size = len(next(iter(countries.values())))
+    for lang, codes in countries.items():
+        if len(codes) != size:
+            raise ValueError('Country codes for "{}" have {} codes, expected {}'.format(lang, len(codes), size))
+        if len(set(codes)) != size:
+            raise ValueError('Country codes for "{}" are not unique'.format(lang))
+    return {
+        (source, target): dict(zip(countries[source], countries[target]))
+        for source in countries for target in countries if source != target
+    }
+
+
+def get_target_translations(translations):
+    """Merge mappings to each target language from all other languages.
+
+    Codes are matched in ``({})`` and ``({}/`` templates, if a code is used by more
+    source languages the first one wins.  Codes of target language are never
+    translated, even if other language uses the same code for another country.
+
+    :return: dict of tuples (code mapping, pattern) by target language
+    """
+    targets = {}
+    native = {}
+    for (source, target), mapping in translations.items():
+        targets.setdefault(target, {})
+        native.setdefault(target, set()).update(mapping.values())
+        for code, translated in mapping.items():
+            targets[target].setdefault(code, translated)
+    for target, mapping in targets.items():
+        mapping = {code: translated for code, translated in mapping.items() if code not in native[target]}
+        codes = sorted(mapping, key=len, reverse=True)
+        pattern = re.compile(r'\((' + '|'.join(re.escape(code) for code in codes) + r')(?=[)/])')
+        targets[target] = (mapping, pattern)
+    return targets
+
+
+TRANSLATIONS = get_translations(COUNTRIES)
+TARGET_TRANSLATIONS = get_target_translations(TRANSLATIONS)
+
+
 def callback(item, **kwargs):
-    if not item.get("language") or not COUNTRIES.get(item["language"]):
+    if not item.get("language") or item["language"] not in TARGET_TRANSLATIONS:
         return
 
-    translated = COUNTRIES[item["language"]]
-    tpls = ('({})', '({}/')
-
-    for lang in COUNTRIES:
-        if lang == item["language"]:
-            continue
-        for i, country in enumerate(COUNTRIES[lang]):
-            for tpl in tpls:
-                replace_text(item, "body_html", tpl.format(country), tpl.format(translated[i]))
+    mapping, pattern = TARGET_TRANSLATIONS[item["language"]]
+    editor = Editor3Content(item, "body_html")
+    if replace_all(editor.content_state, pattern, lambda match: "(" + mapping[match.group(1)]):
+        editor.update_item()
 
     return item
 
@@ -1208,11 +1208,11 @@ class BelgaNewsML12Formatter(NewsML12Formatter):
                 newsml_item.update(video)
                 newsml_item['_role'] = self.NEWSCOMPONENT2_ROLES.VIDEO
                 newsml_items_chain.append(newsml_item)
-            # belga.coverage custom fields
+            # belga.coverage custom fields, provider uses shared http client
+            belga_cov_search_provider = BelgaCoverageSearchProvider({})
             for field_id in self._belga_coverage_field_ids:
                 if field_id in sd_item_extra:
                     belga_item_id = sd_item_extra[field_id]
-                    belga_cov_search_provider = BelgaCoverageSearchProvider({})
                     try:
                         data = belga_cov_search_provider.api_get('/getGalleryById',
                                                                  {'i': belga_item_id.rsplit(':', 1)[-1]})
@@ -11,6 +11,8 @@ from superdesk.utc import local_to_utc
 from superdesk.utils import ListCursor
 from superdesk.text_utils import get_text as _get_text
 
+from belga.http_client import HTTPSession
+
 BELGA_TZ = 'Europe/Brussels'
 
 
@@ -51,7 +53,7 @@ class BelgaImageSearchProvider(superdesk.SearchProvider):
 
     def __init__(self, provider, **kwargs):
         super().__init__(provider, **kwargs)
-        self.session = requests.Session()
+        self.session = HTTPSession(self.base_url)
         self._id_token = None
         self._auth_token = None
         if self.provider.get('config') and self.provider['config'].get('username'):
@@ -228,7 +230,7 @@ class Belga360ArchiveSearchProvider(superdesk.SearchProvider):
 
     def __init__(self, provider):
         super().__init__(provider)
-        self.session = requests.Session()
+        self.session = HTTPSession(self.base_url)
 
     def url(self, resource):
         return urljoin(self.base_url, resource.lstrip('/'))
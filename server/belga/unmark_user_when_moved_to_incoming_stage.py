@@ -1,9 +1,10 @@
 
 import logging
 
-from superdesk import get_resource_service
 from superdesk.signals import item_move
 
+from belga.cache import get_desk
+
 logger = logging.getLogger(__name__)
 
 
@@ -15,7 +16,7 @@ def unmark_user(sender, item, original):
 
     try:
         new_stage = item['task']['stage']
-        desk = get_resource_service('desks').find_one(req=None, _id=item['task']['desk'])
+        desk = get_desk(item['task']['desk'])
         if desk['incoming_stage'] == new_stage:
             item['previous_marked_user'] = marked_for_user
             item['marked_for_user'] = None
@@ -0,0 +1,45 @@
+# -*- coding: utf-8; -*-
+#
+# This file is part of Superdesk.
+#
+# Copyright 2013 - 2020 Sourcefabric z.u. and contributors.
+#
+# For the full copyright and license information, please see the
+# AUTHORS and LICENSE files distributed with this source code, or
+# at https://www.sourcefabric.org/superdesk/license
+
+"""Pools of worker processes used by batch jobs.
+
+Workers are forked from current process so they get already initialized app
+without pickling it.  Mongo clients are not fork safe, so clients inherited
+from the parent are dropped in workers and new ones are created on first use.
+"""
+
+import multiprocessing
+
+from flask import current_app as app
+
+
+def reset_mongo_clients(worker_app):
+    """Drop mongo clients inherited from parent process."""
+    worker_app.data.mongo.driver.clear()
+
+
+def _init_worker(worker_app, initializer, initargs):
+    worker_app.app_context().push()
+    reset_mongo_clients(worker_app)
+    if initializer is not None:
+        initializer(*initargs)
+
+
+def get_pool(workers, initializer=None, initargs=()):
+    """Fork pool of worker processes with app context of current app.
+
+    :param int workers: number of worker processes
+    :param initializer: function called in every worker once app context is set
+    :param tuple initargs: initializer arguments
+    :return: ``multiprocessing.Pool``
+    """
+    context = multiprocessing.get_context('fork')
+    return context.Pool(workers, initializer=_init_worker,
+                        initargs=(app._get_current_object(), initializer, initargs))
@@ -31,6 +31,8 @@ INSTALLED_APPS.extend([
     'belga.macros',
     'belga.update',
     'belga.unmark_user_when_moved_to_incoming_stage',
+    'belga.cache',
+    'belga.macro_stats',
 ])
 
 SECRET_KEY = env('SECRET_KEY', '')
@@ -183,3 +185,60 @@ GRAMMALECTE_CONFIG = {
 # Suffix used in belga URN schema generation for Belga NewsMl output
 # SDBELGA-355
 OUTPUT_BELGA_URN_SUFFIX = env('OUTPUT_BELGA_URN_SUFFIX', 'dev')
+
+# Ingest-time detection of wire stories which were already received,
+# duplicates are either tagged (``extra.duplicate_of``) or skipped
+INGEST_DUPLICATES_ENABLED = env('INGEST_DUPLICATES_ENABLED', 'false').lower() in ('true', '1')
+INGEST_DUPLICATES_WINDOW = int(env('INGEST_DUPLICATES_WINDOW', 24))  # hours
+INGEST_DUPLICATES_ACTION = env('INGEST_DUPLICATES_ACTION', 'tag')  # tag or skip
+# Number of files parsed before those are ingested by Belga file feed
+INGEST_FILE_BATCH_SIZE = int(env('INGEST_FILE_BATCH_SIZE', 100))
+
+# Email ingest, number of messages fetched by single IMAP command
+EMAIL_FETCH_BATCH_SIZE = int(env('EMAIL_FETCH_BATCH_SIZE', 50))
+# Email ingest, maximal size (in bytes) of messages fetched by single IMAP command
+EMAIL_FETCH_MAX_SIZE = int(env('EMAIL_FETCH_MAX_SIZE', 10 * 1024 * 1024))
+# Wait up to given number of seconds for new mail using IMAP IDLE when mailbox is empty, 0 to disable
+EMAIL_IDLE_TIMEOUT = int(env('EMAIL_IDLE_TIMEOUT', 0))
+# Email attachments bigger than this (in bytes) are decoded to a temporary file on disk
+EMAIL_ATTACHMENT_SPOOL_SIZE = int(env('EMAIL_ATTACHMENT_SPOOL_SIZE', 1024 * 1024))
+
+# Twitter ingest, iframely embeds are cached for given number of seconds,
+# urls iframely can't handle are cached for shorter time
+TWITTER_EMBED_CACHE_TTL = int(env('TWITTER_EMBED_CACHE_TTL', 24 * 3600))
+TWITTER_EMBED_NEGATIVE_CACHE_TTL = int(env('TWITTER_EMBED_NEGATIVE_CACHE_TTL', 3600))
+# Number of concurrent iframely requests
+TWITTER_EMBED_WORKERS = int(env('TWITTER_EMBED_WORKERS', 10))
+
+# Spreadsheet ingest, spreadsheet permissions are checked again after given number of seconds
+SPREADSHEET_PERMISSION_CHECK_INTERVAL = int(env('SPREADSHEET_PERMISSION_CHECK_INTERVAL', 3600))
+# Number of rows ingested at once from CSV/XLSX event files
+SPREADSHEET_FILE_BATCH_SIZE = int(env('SPREADSHEET_FILE_BATCH_SIZE', 500))
+# Spreadsheet status cells are written in batches of given number of rows,
+# each batch is retried with exponential backoff starting at given delay (in seconds),
+# batches which still fail are written on next update
+SPREADSHEET_WRITE_BATCH_ROWS = int(env('SPREADSHEET_WRITE_BATCH_ROWS', 500))
+SPREADSHEET_WRITE_RETRIES = int(env('SPREADSHEET_WRITE_RETRIES', 2))
+SPREADSHEET_WRITE_DELAY = int(env('SPREADSHEET_WRITE_DELAY', 1))
+
+# Desks and content templates used for routing are cached for given number of seconds
+DESK_CACHE_TTL = int(env('DESK_CACHE_TTL', 60))
+
+# Macros latency metrics (disabled by default),
+# samples are stored in batches of given size or after given number of seconds
+MACROS_STATS_ENABLED = env('MACROS_STATS_ENABLED', 'false').lower() in ('true', '1')
+MACROS_STATS_FLUSH_SIZE = int(env('MACROS_STATS_FLUSH_SIZE', 100))
+MACROS_STATS_FLUSH_INTERVAL = int(env('MACROS_STATS_FLUSH_INTERVAL', 60))
+# Macros taking longer than given number of seconds are profiled with cProfile, 0 to disable
+MACROS_PROFILE_THRESHOLD = float(env('MACROS_PROFILE_THRESHOLD', 0))
+MACROS_PROFILE_DIR = env('MACROS_PROFILE_DIR', '')
+
+# HTTP clients used by Belga search providers, shared per base url in each process
+HTTP_POOL_SIZE = int(env('HTTP_POOL_SIZE', 10))
+HTTP_CONNECT_TIMEOUT = float(env('HTTP_CONNECT_TIMEOUT', 5))
+HTTP_READ_TIMEOUT = float(env('HTTP_READ_TIMEOUT', 30))
+# failed connections and 502/503/504 responses are retried with exponential backoff starting at given seconds
+HTTP_RETRIES = int(env('HTTP_RETRIES', 3))
+HTTP_RETRY_BACKOFF = float(env('HTTP_RETRY_BACKOFF', 0.5))
+# connection reuse stats are logged every given number of seconds, 0 to disable
+HTTP_STATS_INTERVAL = int(env('HTTP_STATS_INTERVAL', 300))
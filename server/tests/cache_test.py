@@ -0,0 +1,44 @@
+from unittest import mock
+
+from belga import cache
+from superdesk.tests import TestCase
+
+
+class CacheTestCase(TestCase):
+
+    def setUp(self):
+        cache.invalidate()
+        self.app.config['DESK_CACHE_TTL'] = 60
+        self.app.data.insert('desks', [{'_id': 'desk_1', 'name': 'Politic Desk'}])
+        self.app.data.insert('content_templates', [{'_id': 'template_1', 'template_name': 'belga text'}])
+
+    def test_get_desk_once(self):
+        with mock.patch.object(cache, 'get_resource_service', wraps=cache.get_resource_service) as get_service:
+            self.assertEqual('Politic Desk', cache.get_desk('desk_1')['name'])
+            self.assertEqual('Politic Desk', cache.get_desk('desk_1')['name'])
+            self.assertEqual('belga text', cache.get_content_template('template_1')['template_name'])
+            self.assertEqual('belga text', cache.get_content_template('template_1')['template_name'])
+        self.assertEqual(2, get_service.call_count)
+
+    def test_copy(self):
+        cache.get_desk('desk_1')['name'] = 'Sport Desk'
+        self.assertEqual('Politic Desk', cache.get_desk('desk_1')['name'])
+
+    def test_missing(self):
+        self.assertIsNone(cache.get_desk('foo'))
+        self.assertIsNone(cache.get_desk(None))
+        self.app.data.insert('desks', [{'_id': 'foo', 'name': 'Foo'}])
+        self.assertEqual('Foo', cache.get_desk('foo')['name'])
+
+    def test_invalidate_on_update(self):
+        cache.get_desk('desk_1')
+        self.app.data.update('desks', 'desk_1', {'name': 'Sport Desk'}, {})
+        self.assertEqual('Politic Desk', cache.get_desk('desk_1')['name'])
+        self.app.on_updated_desks({'name': 'Sport Desk'}, {'_id': 'desk_1'})
+        self.assertEqual('Sport Desk', cache.get_desk('desk_1')['name'])
+
+    def test_ttl(self):
+        self.app.config['DESK_CACHE_TTL'] = 0
+        cache.get_desk('desk_1')
+        self.app.data.update('desks', 'desk_1', {'name': 'Sport Desk'}, {})
+        self.assertEqual('Sport Desk', cache.get_desk('desk_1')['name'])
@@ -0,0 +1,79 @@
+import os
+import tempfile
+from unittest import mock
+
+from superdesk import get_resource_service
+
+from belga.command.apply_macro import ApplyMacroCommand, apply_macro
+from belga.command.checkpoint import read_checkpoint
+from .. import TestCase
+
+
+def add_keyword(item, **kwargs):
+    if item.get('headline') == 'fail':
+        raise ValueError('fail')
+    if item.get('state') == 'published':
+        item.setdefault('keywords', []).append('foo')
+    return item
+
+
+class ApplyMacroTestCase(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.app.data.insert('archive', [
+            {'_id': 'item-{}'.format(i), 'guid': 'item-{}'.format(i), 'type': 'text',
+             'state': 'published' if i % 2 else 'in_progress', 'headline': 'fail' if i == 7 else 'test'}
+            for i in range(10)
+        ])
+        patcher = mock.patch.object(get_resource_service('macros'), 'get_macro_by_name',
+                                    return_value={'name': 'Add Keyword', 'callback': add_keyword})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        checkpoint_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(checkpoint_dir.cleanup)
+        self.checkpoint_path = os.path.join(checkpoint_dir.name, 'checkpoint.json')
+
+    def get_keywords(self):
+        return {item['_id']: item.get('keywords') for item in self.app.data.get_mongo_collection('archive').find()}
+
+    def test_apply_macro(self):
+        self.assertEqual(({'keywords': ['foo']}, None), apply_macro({'_id': 'id', 'state': 'published'}, add_keyword))
+        self.assertEqual(({}, None), apply_macro({'_id': 'id', 'state': 'draft'}, add_keyword))
+        self.assertEqual((None, 'fail'), apply_macro({'_id': 'id', 'headline': 'fail'}, add_keyword))
+
+    def test_run(self):
+        ApplyMacroCommand().run('Add Keyword', query='{"type": "text"}', batch_size=3,
+                                checkpoint_path=self.checkpoint_path)
+        keywords = self.get_keywords()
+        self.assertEqual(['foo'], keywords['item-1'])
+        self.assertIsNone(keywords['item-2'])
+        self.assertIsNone(keywords['item-7'])
+        checkpoint = read_checkpoint(self.checkpoint_path)
+        self.assertEqual('item-9', checkpoint['last_id'])
+        self.assertEqual(10, checkpoint['processed'])
+        self.assertEqual(4, checkpoint['changed'])
+        self.assertEqual(1, checkpoint['errors'])
+
+    def test_resume(self):
+        with open(self.checkpoint_path, 'w') as f:
+            f.write('{"macro": "Add Keyword", "query": "{}", "last_id": "item-4", "processed": 5, '
+                    '"changed": 2, "errors": 0}')
+        ApplyMacroCommand().run('Add Keyword', batch_size=3, checkpoint_path=self.checkpoint_path)
+        keywords = self.get_keywords()
+        self.assertIsNone(keywords['item-1'])
+        self.assertEqual(['foo'], keywords['item-5'])
+        self.assertEqual(10, read_checkpoint(self.checkpoint_path)['processed'])
+
+    def test_dry_run(self):
+        ApplyMacroCommand().run('Add Keyword', checkpoint_path=self.checkpoint_path, dry_run=True)
+        self.assertEqual({None}, set(self.get_keywords().values()))
+        self.assertFalse(os.path.exists(self.checkpoint_path))
+
+    def test_workers(self):
+        ApplyMacroCommand().run('Add Keyword', workers=2, batch_size=3, checkpoint_path=self.checkpoint_path)
+        keywords = self.get_keywords()
+        self.assertEqual(['foo'], keywords['item-1'])
+        self.assertEqual(['foo'], keywords['item-9'])
+        self.assertIsNone(keywords['item-2'])
+        self.assertEqual(1, read_checkpoint(self.checkpoint_path)['errors'])
@@ -7,9 +7,17 @@
 # For the full copyright and license information, please see the
 # AUTHORS and LICENSE files distributed with this source code, or
 # at https://www.sourcefabric.org/superdesk/license
+import io
 import os
+import json
+import tempfile
+from unittest import mock
 
-from belga.command.contacts_import import import_contacts_via_json_file
+from superdesk import get_resource_service
+
+from belga.command.checkpoint import get_file_signature
+from belga.command.contacts_import import ContactsIndex, import_contacts_via_json_file, iter_json_array, \
+    sync_contacts_via_json_file
 from .. import TestCase
 
 
@@ -40,3 +48,98 @@ class BelgaContactImportTestCase(TestCase):
                          ['Rue M. Sandron 114\n\n5680 Doische', 'rue des Tilleuls 84\n\n5680 Romer¿e'])
         self.assertEqual(item["keywords"], "POLITICS ")
         self.assertEqual(item["original_id"], "11223")
+
+
+class BelgaContactImportStreamTestCase(TestCase):
+
+    def test_iter_json_array(self):
+        data = '[{"a": "x]", "b": [1, 2]}, 12, "s", true, {"c": {}}]'
+        for chunk_size in (1, 2, 7, 1000):
+            self.assertEqual([{'a': 'x]', 'b': [1, 2]}, 12, 's', True, {'c': {}}],
+                             list(iter_json_array(io.StringIO(data), chunk_size)))
+        self.assertEqual([], list(iter_json_array(io.StringIO(' [ ] '))))
+        with self.assertRaises(ValueError):
+            list(iter_json_array(io.StringIO('[{"a": 1}, {"b"')))
+
+    def test_batches(self):
+        dirname = os.path.dirname(os.path.realpath(__file__))
+        fixture = os.path.normpath(os.path.join(dirname, './fixtures', 'contacts.json'))
+        service = get_resource_service('contacts')
+        with mock.patch.object(service, 'post', wraps=service.post) as post:
+            items = import_contacts_via_json_file(fixture, batch_size=1)
+        self.assertEqual(2, len(items))
+        self.assertEqual(2, post.call_count)
+        # all contacts exist now
+        with mock.patch.object(service, 'post', wraps=service.post) as post:
+            self.assertEqual([], import_contacts_via_json_file(fixture))
+        post.assert_not_called()
+
+    def test_index(self):
+        index = ContactsIndex()
+        index.add({'first_name': 'André', 'last_name': 'Dricot', 'organisation': 'Doische',
+                   'contact_email': ['a@example.com', 'b@example.com'], 'contact_phone': [{'number': '1'}]})
+        self.assertTrue(index.is_duplicate({'firstName': 'André', 'lastName': 'Dricot', 'email': 'b@example.com'}))
+        self.assertTrue(index.is_duplicate({'company': 'Doische', 'directPhone1': '1'}))
+        self.assertFalse(index.is_duplicate({'firstName': 'André', 'lastName': 'Dricot', 'email': 'c@example.com'}))
+        self.assertFalse(index.is_duplicate({'firstName': 'André', 'lastName': 'Dricot', 'phoneGeneral': '2'}))
+        self.assertFalse(index.is_duplicate({'firstName': 'André', 'company': 'Doische'}))
+
+
+class BelgaContactSyncTestCase(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.path = os.path.join(tmp_dir.name, 'contacts.json')
+        self.checkpoint_path = os.path.join(tmp_dir.name, 'checkpoint.json')
+
+    def write_contacts(self, contacts):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(contacts, f)
+
+    def get_contacts(self):
+        return {contact['original_id']: contact for contact in self.app.data.get_mongo_collection('contacts').find()}
+
+    def test_upsert(self):
+        self.write_contacts([
+            {'contactId': 1, 'firstName': 'André', 'lastName': 'Dricot', 'email': 'a@example.com'},
+            {'contactId': 2, 'company': 'Belga'},
+            {'contactId': 3},
+        ])
+        counts = sync_contacts_via_json_file(self.path, batch_size=2)
+        self.assertEqual({'read': 3, 'inserted': 2, 'updated': 0}, counts)
+
+        self.write_contacts([
+            {'contactId': 1, 'firstName': 'André', 'lastName': 'Dricot', 'email': 'b@example.com'},
+            {'contactId': 4, 'company': 'Belga'},
+        ])
+        counts = sync_contacts_via_json_file(self.path)
+        self.assertEqual({'read': 2, 'inserted': 1, 'updated': 1}, counts)
+        contacts = self.get_contacts()
+        self.assertEqual(['1', '2', '4'], sorted(contacts))
+        self.assertEqual(['b@example.com'], contacts['1']['contact_email'])
+
+    def write_checkpoint(self, checkpoint):
+        with open(self.checkpoint_path, 'w') as f:
+            json.dump(dict(checkpoint, **get_file_signature(self.path)), f)
+
+    def test_resume(self):
+        self.write_contacts([{'contactId': i, 'company': 'Company {}'.format(i)} for i in range(5)])
+        self.write_checkpoint({'offset': 3, 'read': 3, 'inserted': 3, 'updated': 0})
+        counts = sync_contacts_via_json_file(self.path, batch_size=1, checkpoint_path=self.checkpoint_path)
+        self.assertEqual({'read': 5, 'inserted': 5, 'updated': 0}, counts)
+        self.assertEqual(['3', '4'], sorted(self.get_contacts()))
+        # checkpoint is removed once all contacts are synced
+        self.assertFalse(os.path.exists(self.checkpoint_path))
+
+        # next run of the same file syncs all contacts
+        counts = sync_contacts_via_json_file(self.path, checkpoint_path=self.checkpoint_path)
+        self.assertEqual(5, counts['read'])
+
+    def test_checkpoint_of_modified_file(self):
+        self.write_contacts([{'contactId': i} for i in range(5)])
+        self.write_checkpoint({'offset': 3, 'read': 3, 'inserted': 3, 'updated': 0})
+        self.write_contacts([{'contactId': i} for i in range(10)])
+        with self.assertRaises(ValueError):
+            sync_contacts_via_json_file(self.path, checkpoint_path=self.checkpoint_path)
@@ -0,0 +1,88 @@
+import os
+import csv
+import time
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from unittest import mock
+
+from superdesk import get_resource_service
+
+from belga.command import import_events_file
+from belga.command.import_events_file import ImportEventsFileCommand
+from belga.io.feeding_services.spreadsheet_file import SpreadsheetFileFeedingService
+from tests.io.feed_parsers.belga_spreadsheet_test import data
+from .. import TestCase
+
+
+class ImportEventsFileCommandTestCase(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.path = os.path.join(self.tmp_dir, 'events.csv')
+        with open(self.path, 'w', newline='', encoding='utf-8') as f:
+            csv.writer(f).writerows(values[:29] for values in data)
+        self.app.data.insert('ingest_providers', [{
+            '_id': 'provider', 'name': 'events', 'feeding_service': SpreadsheetFileFeedingService.NAME,
+            'config': {'path': self.path},
+        }])
+
+    def run_command(self, batch_size=None):
+        process = mock.patch.object(SpreadsheetFileFeedingService, '_process_event_items',
+                                    side_effect=lambda items, provider: items)
+        with process, \
+                mock.patch.object(import_events_file, 'insert_events', return_value=[]) as insert_events, \
+                mock.patch.object(import_events_file, 'ingest_items') as ingest_items:
+            ImportEventsFileCommand().run('events', batch_size=batch_size)
+        return insert_events, ingest_items
+
+    def test_store_row_hashes(self):
+        insert_events, ingest_items = self.run_command()
+        self.assertEqual(2, len(insert_events.call_args[0][0]))
+        ingest_items.assert_not_called()
+        provider = get_resource_service('ingest_providers').find_one(req=None, _id='provider')
+        self.assertEqual(4, len(provider['private']['row_hashes']))
+        self.assertEqual(os.path.getsize(self.path), provider['private']['file'][1])
+
+        # rows imported before are skipped
+        insert_events, ingest_items = self.run_command()
+        insert_events.assert_not_called()
+        ingest_items.assert_not_called()
+
+    def test_insert_events_uses_service_hooks(self):
+        service = get_resource_service('events')
+        items = [{
+            'guid': 'event-{}'.format(i), 'type': 'event', 'name': 'Event {}'.format(i),
+            'dates': {'start': datetime(2019, 6, 20, 5, tzinfo=timezone.utc),
+                      'end': datetime(2019, 6, 20, 13, tzinfo=timezone.utc), 'tz': 'Europe/Brussels'},
+        } for i in range(2)]
+        provider = get_resource_service('ingest_providers').find_one(req=None, _id='provider')
+        with mock.patch.object(service, 'on_create', wraps=service.on_create) as on_create, \
+                mock.patch.object(service, 'on_created', wraps=service.on_created) as on_created:
+            self.assertEqual([], import_events_file.insert_events(items, provider))
+        on_create.assert_called_once_with(items)
+        on_created.assert_called_once_with(items)
+        for item in items:
+            self.assertEqual('provider', service.find_one(req=None, guid=item['guid'])['ingest_provider'])
+            self.assertIsNotNone(self.app.data._search_backend('events').find_one('events', None, guid=item['guid']))
+
+    def test_benchmark(self):
+        """Import 50k rows file, set ``IMPORT_EVENTS_BENCHMARK_ROWS`` to change the size.
+
+        Events storage is mocked, it measures rows parsed, hashed and reported per second.
+        """
+        count = int(os.environ.get('IMPORT_EVENTS_BENCHMARK_ROWS', 50000))
+        with open(self.path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerows(values[:29] for values in data[:2])
+            writer.writerows([values[:7] + ['Event {}'.format(i)] + values[8:29] for values in data[2:4]
+                              for i in range(count // 2)])
+        start = time.perf_counter()
+        insert_events, ingest_items = self.run_command(batch_size=1000)
+        elapsed = time.perf_counter() - start
+        print('rows={} time={:.2f}s rows/s={:.1f}'.format(count, elapsed, count / elapsed))
+        ingest_items.assert_not_called()
+        self.assertEqual(count, sum(len(args[0]) for args, _ in insert_events.call_args_list))
+        provider = get_resource_service('ingest_providers').find_one(req=None, _id='provider')
+        self.assertEqual(count, len(provider['private']['row_hashes']))
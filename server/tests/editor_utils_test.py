@@ -0,0 +1,64 @@
+import re
+import unittest
+
+from belga.editor_utils import replace_all
+
+
+class ReplaceAllTestCase(unittest.TestCase):
+
+    pattern = re.compile(r'\b(BEL|NED|FRA)\b')
+    mapping = {'BEL': 'Belgium', 'NED': 'Netherlands', 'FRA': 'FRA'}
+
+    def repl(self, match):
+        return self.mapping[match.group()]
+
+    def test_replace(self):
+        content_state = {
+            'blocks': [
+                {'type': 'unstyled', 'text': 'BEL - NED 2-1, FRA'},
+                {'type': 'unstyled', 'text': ''},
+                {'type': 'unstyled', 'text': 'BELGA'},
+            ],
+            'entityMap': {},
+        }
+        self.assertEqual(2, replace_all(content_state, self.pattern, self.repl))
+        self.assertEqual('Belgium - Netherlands 2-1, FRA', content_state['blocks'][0]['text'])
+        self.assertEqual('BELGA', content_state['blocks'][2]['text'])
+
+    def test_ranges(self):
+        content_state = {
+            'blocks': [{
+                'type': 'unstyled',
+                'text': 'BEL - NED 2-1 link',
+                'inlineStyleRanges': [
+                    {'offset': 0, 'length': 9, 'style': 'BOLD'},  # contains both codes
+                    {'offset': 6, 'length': 3, 'style': 'ITALIC'},  # same as second code
+                    {'offset': 10, 'length': 3, 'style': 'BOLD'},  # after codes
+                ],
+                'entityRanges': [
+                    {'offset': 14, 'length': 4, 'key': 0},  # after codes
+                    {'offset': 1, 'length': 4, 'key': 1},  # overlapping first code
+                ],
+            }],
+            'entityMap': {'0': {'type': 'LINK'}, '1': {'type': 'LINK'}},
+        }
+        replace_all(content_state, self.pattern, self.repl)
+        block = content_state['blocks'][0]
+        self.assertEqual('Belgium - Netherlands 2-1 link', block['text'])
+        self.assertEqual([
+            {'offset': 0, 'length': 21, 'style': 'BOLD'},
+            {'offset': 10, 'length': 11, 'style': 'ITALIC'},
+            {'offset': 22, 'length': 3, 'style': 'BOLD'},
+        ], block['inlineStyleRanges'])
+        self.assertEqual([{'offset': 26, 'length': 4, 'key': 0}], block['entityRanges'])
+        self.assertEqual({'0': {'type': 'LINK'}}, content_state['entityMap'])
+        self.assertEqual('link', block['text'][26:30])
+
+    def test_table(self):
+        cell = {'blocks': [{'type': 'unstyled', 'text': 'NED'}], 'entityMap': {}}
+        content_state = {
+            'blocks': [{'type': 'atomic', 'text': ' ', 'entityRanges': [{'offset': 0, 'length': 1, 'key': 0}]}],
+            'entityMap': {'0': {'type': 'TABLE', 'data': {'data': {'cells': {'0': {'0': cell}}}}}},
+        }
+        self.assertEqual(1, replace_all(content_state, self.pattern, self.repl))
+        self.assertEqual('Netherlands', cell['blocks'][0]['text'])
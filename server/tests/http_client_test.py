@@ -0,0 +1,87 @@
+import threading
+import socketserver
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest import mock
+
+from superdesk.tests import TestCase
+
+from belga import http_client
+from belga.io.feeding_services import twitter_belga
+from belga.io.feeding_services.twitter_belga import TwitterBelgaFeedingService
+from belga.search_providers import BelgaCoverageSearchProvider
+
+
+class ThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    errors = []
+    body = b'ok'
+
+    def do_GET(self):
+        status = self.errors.pop(0) if self.errors else 200
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        self.do_GET()
+
+    def log_message(self, *args):
+        pass
+
+
+class HTTPClientTestCase(TestCase):
+
+    def setUp(self):
+        self.app.config.update({'HTTP_RETRIES': 2, 'HTTP_RETRY_BACKOFF': 0, 'HTTP_READ_TIMEOUT': 10})
+        http_client._clients.clear()
+        self.addCleanup(http_client._clients.clear)
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.base_url = 'http://127.0.0.1:{}/'.format(self.server.server_address[1])
+        self.addCleanup(setattr, Handler, 'body', Handler.body)
+
+    def test_shared_client(self):
+        sessions = [http_client.HTTPSession(self.base_url) for i in range(3)]
+        self.assertIs(sessions[0].client, sessions[2].client)
+        self.assertIsNot(sessions[0].client, http_client.HTTPSession('https://example.com/').client)
+        self.assertEqual((5, 10), sessions[0].client.timeout)
+        for session in sessions:
+            for i in range(2):
+                self.assertEqual(b'ok', session.get(self.base_url + 'search').content)
+        stats = http_client.get_stats()[self.base_url]
+        self.assertEqual(6, stats['requests'])
+        self.assertEqual(1, stats['connections'])
+        self.assertAlmostEqual(5 / 6, stats['reuse'])
+
+    def test_retry(self):
+        Handler.errors[:] = [503, 502]
+        self.assertEqual(200, http_client.HTTPSession(self.base_url).get(self.base_url).status_code)
+        Handler.errors[:] = [503, 503, 503]
+        self.assertEqual(503, http_client.HTTPSession(self.base_url).get(self.base_url).status_code)
+
+    def test_post(self):
+        session = http_client.HTTPSession(self.base_url)
+        self.assertEqual(b'ok', session.post(self.base_url, data=b'foo').content)
+        self.assertEqual(b'ok', session.get(self.base_url).content)
+        self.assertEqual(1, http_client.get_stats()[self.base_url]['connections'])
+
+    def test_callers_reuse_connection(self):
+        Handler.body = b'{"html": "<div>embed</div>"}'
+        with mock.patch.object(BelgaCoverageSearchProvider, 'base_url', self.base_url), \
+                mock.patch.object(twitter_belga, 'IFRAMELY_URL', self.base_url):
+            for i in range(3):
+                # formatter creates provider for every item
+                BelgaCoverageSearchProvider({}).api_get('/getGalleryById', {'i': str(i)})
+                TwitterBelgaFeedingService()._create_embed('https://t.co/{}'.format(i), 'key')
+        stats = http_client.get_stats()[self.base_url]
+        self.assertEqual(6, stats['requests'])
+        self.assertEqual(1, stats['connections'])
@@ -0,0 +1,50 @@
+# -*- coding: utf-8; -*-
+#
+# This file is part of Superdesk.
+#
+# Copyright 2013 - 2020 Sourcefabric z.u. and contributors.
+#
+# For the full copyright and license information, please see the
+# AUTHORS and LICENSE files distributed with this source code, or
+# at https://www.sourcefabric.org/superdesk/license
+
+import os
+import shutil
+import tempfile
+
+from superdesk.errors import ParserError
+
+from belga.io.batch import parse_files
+from belga.io.feed_parsers.belga_afp_newsml_1_2 import BelgaAFPNewsMLOneFeedParser
+from tests import TestCase
+
+
+class ParseFilesTestCase(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        fixture = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'fixtures', 'afp_belga.xml')
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+        self.file_paths = []
+        for i in range(6):
+            file_path = os.path.join(self.path, '{}.xml'.format(i))
+            if i == 3:
+                with open(file_path, 'w') as f:
+                    f.write('<NewsML><broken')
+            else:
+                shutil.copy(fixture, file_path)
+            self.file_paths.append(file_path)
+        self.parser = BelgaAFPNewsMLOneFeedParser()
+
+    def test_parse_files_in_workers(self):
+        serial = parse_files(self.file_paths, self.parser, {'name': 'afp'}, workers=1)
+        parallel = parse_files(self.file_paths, self.parser, {'name': 'afp'}, workers=3)
+        self.assertEqual(self.file_paths, [file_path for file_path, _ in parallel])
+        for (_, expected), (_, items) in zip(serial, parallel):
+            if isinstance(expected, ParserError):
+                self.assertIsInstance(items, ParserError)
+            else:
+                self.assertEqual(expected, items)
+        self.assertIsInstance(parallel[3][1], ParserError)
+        self.assertEqual('0579', parallel[0][1][0]['ingest_provider_sequence'])
@@ -0,0 +1,139 @@
+# -*- coding: utf-8; -*-
+#
+# This file is part of Superdesk.
+#
+# Copyright 2013 - 2020 Sourcefabric z.u. and contributors.
+#
+# For the full copyright and license information, please see the
+# AUTHORS and LICENSE files distributed with this source code, or
+# at https://www.sourcefabric.org/superdesk/license
+
+import os
+from copy import deepcopy
+from unittest import mock
+from lxml import etree
+
+from superdesk import get_resource_service
+
+from belga.io import duplicates
+from belga.io.feed_parsers.belga_afp_newsml_1_2 import BelgaAFPNewsMLOneFeedParser
+from tests import TestCase
+
+BODY = (
+    '<p>Brussels police arrested three suspects on Sunday after a raid in the city centre, '
+    'the federal prosecutor said in a statement.</p>'
+    '<p>The investigation into the drug trafficking network started last year and involved '
+    'several European countries, according to the prosecutor.</p>'
+)
+
+
+class DuplicatesTestCase(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        duplicates.index.clear()
+        self.app.config['INGEST_DUPLICATES_ENABLED'] = True
+        self.app.config['INGEST_DUPLICATES_ACTION'] = duplicates.ACTION_TAG
+        self.item = {'guid': 'afp:1', 'item_id': 'afp:1', 'headline': 'Three arrested in Brussels', 'body_html': BODY}
+
+    def tearDown(self):
+        self.app.config['INGEST_DUPLICATES_ENABLED'] = False
+        duplicates.index.clear()
+        super().tearDown()
+
+    def ingest(self, items):
+        self.app.data.insert('ingest', [{'guid': item['guid']} for item in items])
+        duplicates.record_fingerprints(items, {'_id': 'afp'})
+        return items
+
+    def test_fingerprint(self):
+        fingerprint = duplicates.get_fingerprint(self.item)
+        self.assertEqual(fingerprint, duplicates.get_fingerprint(deepcopy(self.item)))
+        other = dict(self.item, headline='Storm hits coast', body_html='<p>Heavy rain and wind all day long.</p>')
+        self.assertGreater(duplicates.get_distance(fingerprint, duplicates.get_fingerprint(other)),
+                           duplicates.MAX_DISTANCE)
+        self.assertIsNone(duplicates.get_fingerprint({'guid': 'empty'}))
+
+    def test_tag_duplicate(self):
+        items = self.ingest(duplicates.filter_duplicates([self.item], {'_id': 'afp'}))
+        self.assertNotIn('extra', items[0])
+        resent = dict(self.item, guid='afp:2', item_id='afp:2')
+        items = duplicates.filter_duplicates([resent], {'_id': 'afp'})
+        self.assertEqual(1, len(items))
+        self.assertEqual('afp:1', items[0]['extra']['duplicate_of'])
+
+    def test_skip_duplicate(self):
+        self.app.config['INGEST_DUPLICATES_ACTION'] = duplicates.ACTION_SKIP
+        resent = dict(self.item, guid='afp:2', item_id='afp:2')
+        items = duplicates.filter_duplicates([self.item, resent], {'_id': 'afp'})
+        self.assertEqual(['afp:1'], [item['guid'] for item in items])
+
+    def test_lookup_in_mongo(self):
+        self.ingest(duplicates.filter_duplicates([self.item], {'_id': 'afp'}))
+        duplicates.index.clear()
+        resent = dict(self.item, guid='afp:2', item_id='afp:2')
+        items = duplicates.filter_duplicates([resent], {'_id': 'afp'})
+        self.assertEqual('afp:1', items[0]['extra']['duplicate_of'])
+
+    def test_correction_is_not_duplicate(self):
+        self.ingest(duplicates.filter_duplicates([self.item], {'_id': 'afp'}))
+        correction = dict(self.item, guid='afp:1:2', body_html=BODY.replace('three', 'four'))
+        items = duplicates.filter_duplicates([correction], {'_id': 'afp'})
+        self.assertNotIn('extra', items[0])
+
+    def test_revision_is_not_duplicate(self):
+        self.app.config['INGEST_DUPLICATES_ACTION'] = duplicates.ACTION_SKIP
+        self.ingest(duplicates.filter_duplicates([self.item], {'_id': 'afp'}))
+        revision = dict(self.item, guid='afp:1:2', urgency=1)
+        self.assertEqual([revision], duplicates.filter_duplicates([revision], {'_id': 'afp'}))
+        self.assertEqual([self.item], duplicates.filter_duplicates([deepcopy(self.item)], {'_id': 'afp'}))
+
+    def test_not_ingested_is_not_duplicate(self):
+        # file parsed again after failed ingest
+        duplicates.filter_duplicates([self.item], {'_id': 'afp'})
+        self.assertEqual([self.item], duplicates.filter_duplicates([deepcopy(self.item)], {'_id': 'afp'}))
+        resent = dict(self.item, guid='afp:2', item_id='afp:2')
+        items = duplicates.filter_duplicates([resent], {'_id': 'afp'})
+        self.assertNotIn('extra', items[0])
+        self.assertIsNone(self.app.data.find_one('ingest_fingerprints', req=None))
+        self.ingest([self.item])
+        items = duplicates.filter_duplicates([dict(resent, guid='afp:3', item_id='afp:3')], {'_id': 'afp'})
+        self.assertEqual('afp:1', items[0]['extra']['duplicate_of'])
+
+    def test_removed_from_ingest_is_not_duplicate(self):
+        duplicates.record_fingerprints([self.item], {'_id': 'afp'})
+        resent = dict(self.item, guid='afp:2', item_id='afp:2')
+        items = duplicates.filter_duplicates([resent], {'_id': 'afp'})
+        self.assertNotIn('extra', items[0])
+
+    def test_queries_per_batch(self):
+        self.ingest([self.item])
+        duplicates.index.clear()
+        items = [dict(self.item, guid='afp:{}'.format(i), item_id='afp:{}'.format(i)) for i in range(2, 22)]
+        service = get_resource_service('ingest_fingerprints')
+        with mock.patch.object(service, 'find_entries', wraps=service.find_entries) as find_entries, \
+                mock.patch.object(duplicates, 'get_saved_guids', wraps=duplicates.get_saved_guids) as saved:
+            items = duplicates.filter_duplicates(items, {'_id': 'afp'})
+        self.assertEqual({'afp:1'}, {item['extra']['duplicate_of'] for item in items})
+        self.assertEqual(1, find_entries.call_count)
+        self.assertEqual(1, saved.call_count)
+
+    def test_disabled(self):
+        self.app.config['INGEST_DUPLICATES_ENABLED'] = False
+        items = duplicates.filter_duplicates([self.item, deepcopy(self.item)], {'_id': 'afp'})
+        self.assertEqual(2, len(items))
+        self.assertIsNone(self.app.data.find_one('ingest_fingerprints', req=None))
+
+    def test_fingerprint_budget(self):
+        """Only first ``MAX_TOKENS`` tokens of fixture based story are used, however long it is."""
+        dirname = os.path.dirname(os.path.realpath(__file__))
+        with open(os.path.join(dirname, 'fixtures', 'afp_belga.xml'), 'rb') as f:
+            item = BelgaAFPNewsMLOneFeedParser().parse(etree.parse(f).getroot(), {'name': 'test'})[0]
+        long_item = dict(item, body_html=item['body_html'] * 100)
+        tokens = duplicates.TOKEN_RE.findall(' '.join((item['headline'], long_item['body_html'])))
+        self.assertGreater(len(tokens), duplicates.MAX_TOKENS)
+        with mock.patch.object(duplicates, 'get_text', side_effect=lambda html, **kwargs: html):
+            self.assertEqual(
+                duplicates.get_fingerprint(long_item),
+                duplicates.get_fingerprint({'headline': ' '.join(tokens[:duplicates.MAX_TOKENS])}),
+            )
@@ -0,0 +1,62 @@
+import io
+import os
+import email
+from email.mime.multipart import MIMEMultipart
+from email.mime.image import MIMEImage
+from unittest import mock
+from PIL import Image
+
+from superdesk.io.feed_parsers.rfc822 import EMailRFC822FeedParser
+
+from belga.io.feed_parsers import belga_email_rfc822
+from belga.io.feed_parsers.belga_email_rfc822 import BelgaEmailRFC822FeedParser
+from tests import TestCase
+
+
+class BelgaEmailRFC822FeedParserTestCase(TestCase):
+    filename = 'email_attachment_belga.txt'
+
+    def setUp(self):
+        super().setUp()
+        dirname = os.path.dirname(os.path.realpath(__file__))
+        with open(os.path.normpath(os.path.join(dirname, '../fixtures', self.filename)), mode='rb') as f:
+            self.data = [(b'1 (RFC822 {0}', f.read())]
+        self.provider = {'name': 'test'}
+
+    def test_parse_message(self):
+        expected = EMailRFC822FeedParser().parse(self.data, self.provider)
+        items = BelgaEmailRFC822FeedParser().parse_message(email.message_from_bytes(self.data[0][1]), self.provider)
+        self.assertEqual(len(expected), len(items))
+        for expected_item, item in zip(expected, items):
+            expected_item.pop('versioncreated')
+            item.pop('versioncreated')
+            self.assertEqual(expected_item, item)
+
+    def test_parse(self):
+        items = BelgaEmailRFC822FeedParser().parse(self.data, self.provider)
+        self.assertEqual('text', items[-1]['type'])
+
+    def get_message(self, *parts):
+        msg = MIMEMultipart()
+        msg['Subject'] = 'Photo'
+        msg['From'] = 'photo@example.com'
+        msg['Message-ID'] = '<photo@example.com>'
+        for part in parts:
+            msg.attach(part)
+        return msg
+
+    def test_parse_without_text(self):
+        msg = self.get_message()
+        self.assertEqual('', BelgaEmailRFC822FeedParser().parse_message(msg, self.provider)[-1]['body_html'])
+
+    def test_images_are_spooled(self):
+        content = io.BytesIO()
+        Image.new('RGB', (10, 10)).save(content, 'jpeg')
+        image = MIMEImage(content.getvalue(), 'jpeg')
+        image.add_header('Content-Disposition', 'attachment', filename='photo.jpg')
+        msg = self.get_message(image)
+        with mock.patch.object(belga_email_rfc822, 'decode_payload', wraps=belga_email_rfc822.decode_payload) as decode:
+            items = BelgaEmailRFC822FeedParser().parse_message(msg, self.provider)
+        self.assertEqual(1, decode.call_count)
+        self.assertEqual(['picture', 'composite', 'text'], [item['type'] for item in items])
+        self.assertEqual('photo.jpg', items[0]['slugline'])
@@ -91,3 +91,47 @@ class BelgaSpreadsheetsTestCase(TestCase):
             'ERROR', 'Invalid timezone',
             'ERROR', 'String does not contain a date:',
         ])
+
+
+class BelgaSpreadsheetRowHashesTestCase(TestCase):
+    def setUp(self):
+        self.provider = {'name': 'test'}
+        self.parser = BelgaSpreadsheetParser()
+
+    def apply_cells(self, cells):
+        sheet = [list(values) for values in data]
+        for cell in cells:
+            values = sheet[cell.row - 1]
+            values.extend([''] * (cell.col - len(values)))
+            values[cell.col - 1] = cell.value
+        return sheet
+
+    def test_skip_processed_rows(self):
+        items, cells, row_hashes = self.parser.parse_rows(data, self.provider)
+        self.assertEqual(2, len(items))
+        self.assertEqual(len(data) - 2, len(row_hashes))
+
+        sheet = self.apply_cells(cells)
+        items, cells, _row_hashes = self.parser.parse_rows(sheet, self.provider, set(row_hashes))
+        self.assertEqual([], items)
+        self.assertEqual([], cells)
+        self.assertEqual(row_hashes, _row_hashes)
+
+    def test_parse_modified_row(self):
+        items, cells, row_hashes = self.parser.parse_rows(data, self.provider)
+        sheet = self.apply_cells(cells)
+        sheet[2][7] = 'Event 1 renamed'
+        sheet[2][29] = 'UPDATED'
+        self.app.data.insert('events', [{'guid': sheet[2][31], 'name': 'Event 1'}])
+        items, cells, _row_hashes = self.parser.parse_rows(sheet, self.provider, set(row_hashes))
+        self.assertEqual(1, len(items))
+        self.assertEqual('Event 1 renamed', items[0]['name'])
+        self.assertEqual(sheet[2][31], items[0]['guid'])
+        self.assertEqual(row_hashes[1:], _row_hashes[1:])
+        self.assertNotEqual(row_hashes[0], _row_hashes[0])
+
+    def test_identical_rows(self):
+        sheet = data + [list(data[2])]
+        items, cells, row_hashes = self.parser.parse_rows(sheet, self.provider, {self.parser.get_row_hash(data[2])})
+        self.assertEqual(['Event 2', 'Event 1'], [item['name'] for item in items])
+        self.assertEqual(len(sheet) - 2, len(set(row_hashes)))
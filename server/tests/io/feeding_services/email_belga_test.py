@@ -10,6 +10,11 @@
 
 
 import os
+import email
+import time
+import socket
+import threading
+from unittest import mock
 
 import superdesk
 from superdesk import get_resource_service
@@ -17,6 +22,7 @@ from superdesk.io.feed_parsers.rfc822 import EMailRFC822FeedParser
 from superdesk.tests import setup
 from superdesk.users.services import UsersService
 
+from belga.io.feeding_services import email_belga
 from belga.io.feeding_services.email_belga import EmailBelgaFeedingService
 from tests import TestCase
 
@@ -59,3 +65,145 @@ class EmailBelgaIngestServiceTest(TestCase):
         self.assertEqual(data["filename"], "attachment.txt")
         self.assertEqual(data["mimetype"], "text/plain")
         self.assertEqual(data["length"], 5)
+
+
+class EmailBelgaUpdateTest(TestCase):
+    filename = 'email_attachment_belga.txt'
+
+    def setUp(self):
+        super().setUp()
+        dirname = os.path.dirname(os.path.realpath(__file__))
+        with open(os.path.join(dirname, '../fixtures', self.filename), mode='rb') as f:
+            self.message = f.read()
+        self.provider = {
+            '_id': 'email', 'name': 'Test', 'feed_parser': EMailRFC822FeedParser.NAME,
+            'config': {'server': 'imap.example.com', 'port': '993', 'user': 'user', 'password': 'pass',
+                       'mailbox': 'INBOX', 'filter': '(UNSEEN)'},
+        }
+        self.addCleanup(email_belga._connections.clear)
+
+    def get_imap(self, uids):
+        imap = mock.Mock()
+        imap.capabilities = ('IMAP4REV1',)
+        imap.login.return_value = ('OK', [b''])
+        imap.select.return_value = ('OK', [b'3'])
+        imap.noop.return_value = ('OK', [b''])
+
+        def uid(command, *args):
+            if command == 'search':
+                return 'OK', [b' '.join(uids)]
+            if command == 'fetch':
+                data = []
+                for i, _uid in enumerate(args[0].split(b',')):
+                    if 'MESSAGE-ID' in args[1]:
+                        header = b'Message-ID: <%s@example.com>\r\n\r\n' % _uid
+                        data.append((b'%d (UID %s RFC822.SIZE %d BODY[HEADER.FIELDS (MESSAGE-ID)] {%d}' % (
+                            i + 1, _uid, len(self.message), len(header)), header))
+                    else:
+                        data.append((b'%d (UID %s RFC822 {%d}' % (i + 1, _uid, len(self.message)), self.message))
+                    data.append(b')')
+                return 'OK', data
+            return 'OK', [b'']
+
+        imap.uid.side_effect = uid
+        return imap
+
+    def test_batched_fetch_and_store(self):
+        self.app.config['EMAIL_FETCH_BATCH_SIZE'] = 2
+        imap = self.get_imap([b'10', b'11', b'12'])
+        with mock.patch.object(email_belga.imaplib, 'IMAP4_SSL', return_value=imap) as imap_ssl:
+            items = EmailBelgaFeedingService()._update(self.provider, {})
+            duplicates = EmailBelgaFeedingService()._update(self.provider, {})
+        self.assertEqual(3, len(items))
+        self.assertEqual([], duplicates)
+        self.assertEqual(1, imap_ssl.call_count)
+        self.assertEqual(1, imap.login.call_count)
+        commands = [c[0][0] for c in imap.uid.call_args_list]
+        # mails are already ingested during second poll so only headers are fetched
+        self.assertEqual(['search', 'fetch', 'fetch', 'fetch', 'fetch', 'store',
+                          'search', 'fetch', 'fetch', 'store'], commands)
+        imap.uid.assert_any_call('store', b'10,11,12', '+FLAGS', '\\Seen')
+        self.assertEqual(2, imap.uid.call_args_list.count(mock.call('store', b'10,11,12', '+FLAGS', '\\Seen')))
+
+    def test_known_keys_lookup_per_batch(self):
+        self.app.config['EMAIL_FETCH_BATCH_SIZE'] = 2
+        imap = self.get_imap([b'10', b'11', b'12'])
+        service = get_resource_service('ingest_email_messages')
+        with mock.patch.object(email_belga.imaplib, 'IMAP4_SSL', return_value=imap), \
+                mock.patch.object(service, 'get_known_keys', wraps=service.get_known_keys) as get_known_keys:
+            items = EmailBelgaFeedingService()._update(self.provider, {})
+        self.assertEqual(3, len(items))
+        self.assertEqual(2, get_known_keys.call_count)
+
+    def test_fetch_limited_by_size(self):
+        self.app.config['EMAIL_FETCH_MAX_SIZE'] = len(self.message) * 2
+        imap = self.get_imap([b'10', b'11', b'12'])
+        with mock.patch.object(email_belga.imaplib, 'IMAP4_SSL', return_value=imap):
+            items = EmailBelgaFeedingService()._update(self.provider, {})
+        self.assertEqual(3, len(items))
+        fetched = [c[0][1] for c in imap.uid.call_args_list if c[0][0] == 'fetch' and c[0][2] == '(RFC822)']
+        self.assertEqual([b'10,11', b'12'], fetched)
+
+    def test_reconnect_when_connection_is_dead(self):
+        dead = self.get_imap([])
+        dead.noop.side_effect = OSError
+        alive = self.get_imap([])
+        with mock.patch.object(email_belga.imaplib, 'IMAP4_SSL', side_effect=[dead, alive]) as imap_ssl:
+            EmailBelgaFeedingService()._update(self.provider, {})
+            EmailBelgaFeedingService()._update(self.provider, {})
+        self.assertEqual(2, imap_ssl.call_count)
+        self.assertIs(alive, email_belga._connections['email'][1])
+
+    def get_idle_imap(self, untagged=None):
+        """Get connection to fake server which sends untagged response while idling."""
+        client, server = socket.socketpair()
+        self.addCleanup(client.close)
+        self.addCleanup(server.close)
+
+        def serve():
+            with server.makefile('rb') as f:
+                while True:
+                    line = f.readline()
+                    if line.startswith(b'BIDLE IDLE'):
+                        server.sendall(b'+ idling\r\n')
+                        if untagged:
+                            time.sleep(0.1)
+                            server.sendall(untagged)
+                    elif line.startswith(b'DONE'):
+                        server.sendall(b'BIDLE OK IDLE terminated\r\n')
+                    else:
+                        break
+
+        thread = threading.Thread(target=serve, daemon=True)
+        thread.start()
+        imap = mock.Mock()
+        imap.capabilities = ('IMAP4REV1', 'IDLE')
+        imap.sock = client
+        imap.file = client.makefile('rb')
+        self.addCleanup(imap.file.close)
+        imap.readline.side_effect = imap.file.readline
+        imap.send.side_effect = client.sendall
+        return imap
+
+    def test_idle_without_new_mail(self):
+        self.app.config['EMAIL_IDLE_TIMEOUT'] = 0.1
+        imap = self.get_idle_imap()
+        service = EmailBelgaFeedingService()
+        self.assertFalse(service._idle(imap))
+        # connection can be used after timeout
+        self.assertFalse(service._idle(imap))
+
+    def test_idle_with_new_mail(self):
+        self.app.config['EMAIL_IDLE_TIMEOUT'] = 5
+        imap = self.get_idle_imap(b'* 4 EXISTS\r\n')
+        start = time.monotonic()
+        self.assertTrue(EmailBelgaFeedingService()._idle(imap))
+        self.assertLess(time.monotonic() - start, 5)
+
+    def test_decode_payload_spools_to_disk(self):
+        self.app.config['EMAIL_ATTACHMENT_SPOOL_SIZE'] = 2
+        msg = email.message_from_bytes(self.message)
+        part = next(part for part in msg.walk() if part.get_filename())
+        with email_belga.decode_payload(part) as content:
+            self.assertTrue(content._rolled)
+            self.assertEqual(part.get_payload(decode=True), content.read())
@@ -0,0 +1,104 @@
+# -*- coding: utf-8; -*-
+#
+# This file is part of Superdesk.
+#
+# Copyright 2013 - 2020 Sourcefabric z.u. and contributors.
+#
+# For the full copyright and license information, please see the
+# AUTHORS and LICENSE files distributed with this source code, or
+# at https://www.sourcefabric.org/superdesk/license
+
+import os
+import time
+import shutil
+import tempfile
+
+from superdesk.io.commands.update_ingest import ingest_items
+from superdesk.io.feeding_services import FileFeedingService
+
+from belga.io import duplicates
+from belga.io.feeding_services.file_belga import FileBelgaFeedingService
+from tests import TestCase
+
+
+class FileBelgaFeedingServiceTestCase(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        duplicates.index.clear()
+        self.app.config['INGEST_DUPLICATES_ENABLED'] = True
+        self.path = tempfile.mkdtemp()
+        dirname = os.path.dirname(os.path.realpath(__file__))
+        self.fixture = os.path.join(dirname, '../fixtures', 'afp_belga.xml')
+        shutil.copy(self.fixture, os.path.join(self.path, 'afp.xml'))
+        self.provider = {'_id': 'afp', 'name': 'afp', 'feed_parser': 'belga_afp_newsml12',
+                         'config': {'path': self.path}}
+
+    def tearDown(self):
+        self.app.config['INGEST_DUPLICATES_ENABLED'] = False
+        duplicates.index.clear()
+        shutil.rmtree(self.path)
+        super().tearDown()
+
+    def update(self, failed):
+        generator = FileBelgaFeedingService()._update(self.provider, {})
+        items = next(generator)
+        with self.assertRaises(StopIteration):
+            generator.send(failed(items))
+        return items
+
+    def test_update(self):
+        items = self.update(lambda items: set())
+        self.assertEqual(1, len(items))
+        self.assertTrue(os.path.isfile(os.path.join(self.path, '_PROCESSED', 'afp.xml')))
+        self.assertFalse(os.path.isfile(os.path.join(self.path, 'afp.xml')))
+        entry = self.app.data.find_one('ingest_fingerprints', req=None)
+        self.assertEqual(items[0]['guid'], entry['guid'])
+
+    def test_update_failed(self):
+        self.update(lambda items: {item['guid'] for item in items})
+        self.assertTrue(os.path.isfile(os.path.join(self.path, '_ERROR', 'afp.xml')))
+        self.assertIsNone(self.app.data.find_one('ingest_fingerprints', req=None))
+
+    def write_burst(self, count):
+        """Write routine files followed by a flash."""
+        with open(self.fixture) as f:
+            xml = f.read()
+        for i in range(count):
+            with open(os.path.join(self.path, 'routine-{:03d}.xml'.format(i)), 'w') as f:
+                f.write(xml.replace('TX-PAR-RHO61', 'TX-PAR-RHO61-{}'.format(i)))
+        with open(os.path.join(self.path, 'z-flash.xml'), 'w') as f:
+            f.write(xml.replace('TX-PAR-RHO61', 'TX-PAR-FLASH')
+                    .replace('<Priority FormalName="4"/>', '<Priority FormalName="1"/>')
+                    .replace('<Urgency FormalName="4"/>', '<Urgency FormalName="1"/>'))
+
+    def time_to_desk(self, service):
+        """Ingest files like ``update_provider`` does and get time it takes until the flash is stored."""
+        start = time.perf_counter()
+        elapsed = None
+        generator = service._update(self.provider, {})
+        failed = None
+        try:
+            while True:
+                items = generator.send(failed)
+                failed = ingest_items(items, self.provider, service)
+                if elapsed is None and any('FLASH' in item['guid'] for item in items):
+                    elapsed = time.perf_counter() - start
+        except StopIteration:
+            pass
+        return elapsed
+
+    def test_burst_time_to_desk(self):
+        """Flash written after a burst of routine files is ingested first.
+
+        Core file feed ingests files in the order those were created, so the flash
+        waits for all routine items to be stored.
+        """
+        os.remove(os.path.join(self.path, 'afp.xml'))
+        self.write_burst(100)
+        core = self.time_to_desk(FileFeedingService())
+        self.app.data.remove('ingest', {})
+        self.write_burst(100)
+        belga = self.time_to_desk(FileBelgaFeedingService())
+        self.assertEqual(0, len(os.listdir(os.path.join(self.path, '_ERROR'))))
+        self.assertLess(belga, core)
@@ -1,4 +1,7 @@
 import time
+from unittest import mock
+
+from superdesk.io.commands.update_ingest import LAST_ITEM_UPDATE
 
 from tests import TestCase
 
@@ -128,3 +131,54 @@ class RSSBelgaTestCase(RssBelgaIngestServiceTest):
         self.assertEqual(item["word_count"], "197")
         self.assertEqual(item["authors"], [
             {'uri': None, 'parent': None, 'name': 'Marijn Wellink (wki)', 'role': None, 'jobtitle': None}])
+
+
+FEED = """<?xml version="1.0" encoding="utf-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom">
+  <title>ANP</title>
+  {}
+</feed>
+"""
+
+ENTRY = """<entry>
+    <id>urn:anp:{0}</id>
+    <title>Title {0}</title>
+    <updated>2019-01-27T07:1{0}:00+01:00</updated>
+    <summary>Summary {0}</summary>
+  </entry>"""
+
+
+class RSSBelgaConditionalGetTestCase(RssBelgaIngestServiceTest):
+
+    def setUp(self):
+        super().setUp()
+        self.provider = {'name': 'anp', 'config': {'url': 'http://example.com/feed'}}
+        self.instance.provider = self.provider
+
+    def get_response(self, entries, status_code=200):
+        response = mock.Mock(status_code=status_code, headers={'ETag': '"v1"', 'Last-Modified': 'Sun, 27 Jan 2019'})
+        response.content = FEED.format(''.join(ENTRY.format(i) for i in entries)).encode('utf-8')
+        return response
+
+    def test_not_modified(self):
+        self.provider['private'] = {'etag': '"v1"', 'last_modified': 'Sun, 27 Jan 2019'}
+        update = {}
+        with mock.patch.object(self.instance, 'get_url', return_value=self.get_response([], 304)) as get_url:
+            self.assertEqual([], self.instance._update(self.provider, update))
+        get_url.assert_called_once_with('http://example.com/feed', headers={
+            'If-None-Match': '"v1"', 'If-Modified-Since': 'Sun, 27 Jan 2019'})
+        self.assertEqual({}, update)
+
+    def test_skip_ingested_entries(self):
+        update = {}
+        with mock.patch.object(self.instance, 'get_url', return_value=self.get_response([2, 1])):
+            items = self.instance._update(self.provider, update)[0]
+        self.assertEqual(['urn:anp:2', 'urn:anp:1'], [item['guid'] for item in items])
+        self.assertEqual({'etag': '"v1"', 'last_modified': 'Sun, 27 Jan 2019'}, update['private'])
+
+        # set by update_provider after items are ingested
+        self.provider[LAST_ITEM_UPDATE] = max(item['versioncreated'] for item in items)
+        self.provider['private'] = update['private']
+        with mock.patch.object(self.instance, 'get_url', return_value=self.get_response([4, 3, 2, 1])):
+            items = self.instance._update(self.provider, {})[0]
+        self.assertEqual(['urn:anp:4', 'urn:anp:3'], [item['guid'] for item in items])
@@ -0,0 +1,78 @@
+import os
+import csv
+import datetime
+import tempfile
+import shutil
+
+from belga.io.feeding_services.spreadsheet_file import (
+    REPORT_SUFFIX, SpreadsheetFileFeedingService, _get_cell_value, read_rows,
+)
+from tests import TestCase
+from tests.io.feed_parsers.belga_spreadsheet_test import data
+
+
+class SpreadsheetFileFeedingServiceTestCase(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.path = os.path.join(self.tmp_dir, 'events.csv')
+        with open(self.path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f, delimiter=';')
+            # without generated columns
+            writer.writerows(values[:29] for values in data)
+        self.provider = {'name': 'test', 'config': {'path': self.path}}
+        self.service = SpreadsheetFileFeedingService()
+
+    def read_report(self):
+        with open(self.path + REPORT_SUFFIX, newline='', encoding='utf-8') as f:
+            return list(csv.reader(f))
+
+    def test_read_csv(self):
+        rows = list(read_rows(self.path))
+        self.assertEqual(len(data), len(rows))
+        self.assertEqual('Start date', rows[0][0])
+        self.assertEqual('Europe/Brussels', rows[2][5])
+
+    def test_import_file(self):
+        row_hashes = []
+        batches = list(self.service.import_file(self.provider, new_row_hashes=row_hashes, batch_size=1))
+        self.assertEqual(2, len(batches))
+        self.assertEqual('Event 1', batches[0][0]['name'])
+        self.assertEqual('Event 2', batches[1][0]['name'])
+        self.assertEqual(4, len(row_hashes))
+
+        report = self.read_report()
+        self.assertEqual(['Row', '_STATUS', '_ERR_MESSAGE', '_GUID'], report[0])
+        self.assertEqual(['3', 'DONE', '', batches[0][0]['guid']], report[1])
+        self.assertEqual(['5', 'ERROR', 'Invalid timezone', ''], report[3])
+        self.assertEqual('ERROR', report[4][1])
+
+        # rows processed before are skipped
+        batches = list(self.service.import_file(self.provider, set(row_hashes)))
+        self.assertEqual([], batches)
+        self.assertEqual(1, len(self.read_report()))
+
+    def test_import_identical_rows(self):
+        row_hashes = []
+        list(self.service.import_file(self.provider, new_row_hashes=row_hashes, batch_size=1))
+        with open(self.path, 'a', newline='', encoding='utf-8') as f:
+            csv.writer(f, delimiter=';').writerow(data[2][:29])
+        batches = list(self.service.import_file(self.provider, set(row_hashes), batch_size=1))
+        self.assertEqual(['Event 1'], [item['name'] for items in batches for item in items])
+
+    def test_update_only_modified_file(self):
+        update = {}
+        self.assertEqual(2, sum(len(items) for items in self.service._update(self.provider, update)))
+        self.assertEqual(4, len(update['private']['row_hashes']))
+        self.provider['private'] = update['private']
+        self.assertEqual([], list(self.service._update(self.provider, {})))
+
+    def test_cell_value(self):
+        self.assertEqual('', _get_cell_value(None))
+        self.assertEqual('TRUE', _get_cell_value(True))
+        self.assertEqual('2019-06-20', _get_cell_value(datetime.datetime(2019, 6, 20)))
+        self.assertEqual('2019-06-20', _get_cell_value(datetime.date(2019, 6, 20)))
+        self.assertEqual('07:00', _get_cell_value(datetime.time(7)))
+        self.assertEqual('12', _get_cell_value(12.0))
+        self.assertEqual('Event', _get_cell_value('Event'))
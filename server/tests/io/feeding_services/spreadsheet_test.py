@@ -0,0 +1,261 @@
+from unittest import mock
+
+import gspread
+
+from belga.io.feeding_services import spreadsheet
+from belga.io.feeding_services.spreadsheet import IngestSpreadsheetError, SpreadsheetFeedingService
+from tests import TestCase
+
+
+def get_item(i, status=''):
+    return {
+        'guid': 'guid-{}'.format(i),
+        'name': 'Event {}'.format(i),
+        'status': status,
+        'contact': {
+            'first_name': 'First',
+            'last_name': 'Last {}'.format(i % 3),
+            'organisation': 'Belga',
+            'contact_email': ['mail{}@example.com'.format(i % 3)],
+            'contact_phone': [{'number': str(i % 3), 'public': False, 'usage': 'Business'}],
+        },
+        'location': [{
+            'name': 'Location {}'.format(i % 2),
+            'address': {'line': ['Street'], 'locality': 'City', 'area': '', 'country': 'Belgium'},
+        }],
+    }
+
+
+class SpreadsheetProcessEventItemsTestCase(TestCase):
+
+    def setUp(self):
+        self.services = {name: mock.Mock() for name in ('events', 'contacts', 'locations')}
+        self.services['events'].find.return_value = []
+        self.services['contacts'].find.return_value = []
+        self.services['locations'].find.return_value = []
+        self.services['contacts'].post.side_effect = lambda docs: ['contact-{}'.format(i) for i in range(len(docs))]
+
+        def post_locations(docs):
+            for i, doc in enumerate(docs):
+                doc['guid'] = 'location-{}'.format(i)
+        self.services['locations'].post.side_effect = post_locations
+
+    def process(self, items):
+        with mock.patch('superdesk.get_resource_service', side_effect=self.services.get), \
+                mock.patch.object(SpreadsheetFeedingService, '_patch_many') as self.patch_many:
+            return SpreadsheetFeedingService()._process_event_items(items, {'name': 'test'})
+
+    def get_saved_contact(self, i):
+        contact = get_item(i)['contact']
+        contact.update({'_id': 'saved-contact-{}'.format(i), 'contact_phone': [{'number': str(i)}]})
+        return contact
+
+    def get_calls(self):
+        return {(name, method): getattr(service, method).call_count
+                for name, service in self.services.items()
+                for method in ('find', 'find_one', 'post', 'patch')}
+
+    def test_query_count_independent_of_rows(self):
+        self.process([get_item(i) for i in range(3)])
+        calls = self.get_calls()
+        for service in self.services.values():
+            service.reset_mock()
+        self.process([get_item(i) for i in range(60)])
+        self.assertEqual(calls, self.get_calls())
+        self.assertEqual(1, self.services['events'].find.call_count)
+        self.assertEqual(1, self.services['contacts'].post.call_count)
+        self.assertEqual(0, self.services['events'].find_one.call_count)
+
+    def test_new_contacts_and_locations(self):
+        items = self.process([get_item(i) for i in range(6)])
+        self.assertEqual(6, len(items))
+        # contacts and locations are created once per sheet
+        self.assertEqual(3, len(self.services['contacts'].post.call_args[0][0]))
+        self.assertEqual(2, len(self.services['locations'].post.call_args[0][0]))
+        self.assertEqual(['contact-0'], items[3]['event_contact_info'])
+        self.assertEqual('location-1', items[5]['location'][0]['qcode'])
+        self.assertNotIn('contact', items[0])
+        self.assertNotIn('status', items[0])
+
+    def test_updated_items(self):
+        self.services['events'].find.return_value = [{'_id': 'event', 'guid': 'guid-1', 'name': 'Old'}]
+        self.services['contacts'].find.return_value = [{
+            '_id': 'saved-contact',
+            'first_name': 'First',
+            'last_name': 'Last 1',
+            'organisation': 'Belga',
+            'contact_email': ['mail1@example.com'],
+            'contact_phone': [{'number': '1'}],
+        }]
+        items = self.process([get_item(1, 'UPDATED'), get_item(2, 'UPDATED')])
+        self.assertEqual(1, len(items))
+        self.assertEqual('event', items[0]['_id'])
+        self.assertEqual('Event 1', items[0]['name'])
+        self.assertEqual(['saved-contact'], items[0]['event_contact_info'])
+        self.services['contacts'].patch.assert_not_called()
+        self.patch_many.assert_any_call('contacts', {'saved-contact': (mock.ANY, {
+            'contact_phone': [{'number': '1', 'public': False, 'usage': 'Business'}],
+        })})
+
+    def test_update_query_count_independent_of_rows(self):
+        for rows in (6, 60):
+            for service in self.services.values():
+                service.reset_mock()
+            self.services['contacts'].find.return_value = [self.get_saved_contact(i) for i in range(3)]
+            self.services['locations'].find.return_value = [
+                dict(get_item(i)['location'][0], _id='saved-location-{}'.format(i), qcode='old') for i in range(2)]
+            self.process([get_item(i, 'UPDATED') for i in range(rows)])
+            self.assertEqual(1, self.services['contacts'].find.call_count)
+            self.assertEqual(0, self.services['contacts'].patch.call_count)
+            self.assertEqual(0, self.services['locations'].patch.call_count)
+            # changes of all rows are stored using one write per collection
+            self.assertEqual(2, self.patch_many.call_count)
+            contacts = self.patch_many.call_args_list[0][0]
+            self.assertEqual('contacts', contacts[0])
+            self.assertEqual(3, len(contacts[1]))
+            # unchanged locations are not written
+            self.assertEqual(('locations', {}), self.patch_many.call_args_list[1][0])
+
+
+class SpreadsheetWorksheetCacheTestCase(TestCase):
+
+    provider = {
+        'name': 'test',
+        'config': {
+            'url': 'https://docs.google.com/spreadsheets/d/abc',
+            'service_account': '{"type": "service_account"}',
+            'worksheet_title': 'Sheet1',
+        },
+    }
+
+    def setUp(self):
+        spreadsheet._worksheets.clear()
+        self.addCleanup(spreadsheet._worksheets.clear)
+        self.app.config['SPREADSHEET_PERMISSION_CHECK_INTERVAL'] = 3600
+        self.client = mock.Mock()
+        self.spreadsheet = self.client.open_by_url.return_value
+        self.spreadsheet.list_permissions.return_value = [{'role': 'writer'}]
+        self.worksheet = self.spreadsheet.worksheet.return_value
+        patcher = mock.patch.object(spreadsheet, 'ServiceAccountCredentials')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch('gspread.authorize', return_value=self.client)
+        self.authorize = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.service = SpreadsheetFeedingService()
+
+    def test_reuse_worksheet(self):
+        self.assertIs(self.worksheet, self.service._get_worksheet(self.provider))
+        self.assertIs(self.worksheet, self.service._get_worksheet(self.provider))
+        self.assertEqual(1, self.authorize.call_count)
+        self.assertEqual(1, self.spreadsheet.list_permissions.call_count)
+        self.assertEqual(1, self.spreadsheet.worksheet.call_count)
+        # token is refreshed when expired
+        self.client.login.assert_called_once_with()
+
+    def test_check_permissions_periodically(self):
+        self.app.config['SPREADSHEET_PERMISSION_CHECK_INTERVAL'] = 0
+        self.service._get_worksheet(self.provider)
+        self.spreadsheet.list_permissions.return_value = [{'role': 'reader'}]
+        with self.assertRaises(IngestSpreadsheetError):
+            self.service._get_worksheet(self.provider)
+        self.assertEqual({}, spreadsheet._worksheets)
+
+    def test_drop_cache_on_forbidden(self):
+        response = mock.Mock()
+        response.json.return_value = {'error': {'code': 403, 'message': 'Forbidden'}}
+        self.worksheet.get_all_values.side_effect = gspread.exceptions.APIError(response)
+        with self.assertRaises(IngestSpreadsheetError):
+            list(self.service._update(self.provider, {}))
+        self.assertEqual({}, spreadsheet._worksheets)
+        self.service._get_worksheet(self.provider)
+        self.assertEqual(2, self.authorize.call_count)
+
+
+class SpreadsheetWriteBackTestCase(TestCase):
+
+    def setUp(self):
+        self.app.config['SPREADSHEET_WRITE_BATCH_ROWS'] = 500
+        self.app.config['SPREADSHEET_WRITE_RETRIES'] = 2
+        self.worksheet = mock.Mock()
+        self.provider = {'name': 'test'}
+        self.service = SpreadsheetFeedingService()
+        patcher = mock.patch.object(spreadsheet.time, 'sleep')
+        self.sleep = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get_error(self, status, headers=None):
+        response = mock.Mock(status_code=status, headers=headers or {})
+        response.json.return_value = {'error': {'code': status, 'message': 'Error'}}
+        return gspread.exceptions.APIError(response)
+
+    def get_cells(self, rows):
+        return [gspread.Cell(row, col, 'DONE') for row in range(3, rows + 3) for col in (30, 31)]
+
+    def test_write_in_batches(self):
+        pending = self.service._write_cells(self.worksheet, self.get_cells(1200), self.provider)
+        self.assertEqual([], pending)
+        self.assertEqual(3, self.worksheet.update_cells.call_count)
+        self.assertEqual(1000, len(self.worksheet.update_cells.call_args_list[0][0][0]))
+
+    def test_retry_after(self):
+        self.worksheet.update_cells.side_effect = [self.get_error(429, {'Retry-After': '3'}), self.get_error(503), None]
+        pending = self.service._write_cells(self.worksheet, self.get_cells(10), self.provider)
+        self.assertEqual([], pending)
+        self.assertEqual([mock.call(3), mock.call(2)], self.sleep.call_args_list)
+
+    def test_defer_long_retry_after(self):
+        self.worksheet.update_cells.side_effect = self.get_error(429, {'Retry-After': '60'})
+        pending = self.service._write_cells(self.worksheet, self.get_cells(10), self.provider)
+        self.assertEqual(20, len(pending))
+        self.sleep.assert_not_called()
+
+    def test_pending_cells(self):
+        self.worksheet.update_cells.side_effect = [None, self.get_error(429), self.get_error(429), self.get_error(429)]
+        pending = self.service._write_cells(self.worksheet, self.get_cells(600), self.provider)
+        self.assertEqual(200, len(pending))
+        self.assertEqual(503, pending[0].row)
+
+    def test_flush_pending_cells_first(self):
+        self.provider['private'] = {'row_hashes': ['abc'], 'pending_cells': [[3, 30, 'DONE']]}
+        self.worksheet.update_cells.side_effect = self.get_error(429)
+        update = {}
+        with mock.patch.object(SpreadsheetFeedingService, '_get_worksheet', return_value=self.worksheet):
+            self.assertEqual([], list(self.service._update(self.provider, update)))
+        self.worksheet.get_all_values.assert_not_called()
+        self.assertEqual({'row_hashes': ['abc'], 'pending_cells': [[3, 30, 'DONE']]}, update['private'])
+
+    def test_defer_cells_on_client_error(self):
+        spreadsheet._worksheets[self.service._get_cache_key(self.provider)] = {}
+        self.worksheet.update_cells.side_effect = [None, self.get_error(403)]
+        pending = self.service._write_cells(self.worksheet, self.get_cells(600), self.provider)
+        self.assertEqual(200, len(pending))
+        self.assertEqual(2, self.worksheet.update_cells.call_count)
+        self.sleep.assert_not_called()
+        self.assertEqual({}, spreadsheet._worksheets)
+
+    def test_store_row_hashes_once_written(self):
+        self.app.config['SPREADSHEET_WRITE_BATCH_ROWS'] = 1
+        self.worksheet.update_cells.side_effect = [None, self.get_error(403)]
+        self.worksheet.get_all_values.return_value = [['_status', '_err_message', '_guid'], [], ['a'], ['b']]
+        self.worksheet.col_count = 10
+        cells = [gspread.Cell(3, 1, 'DONE'), gspread.Cell(4, 1, 'DONE')]
+        update = {}
+        with mock.patch.object(SpreadsheetFeedingService, '_get_worksheet', return_value=self.worksheet), \
+                mock.patch.object(spreadsheet.BelgaSpreadsheetParser, 'parse_rows',
+                                  return_value=([], cells, ['hash-3', 'hash-4'])) as parse_rows, \
+                mock.patch.object(SpreadsheetFeedingService, '_process_event_items', return_value=[]):
+            self.assertEqual([[]], list(self.service._update(self.provider, update)))
+            self.assertEqual(['hash-3'], update['private']['row_hashes'])
+            self.assertEqual(['hash-4'], update['private']['pending_row_hashes'])
+            self.assertEqual([[4, 1, 'DONE']], update['private']['pending_cells'])
+
+            # row with pending cells is not read again until those are written
+            self.provider['private'] = update['private']
+            parse_rows.return_value = ([], [], ['hash-3', 'hash-4'])
+            self.worksheet.update_cells.side_effect = None
+            update = {}
+            self.assertEqual([[]], list(self.service._update(self.provider, update)))
+        self.assertEqual({'hash-3', 'hash-4'}, parse_rows.call_args[0][2])
+        self.assertEqual(['hash-3', 'hash-4'], update['private']['row_hashes'])
+        self.assertEqual([], update['private']['pending_cells'])
@@ -1,8 +1,10 @@
 import datetime
 import json
+from unittest import mock
 
 from httmock import HTTMock, urlmatch
 
+from belga.io.feeding_services import twitter_belga
 from belga.io.feeding_services.twitter_belga import TwitterBelgaFeedingService
 from tests import TestCase
 
@@ -39,6 +41,7 @@ def iframely_mock(url, request):
 class TwitterBelgaServiceTestCase(TestCase):
 
     def setUp(self):
+        twitter_belga._embed_cache.clear()
         provider = {
             "config": {
                 "iframely_key": "abcdef",
@@ -71,3 +74,108 @@ class TwitterBelgaServiceTestCase(TestCase):
                 '>'
             )
         self.assertEqual(item["body_html"], expected_body)
+
+
+class TwitterBelgaEmbedCacheTestCase(TestCase):
+
+    def setUp(self):
+        twitter_belga._embed_cache.clear()
+        self.addCleanup(twitter_belga._embed_cache.clear)
+        self.requests = []
+
+    def get_items(self):
+        return [
+            {'guid': 'tweet-{}'.format(i), 'body_html': 'https://t.co/same and https://t.co/{}'.format(
+                'missing' if i % 2 else 'other')}
+            for i in range(20)
+        ]
+
+    def test_embeds_are_resolved_once(self):
+        @urlmatch(scheme='https', netloc='iframe.ly', path='/api/oembed')
+        def iframely(url, request):
+            self.requests.append(url.query)
+            if 'missing' in url.query:
+                return {'status_code': 417, 'content': ''}
+            return json.dumps({'html': '<div>embed</div>'})
+
+        provider = {'config': {'iframely_key': 'xyz', 'embed_tweet': True}}
+        with HTTMock(iframely):
+            items = TwitterBelgaFeedingService().parse_twitter_belga(self.get_items(), provider)[0]
+            self.assertEqual(3, len(self.requests))
+            TwitterBelgaFeedingService().parse_twitter_belga(self.get_items(), provider)
+            self.assertEqual(3, len(self.requests))
+
+        self.assertEqual(20, len(items))
+        self.assertEqual(2, items[0]['body_html'].count('<div>embed</div>'))
+        self.assertEqual(1, items[1]['body_html'].count('<div>embed</div>'))
+
+    def test_failures_are_not_cached(self):
+        @urlmatch(scheme='https', netloc='iframe.ly', path='/api/oembed')
+        def iframely(url, request):
+            self.requests.append(url.query)
+            if 'missing' in url.query:
+                return {'status_code': 404, 'content': ''}
+            return {'status_code': 429 if 'same' in url.query else 503, 'content': ''}
+
+        provider = {'config': {'iframely_key': 'xyz', 'embed_tweet': True}}
+        with HTTMock(iframely):
+            items = TwitterBelgaFeedingService().parse_twitter_belga(self.get_items(), provider)[0]
+            self.assertEqual(3, len(self.requests))
+            TwitterBelgaFeedingService().parse_twitter_belga(self.get_items(), provider)
+            # only not found url is cached
+            self.assertEqual(5, len(self.requests))
+
+        self.assertNotIn('EMBED', items[0]['body_html'])
+        cached = {url: embed for (url, key), (expires, embed) in twitter_belga._embed_cache.items()}
+        self.assertEqual({'https://t.co/missing': ''}, cached)
+
+    def test_invalid_response_is_skipped(self):
+        @urlmatch(scheme='https', netloc='iframe.ly', path='/api/oembed')
+        def iframely(url, request):
+            if 'missing' in url.query:
+                return {'status_code': 200, 'content': 'not json'}
+            return json.dumps({'html': '<div>embed</div>'})
+
+        provider = {'config': {'iframely_key': 'xyz', 'embed_tweet': True}}
+        with HTTMock(iframely):
+            items = TwitterBelgaFeedingService().parse_twitter_belga(self.get_items(), provider)[0]
+        self.assertEqual(2, items[0]['body_html'].count('<div>embed</div>'))
+        self.assertEqual(1, items[1]['body_html'].count('<div>embed</div>'))
+
+    def test_invalid_key(self):
+        @urlmatch(scheme='https', netloc='iframe.ly', path='/api/oembed')
+        def iframely(url, request):
+            return {'status_code': 403, 'content': ''}
+
+        provider = {'config': {'iframely_key': 'xyz', 'embed_tweet': True}}
+        with HTTMock(iframely):
+            with self.assertRaises(twitter_belga.IngestTwitterBelgaError):
+                TwitterBelgaFeedingService().parse_twitter_belga(self.get_items(), provider)
+        self.assertEqual({}, twitter_belga._embed_cache)
+
+
+class TwitterBelgaSinceIdTestCase(TestCase):
+
+    def get_status(self, status_id):
+        return mock.Mock(id=status_id, text='tweet {}'.format(status_id), created_at='Wed Aug 14 03:06:03 +0000 2019',
+                         user=mock.Mock(screen_name='belga'), media=None)
+
+    def test_since_id(self):
+        provider = {'config': {'screen_names': 'belga, #news', 'embed_tweet': False}}
+        api = mock.Mock()
+        api.GetUserTimeline.return_value = [self.get_status(12), self.get_status(11)]
+        api.GetSearch.return_value = []
+        update = {}
+        with mock.patch('twitter.Api', return_value=api):
+            items = TwitterBelgaFeedingService()._update(provider, update)[0]
+            self.assertEqual(['tweet 12', 'tweet 11'], [item['body_html'] for item in items])
+            self.assertEqual({'belga': 12}, update['private']['since_id'])
+            api.GetUserTimeline.assert_called_with(screen_name='belga', count=100)
+            api.GetSearch.assert_called_with('news', count=100)
+
+            provider['private'] = update['private']
+            api.GetUserTimeline.return_value = [self.get_status(13), self.get_status(12), self.get_status(11)]
+            update = {}
+            items = TwitterBelgaFeedingService()._update(provider, update)[0]
+            self.assertEqual(['tweet 13'], [item['body_html'] for item in items])
+            self.assertEqual({'belga': 13}, update['private']['since_id'])
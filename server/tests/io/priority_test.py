@@ -0,0 +1,61 @@
+# -*- coding: utf-8; -*-
+#
+# This file is part of Superdesk.
+#
+# Copyright 2013 - 2020 Sourcefabric z.u. and contributors.
+#
+# For the full copyright and license information, please see the
+# AUTHORS and LICENSE files distributed with this source code, or
+# at https://www.sourcefabric.org/superdesk/license
+
+import time
+import unittest
+
+from belga.io.priority import get_priority, sort_by_priority, sort_batches_by_priority
+
+
+class PriorityTestCase(unittest.TestCase):
+
+    def test_get_priority(self):
+        self.assertEqual(2, get_priority({'priority': 4, 'urgency': '2'}))
+        self.assertEqual(3, get_priority({'priority': '3'}))
+        self.assertEqual(float('inf'), get_priority({'priority': 0, 'urgency': ''}))
+        self.assertEqual(float('inf'), get_priority({}))
+
+    def test_sort_is_stable(self):
+        items = [{'guid': 'a', 'priority': 3}, {'guid': 'b'}, {'guid': 'c', 'priority': 1},
+                 {'guid': 'd', 'priority': 3}]
+        self.assertEqual(['c', 'a', 'd', 'b'], [item['guid'] for item in sort_by_priority(items)])
+
+    def test_sort_keeps_packages(self):
+        items = [{'guid': 'img', 'priority': 6}, {'guid': 'text', 'priority': 6},
+                 {'guid': 'pkg', 'priority': 6, 'groups': [{'refs': [{'idRef': 'main'}]},
+                                                           {'refs': [{'residRef': 'img'}, {'residRef': 'text'}]}]},
+                 {'guid': 'a', 'priority': 3},
+                 {'guid': 'flash', 'urgency': 1, 'groups': [{'refs': [{'residRef': 'b'}]}]},
+                 {'guid': 'b', 'priority': 5}]
+        self.assertEqual(['flash', 'b', 'a', 'img', 'text', 'pkg'],
+                         [item['guid'] for item in sort_by_priority(items)])
+
+    def test_sort_batches(self):
+        batches = [[{'guid': 'a', 'priority': 3}], [], [{'guid': 'b', 'priority': 5}, {'guid': 'c', 'urgency': 1}]]
+        self.assertEqual([['c', 'b'], ['a'], []],
+                         [[item['guid'] for item in batch] for batch in sort_batches_by_priority(batches)])
+
+    def test_burst(self):
+        """Flash at the end of a burst of routine items is the first one to be ingested."""
+        burst = [{'guid': 'routine-%d' % i, 'priority': 6} for i in range(5000)]
+        burst.append({'guid': 'flash', 'priority': 1, 'urgency': 1})
+
+        def time_to_desk(items, ingest_time=0.0001):
+            for i, item in enumerate(items):
+                if item['guid'] == 'flash':
+                    return (i + 1) * ingest_time
+
+        start = time.perf_counter()
+        ordered = sort_by_priority(burst)
+        ordering_time = time.perf_counter() - start
+
+        self.assertEqual('flash', ordered[0]['guid'])
+        self.assertEqual('routine-0', ordered[1]['guid'])
+        self.assertLess(ordering_time + time_to_desk(ordered), time_to_desk(burst))
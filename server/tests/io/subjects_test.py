@@ -0,0 +1,45 @@
+# -*- coding: utf-8; -*-
+#
+# This file is part of Superdesk.
+#
+# Copyright 2013 - 2020 Sourcefabric z.u. and contributors.
+#
+# For the full copyright and license information, please see the
+# AUTHORS and LICENSE files distributed with this source code, or
+# at https://www.sourcefabric.org/superdesk/license
+
+import unittest
+from copy import deepcopy
+
+from belga.io.subjects import SubjectSet, get_subjects, set_subjects_list
+
+
+class SubjectSetTestCase(unittest.TestCase):
+
+    def test_dedup_by_scheme_and_qcode(self):
+        subjects = SubjectSet([
+            {'name': 'AFP', 'qcode': 'AFP', 'scheme': 'sources'},
+            {'name': 'default', 'qcode': 'default', 'scheme': 'distribution'},
+            {'name': 'AFP', 'qcode': 'AFP', 'scheme': 'sources'},
+            {'name': 'AFP', 'qcode': 'AFP', 'scheme': 'credits'},
+        ])
+        self.assertEqual(3, len(subjects))
+        self.assertEqual(['sources', 'distribution', 'credits'], [s['scheme'] for s in subjects])
+        self.assertIn({'qcode': 'AFP', 'scheme': 'credits'}, subjects)
+
+    def test_schemes(self):
+        subjects = SubjectSet([{'name': 'x', 'qcode': 'x', 'scheme': 'label'}, {'name': 'y', 'qcode': 'y'}])
+        self.assertTrue(subjects.has_scheme('label'))
+        subjects.discard_scheme('label')
+        self.assertFalse(subjects.has_scheme('label'))
+        self.assertEqual([{'name': 'y', 'qcode': 'y'}], subjects.to_list())
+
+    def test_item_helpers(self):
+        item = {'subject': [{'name': 'b', 'qcode': 'b', 'scheme': 'genre'}]}
+        get_subjects(item).add({'name': 'a', 'qcode': 'a', 'scheme': 'genre'})
+        copy = deepcopy(item)
+        get_subjects(copy).add({'name': 'c', 'qcode': 'c', 'scheme': 'genre'})
+        self.assertEqual(2, len(get_subjects(item)))
+        set_subjects_list(item, key=lambda s: s['name'])
+        self.assertEqual(['a', 'b'], [s['name'] for s in item['subject']])
+        self.assertEqual({}, set_subjects_list({}))
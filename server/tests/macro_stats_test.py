@@ -0,0 +1,113 @@
+import os
+import sys
+import types
+import tempfile
+from unittest import mock
+
+import superdesk
+from apps.macros.macro_register import macros
+from superdesk.tests import TestCase
+
+from belga import macro_stats
+
+
+class MacroStatsTestCase(TestCase):
+
+    def setUp(self):
+        self.app.config['MACROS_STATS_ENABLED'] = True
+        self.app.config['MACROS_STATS_FLUSH_SIZE'] = 100
+        self.app.config['MACROS_STATS_FLUSH_INTERVAL'] = 3600
+        self.app.config['MACROS_PROFILE_THRESHOLD'] = 0
+        del macro_stats._samples[:]
+        self.addCleanup(macro_stats._samples.clear)
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(50, macro_stats.get_percentile(values, 50))
+        self.assertEqual(99, macro_stats.get_percentile(values, 99))
+        self.assertEqual(1, macro_stats.get_percentile([1], 90))
+        self.assertIsNone(macro_stats.get_percentile([], 90))
+
+    def test_record_sample(self):
+        def callback(item, **kwargs):
+            # simulate mongo commands done by macro
+            for i in range(3):
+                macro_stats.QueryCounter().started(None)
+            item['headline'] = 'foo'
+            return item
+
+        wrapped = macro_stats.profile_macro('Test Macro', callback)
+        self.assertEqual({'_id': 'id', 'headline': 'foo'}, wrapped({'_id': 'id'}, desk='desk'))
+        self.assertEqual(1, len(macro_stats._samples))
+        sample = macro_stats._samples[0]
+        self.assertEqual('Test Macro', sample['name'])
+        self.assertEqual('id', sample['item'])
+        self.assertEqual(3, sample['queries'])
+        self.assertEqual(len('{"_id": "id"}'), sample['size'])
+
+    def test_record_failure(self):
+        def callback(item, **kwargs):
+            raise KeyError('foo')
+
+        with self.assertRaises(KeyError):
+            macro_stats.profile_macro('Test Macro', callback)({})
+        self.assertEqual(1, len(macro_stats._samples))
+
+    def test_flush(self):
+        self.app.config['MACROS_STATS_FLUSH_SIZE'] = 2
+        wrapped = macro_stats.profile_macro('Test Macro', lambda item, **kwargs: item)
+        for i in range(3):
+            wrapped({'_id': str(i)})
+        self.assertEqual(1, len(macro_stats._samples))
+        stats = macro_stats.get_stats(superdesk.get_resource_service('macros_stats').find({}))
+        self.assertEqual(1, len(stats))
+        self.assertEqual(2, stats[0]['count'])
+
+    def test_profile_slow_macro(self):
+        self.app.config['MACROS_PROFILE_THRESHOLD'] = 0.000001
+        with tempfile.TemporaryDirectory() as profile_dir:
+            self.app.config['MACROS_PROFILE_DIR'] = profile_dir
+            macro_stats.profile_macro('Test Macro', lambda item, **kwargs: sorted(range(1000)))({})
+            self.assertEqual(1, len(os.listdir(profile_dir)))
+            self.assertTrue(os.listdir(profile_dir)[0].startswith('test_macro-'))
+
+    def test_stats(self):
+        samples = [{'name': 'foo', 'time': i / 100, 'queries': 2, 'size': 10} for i in range(1, 101)]
+        samples.append({'name': 'bar', 'time': 0.1, 'queries': 0, 'size': 0})
+        stats = macro_stats.get_stats(samples)
+        self.assertEqual(['foo', 'bar'], [stat['name'] for stat in stats])
+        self.assertEqual(100, stats[0]['count'])
+        self.assertEqual(0.5, stats[0]['p50'])
+        self.assertEqual(0.99, stats[0]['p99'])
+        self.assertEqual(1, stats[0]['max'])
+        self.assertEqual(2, stats[0]['queries'])
+
+    def test_profile_macros(self):
+        module = types.ModuleType('belga.macros.test_macro')
+        module.name = 'Test Macro'
+        module.callback = lambda item, **kwargs: item
+        with mock.patch.dict(sys.modules, {module.__name__: module}):
+            macro_stats.profile_macros('belga.macros')
+            callback = module.callback
+            macro_stats.profile_macros('belga.macros')
+        self.assertIs(callback, module.callback)
+        self.assertTrue(hasattr(callback, '__wrapped__'))
+
+    def test_profile_macros_after_reload(self):
+        # macros are reloaded whenever those are looked up
+        macro = macros.find('Set Default Metadata With Translate')
+        self.assertTrue(hasattr(macro['callback'], '__wrapped__'))
+        self.assertIsNot(macro['callback'], macros.find('Set Default Metadata With Translate')['callback'])
+        self.assertTrue(hasattr(macros.find('Set Default Metadata With Translate')['callback'], '__wrapped__'))
+
+    def test_disabled(self):
+        self.app.config['MACROS_STATS_ENABLED'] = False
+        macro_stats.profile_macro('Test Macro', lambda item, **kwargs: item)({})
+        self.assertEqual([], macro_stats._samples)
+
+    def test_register_query_counter_once(self):
+        with mock.patch.object(macro_stats, '_query_counter', None), \
+                mock.patch.object(macro_stats.monitoring, 'register') as register:
+            macro_stats.register_query_counter()
+            macro_stats.register_query_counter()
+        register.assert_called_once_with(mock.ANY)
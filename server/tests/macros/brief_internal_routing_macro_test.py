@@ -1,14 +1,16 @@
 
 import unittest
 from datetime import timedelta
+from unittest import mock
 
 import superdesk.tests as tests
 from superdesk.utc import utcnow, utc_to_local, utc
+from superdesk.editor_utils import Editor3Content
 from superdesk.errors import StopDuplication
 from superdesk.metadata.item import CONTENT_STATE
 from apps.archive.common import SCHEDULE_SETTINGS
 from belga.macros import brief_internal_routing as macro
-from belga.macros.brief_internal_routing import _get_product_subject, PRODUCTS
+from belga.macros.brief_internal_routing import _get_product_subject, _get_word_count, PRODUCTS
 
 
 class MacroMetadataTestCase(unittest.TestCase):
@@ -54,6 +56,18 @@ class MacroMetadataTestCase(unittest.TestCase):
                     'scheme': 'country',
                 }, subject)
 
+    def test_word_count(self):
+        cell = {'blocks': [{'type': 'unstyled', 'text': 'three words here'}], 'entityMap': {}}
+        content_state = {
+            'blocks': [
+                {'type': 'unstyled', 'text': 'foo bar'},
+                {'type': 'atomic', 'text': ' ', 'entityRanges': [{'offset': 0, 'length': 1, 'key': 0}]},
+                {'type': 'unstyled', 'text': ''},
+            ],
+            'entityMap': {'0': {'type': 'TABLE', 'data': {'data': {'cells': {'0': {'0': cell, '1': cell}}}}}},
+        }
+        self.assertEqual(8, _get_word_count(content_state))
+
 
 class BriefInternalRoutingMacroTestCase(tests.TestCase):
 
@@ -151,3 +165,21 @@ class BriefInternalRoutingMacroTestCase(tests.TestCase):
         with self.assertRaises(StopDuplication):
             macro.callback(item)
         self.assertEqual(2, len(item.keys()))
+
+    def test_parse_body_once(self):
+        item = {
+            '_id': 'foo',
+            'guid': 'foo',
+            'type': 'text',
+            'state': CONTENT_STATE.PUBLISHED,
+            'task': {},
+            'profile': self.profiles[1],
+            'headline': 'foo',
+            'body_html': '<p>foo</p><p>ATTENTION USERS</p><p>bar</p>',
+        }
+
+        with mock.patch.object(macro, 'Editor3Content', wraps=Editor3Content) as editor:
+            with self.assertRaises(StopDuplication):
+                macro.callback(item)
+        self.assertEqual(1, len([call for call in editor.call_args_list if call[0][1] == 'body_html']))
+        self.assertEqual('<p>foo</p>', item['body_html'])
@@ -1,9 +1,14 @@
 from superdesk.tests import TestCase
+from belga import cache
 from belga.macros.set_default_metadata import set_default_metadata
 
 
 class SetDefaultMetadataTestCase(TestCase):
 
+    def setUp(self):
+        # same desks and templates are created by tests
+        cache.invalidate()
+
     def test_set_default_metadata(self):
         self.app.data.insert(
             'desks',
@@ -1,12 +1,20 @@
+from unittest import mock
+
 from bson import ObjectId
 from superdesk import get_resource_service
 from superdesk.tests import TestCase
 from superdesk.errors import StopDuplication
+from belga import cache
+from belga.macros import set_default_metadata_with_translate as macro
 from belga.macros.set_default_metadata_with_translate import set_default_metadata_with_translate
 
 
 class SetDefaultMetadataWithTranslateTestCase(TestCase):
 
+    def setUp(self):
+        # same desks and templates are created by tests
+        cache.invalidate()
+
     def test_no_destination_data(self):
         item = {
             'headline': 'test headline',
@@ -285,3 +293,124 @@ class SetDefaultMetadataWithTranslateTestCase(TestCase):
             new_item['translated_from'],
             item['guid']
         )
+
+    def test_single_write(self):
+        self.app.data.insert('desks', [{
+            '_id': ObjectId('5d385f17fe985ec5e1a78b49'),
+            'name': 'Politic Desk',
+            'default_content_template': 'content_template_1',
+        }])
+        self.app.data.insert('stages', [{
+            '_id': ObjectId('5d385f31fe985ec67a0ca583'),
+            'name': 'Incoming Stage',
+            'desk': ObjectId('5d385f17fe985ec5e1a78b49'),
+        }])
+        self.app.data.insert('content_templates', [{
+            '_id': 'content_template_1',
+            'template_name': 'belga text',
+            'data': {
+                'language': 'en',
+                'keywords': ['some', 'keyword'],
+                'subject': [{'name': 'default', 'qcode': 'default', 'scheme': 'distribution'}],
+            },
+        }])
+        item = {
+            '_id': 'urn:newsml:localhost:5000:2019-12-10T14:43:46.224107:d13ac5ae-7f43-4b7f-89a5-2c6835389564',
+            'guid': 'urn:newsml:localhost:5000:2019-12-10T14:43:46.224107:d13ac5ae-7f43-4b7f-89a5-2c6835389564',
+            'headline': 'test headline',
+            'state': 'published',
+            'type': 'text',
+            'language': 'fr',
+        }
+        self.app.data.insert('archive', [item])
+        archive_service = get_resource_service('archive')
+        find_one = mock.patch.object(archive_service, 'find_one', wraps=archive_service.find_one)
+        duplicate = mock.patch.object(archive_service, 'duplicate_item', wraps=archive_service.duplicate_item)
+        put = mock.patch.object(archive_service, 'put')
+        with find_one as find_one, duplicate as duplicate, put as put:
+            self.assertRaises(
+                StopDuplication,
+                set_default_metadata_with_translate,
+                item,
+                dest_desk_id=ObjectId('5d385f17fe985ec5e1a78b49'),
+                dest_stage_id=ObjectId('5d385f31fe985ec67a0ca583')
+            )
+        # new item is created with all changes at once, stored original is only read to link the translation
+        self.assertEqual(1, find_one.call_count)
+        self.assertEqual(1, duplicate.call_count)
+        put.assert_not_called()
+
+        new_item = archive_service.find_one(req=None, original_id=item['_id'])
+        self.assertEqual('en', new_item['language'])
+        self.assertEqual(item['guid'], new_item['translated_from'])
+        self.assertEqual(['some', 'keyword'], new_item['keywords'])
+        self.assertEqual('submitted', new_item['state'])
+        self.assertEqual(ObjectId('5d385f17fe985ec5e1a78b49'), new_item['task']['desk'])
+        self.assertEqual(ObjectId('5d385f31fe985ec67a0ca583'), new_item['task']['stage'])
+        self.assertEqual([new_item['_id']], archive_service.find_one(req=None, _id=item['_id'])['translations'])
+
+    def test_onstage_macro_gets_stored_item(self):
+        self.app.data.insert('desks', [{
+            '_id': ObjectId('5d385f17fe985ec5e1a78b49'),
+            'name': 'Politic Desk',
+            'default_content_template': 'content_template_1',
+        }])
+        self.app.data.insert('stages', [{
+            '_id': ObjectId('5d385f31fe985ec67a0ca583'),
+            'name': 'Incoming Stage',
+            'desk': ObjectId('5d385f17fe985ec5e1a78b49'),
+            'onstage_macro': 'Set Default Metadata',
+        }])
+        self.app.data.insert('content_templates', [{
+            '_id': 'content_template_1',
+            'template_name': 'belga text',
+            'data': {'language': 'en', 'keywords': ['some', 'keyword']},
+        }])
+        item = {
+            '_id': 'urn:newsml:localhost:5000:2019-12-10T14:43:46.224107:d13ac5ae-7f43-4b7f-89a5-2c6835389564',
+            'guid': 'urn:newsml:localhost:5000:2019-12-10T14:43:46.224107:d13ac5ae-7f43-4b7f-89a5-2c6835389564',
+            'headline': 'test headline',
+            'state': 'published',
+            'type': 'text',
+            'language': 'fr',
+        }
+        self.app.data.insert('archive', [item])
+        with mock.patch.object(macro, 'apply_onstage_rule') as apply_onstage_rule:
+            self.assertRaises(
+                StopDuplication,
+                set_default_metadata_with_translate,
+                item,
+                dest_desk_id=ObjectId('5d385f17fe985ec5e1a78b49'),
+                dest_stage_id=ObjectId('5d385f31fe985ec67a0ca583')
+            )
+        new_item = get_resource_service('archive').find_one(req=None, original_id=item['_id'])
+        apply_onstage_rule.assert_called_once_with(new_item, new_item['_id'])
+        self.assertIn('_etag', apply_onstage_rule.call_args[0][0])
+
+    def test_no_onstage_macro(self):
+        self.app.data.insert('desks', [{
+            '_id': ObjectId('5d385f17fe985ec5e1a78b49'),
+            'name': 'Politic Desk',
+            'default_content_template': 'content_template_1',
+        }])
+        self.app.data.insert('stages', [{
+            '_id': ObjectId('5d385f31fe985ec67a0ca583'),
+            'name': 'Incoming Stage',
+            'desk': ObjectId('5d385f17fe985ec5e1a78b49'),
+        }])
+        self.app.data.insert('content_templates', [{
+            '_id': 'content_template_1',
+            'template_name': 'belga text',
+            'data': {'language': 'en'},
+        }])
+        item = {'_id': 'original', 'guid': 'original', 'state': 'published', 'type': 'text', 'language': 'en'}
+        self.app.data.insert('archive', [item])
+        with mock.patch.object(macro, 'apply_onstage_rule') as apply_onstage_rule:
+            self.assertRaises(
+                StopDuplication,
+                set_default_metadata_with_translate,
+                item,
+                dest_desk_id=ObjectId('5d385f17fe985ec5e1a78b49'),
+                dest_stage_id=ObjectId('5d385f31fe985ec67a0ca583')
+            )
+        apply_onstage_rule.assert_not_called()
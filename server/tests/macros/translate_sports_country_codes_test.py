@@ -53,3 +53,37 @@ class TranslateSportsCountryCodesTestCase(unittest.TestCase):
             '<p>29. Thomas Tumler (Zwi) 2:00.44 ( 59.67 + 1:00.77)</p>',
             item['body_html'],
         )
+
+    def test_translate_single_pass(self):
+        # en THA is nl Tha, replaced codes must not be translated again
+        item = {
+            'language': 'nl',
+            'body_html': '<p>1. Player A (THA) 2. Player B (TPE/12)</p>',
+        }
+        macro.callback(item)
+        self.assertEqual('<p>1. Player A (Tha) 2. Player B (Tai/12)</p>', item['body_html'])
+
+    def test_keep_target_language_codes(self):
+        # fr Tha is nl Tai and fr Tai is nl Tha
+        item = {
+            'language': 'nl',
+            'body_html': '<p>1. Player A (Tha) 2. Player B (Tai/12)</p>',
+        }
+        macro.callback(item)
+        self.assertEqual('<p>1. Player A (Tha) 2. Player B (Tai/12)</p>', item['body_html'])
+        mapping, _ = macro.TARGET_TRANSLATIONS['fr']
+        self.assertNotIn('Tha', mapping)
+        self.assertNotIn('Tai', mapping)
+        self.assertEqual('Tha', mapping['TPE'])
+
+    def test_translations(self):
+        self.assertEqual('Zwi', macro.TRANSLATIONS[('en', 'nl')]['SUI'])
+        self.assertEqual('SUI', macro.TRANSLATIONS[('nl', 'en')]['Zwi'])
+        self.assertEqual('Sui', macro.TRANSLATIONS[('nl', 'fr')]['Zwi'])
+        self.assertNotIn(('nl', 'nl'), macro.TRANSLATIONS)
+
+    def test_translations_not_aligned(self):
+        with self.assertRaises(ValueError):
+            macro.get_translations({'nl': ['Bel', 'Ned'], 'fr': ['Bel']})
+        with self.assertRaises(ValueError):
+            macro.get_translations({'nl': ['Bel', 'Bel'], 'fr': ['Bel', 'P-B']})
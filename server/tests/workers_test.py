@@ -0,0 +1,23 @@
+from flask import current_app as app
+from superdesk.tests import TestCase
+
+from belga.workers import get_pool
+
+
+def get_clients(_):
+    return len(app.data.mongo.driver)
+
+
+def get_headlines():
+    return sorted(item['headline'] for item in app.data.get_mongo_collection('archive').find())
+
+
+class WorkersTestCase(TestCase):
+
+    def test_pool(self):
+        self.app.data.insert('archive', [{'_id': 'foo', 'headline': 'foo'}, {'_id': 'bar', 'headline': 'bar'}])
+        self.assertTrue(len(self.app.data.mongo.driver))
+        with get_pool(2) as pool:
+            # clients of parent process are not used in workers
+            self.assertEqual([0, 0], pool.map(get_clients, [None, None], 1))
+            self.assertEqual(['bar', 'foo'], pool.apply(get_headlines))